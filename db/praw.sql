@@ -33,6 +33,45 @@ CREATE TABLE raw_reddit_comments (
     extraction_timestamp TIMESTAMP DEFAULT NOW()
 );
 
+CREATE TABLE etl_checkpoints (
+    subreddit VARCHAR NOT NULL,
+    stream VARCHAR NOT NULL,
+    high_watermark TIMESTAMP,
+    last_id VARCHAR,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (subreddit, stream)
+);
+
+CREATE TABLE post_metrics_snapshots (
+    post_id VARCHAR NOT NULL,
+    captured_at TIMESTAMP NOT NULL,
+    score INTEGER,
+    num_comments INTEGER,
+    upvote_ratio DECIMAL(4,3),
+    resolution_seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id, captured_at)
+);
+
+CREATE TABLE comment_metrics_snapshots (
+    comment_id VARCHAR NOT NULL,
+    captured_at TIMESTAMP NOT NULL,
+    score INTEGER,
+    resolution_seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (comment_id, captured_at)
+);
+
+CREATE TABLE pending_comment_fetches (
+    post_id VARCHAR PRIMARY KEY REFERENCES raw_reddit_posts(id),
+    loaded_num_comments INTEGER NOT NULL DEFAULT 0,
+    queued_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE etl_schema_version (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
 CREATE INDEX idx_posts_created_utc ON raw_reddit_posts(created_utc);
 CREATE INDEX idx_posts_score ON raw_reddit_posts(score);
 CREATE INDEX idx_posts_subreddit ON raw_reddit_posts(subreddit);
@@ -23,11 +23,24 @@ class DatabaseSettings:
         return "sqlite:///test_reddit.db"
 
 
+class PoolSettings:
+    def __init__(self):
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+        self.pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
 class RedditSettings:
     def __init__(self):
         self.client_id = os.getenv("REDDIT_CLIENT_ID")
         self.client_secret = os.getenv("REDDIT_CLIENT_SECRET")
         self.user_agent = os.getenv("REDDIT_USER_AGENT", "pk-uoa-etl/1.0")
+        self.requests_per_minute = int(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "100"))
+        # Processes using the same file share one request budget; unset picks a per-app temp file, empty opts out
+        self.rate_limit_file = os.getenv("REDDIT_RATE_LIMIT_FILE")
+        self.token_cache_file = os.getenv("REDDIT_TOKEN_CACHE_FILE")
 
     def is_configured(self) -> bool:
         """Check if required Reddit credentials are set (read-only access)"""
@@ -38,6 +51,29 @@ class RedditSettings:
         ])
 
 
+class LandingSettings:
+    def __init__(self):
+        # Unset or empty: raw API responses are not kept
+        self.directory = os.getenv("RAW_LANDING_DIR") or None
+        self.segment_bytes = int(os.getenv("RAW_LANDING_SEGMENT_MB", "64")) * 1024 * 1024
+        self.s3_uri = os.getenv("RAW_LANDING_S3_URI") or None
+        self.s3_endpoint_url = os.getenv("RAW_LANDING_S3_ENDPOINT_URL") or None
+
+    def is_enabled(self) -> bool:
+        return self.directory is not None
+
+
+class LakeSettings:
+    def __init__(self):
+        # Unset or empty: pipelines write to the database only
+        self.directory = os.getenv("LAKE_DIR") or None
+        self.rows_per_file = int(os.getenv("LAKE_ROWS_PER_FILE", "100000"))
+        self.flush_seconds = float(os.getenv("LAKE_FLUSH_SECONDS", "300"))
+
+    def is_enabled(self) -> bool:
+        return self.directory is not None
+
+
 def get_database_url(use_test_db: bool = False) -> str:
     db_settings = DatabaseSettings()
     return db_settings.test_url if use_test_db else db_settings.url
@@ -47,6 +83,18 @@ def get_reddit_settings() -> RedditSettings:
     return RedditSettings()
 
 
+def get_pool_settings() -> PoolSettings:
+    return PoolSettings()
+
+
+def get_landing_settings() -> LandingSettings:
+    return LandingSettings()
+
+
+def get_lake_settings() -> LakeSettings:
+    return LakeSettings()
+
+
 if __name__ == "__main__":
     db_settings = DatabaseSettings()
     reddit_settings = RedditSettings()
@@ -0,0 +1,62 @@
+﻿import time
+from itertools import islice
+from typing import Callable, Generic, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield successive lists of at most `size` items from any iterable"""
+    if size < 1:
+        raise ValueError("Chunk size must be at least 1")
+
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class MicroBatcher(Generic[T]):
+    """Collects items from an unbounded stream and says when to flush: at `max_size` items or `max_wait` seconds"""
+
+    def __init__(self, max_size: int = 100, max_wait: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._clock = clock
+        self._items: List[T] = []
+        self._first_added: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: T) -> bool:
+        """Buffer an item; True once the batch should be flushed"""
+        if not self._items:
+            self._first_added = self._clock()
+        self._items.append(item)
+        return self.due()
+
+    def due(self) -> bool:
+        """True when the batch is full, or its oldest item has waited `max_wait` seconds"""
+        if not self._items:
+            return False
+        return len(self._items) >= self.max_size or self._clock() - self._first_added >= self.max_wait
+
+    def drain(self) -> List[T]:
+        """Hand over the buffered items and start a new batch"""
+        items, self._items = self._items, []
+        self._first_added = None
+        return items
+
+
+if __name__ == "__main__":
+    print(list(chunked(range(7), 3)))
+
+    batcher = MicroBatcher(max_size=3)
+    flushes = [batcher.drain() for item in range(7) if batcher.add(item)]
+    print(f"Flushed {flushes}, {len(batcher)} still buffered")
@@ -1,17 +1,90 @@
-﻿from contextlib import contextmanager
-from typing import Generator
-from sqlalchemy import create_engine
+﻿import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Generator, Dict, Any, Optional, Set, Tuple
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import sessionmaker, Session
 
 from ruoa_extractor.src.config import config
-from ruoa_extractor.src.config.config import get_database_url
-from ruoa_extractor.src.core.models import Base, RedditPost
+from ruoa_extractor.src.config.config import get_database_url, get_pool_settings, PoolSettings
+from ruoa_extractor.src.core.models import Base, RedditPost, SchemaVersion, SCHEMA_VERSION
 from sqlalchemy import inspect
 
+# Process-wide engines keyed by URL, so every pipeline and cycle shares one pool; kept with their create options
+_engines: Dict[str, Tuple[Engine, Dict[str, Any]]] = {}
+_engines_lock = threading.Lock()
+
+logger = logging.getLogger("RedditDatabase")
+
+# URLs whose schema this process already found current
+_verified_schemas: Set[str] = set()
+
+
+def _is_memory_database(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_options(database_url: str, pool_settings: PoolSettings) -> Dict[str, Any]:
+    """Build create_engine keyword arguments for the URL's backend"""
+    options: Dict[str, Any] = {
+        "future": True,
+        "pool_pre_ping": pool_settings.pool_pre_ping,
+    }
+
+    if make_url(database_url).get_backend_name() == "postgresql":
+        options.update(
+            pool_size=pool_settings.pool_size,
+            max_overflow=pool_settings.max_overflow,
+            pool_recycle=pool_settings.pool_recycle,
+        )
+        if pool_settings.statement_timeout_ms:
+            options["connect_args"] = {"options": f"-c statement_timeout={pool_settings.statement_timeout_ms}"}
+
+    return options
+
+
+def get_engine(database_url: str, pool_settings: Optional[PoolSettings] = None) -> Engine:
+    """Return the shared engine for a URL, creating it with the configured pool on first use"""
+    options = _engine_options(database_url, pool_settings or get_pool_settings())
+
+    # Every in-memory SQLite engine is its own database, so those are never shared
+    if _is_memory_database(database_url):
+        return create_engine(database_url, **options)
+
+    with _engines_lock:
+        cached = _engines.get(database_url)
+        if cached is None:
+            engine = create_engine(database_url, **options)
+            _engines[database_url] = (engine, options)
+            return engine
+
+        engine, created_with = cached
+        if options != created_with:
+            # A second pool would multiply the connections the shared one exists to bound
+            logger.warning(
+                f"Reusing the engine for {make_url(database_url).render_as_string(hide_password=True)} "
+                f"created with {created_with}; ignoring pool settings {options}. "
+                f"Call dispose_engines() first to apply them"
+            )
+        return engine
+
+
+def dispose_engines() -> None:
+    """Close every pooled connection and forget the shared engines"""
+    with _engines_lock:
+        for engine, _ in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
 class DatabaseManager:
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, pool_settings: Optional[PoolSettings] = None):
         self.database_url = database_url
-        self.engine = create_engine(database_url, future=True)
+        self.engine = get_engine(database_url, pool_settings)
         self.SessionLocal = sessionmaker(bind=self.engine)
 
 
@@ -26,6 +99,45 @@ class DatabaseManager:
         current_tables = inspector.get_table_names()
         print(f"📋 Current tables in the database: {current_tables}")
 
+    def stored_schema_version(self) -> Optional[int]:
+        """Schema version recorded by the last verification, or None before the first one"""
+        try:
+            with self.engine.connect() as connection:
+                return connection.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+        except DBAPIError:
+            # The version table itself does not exist yet
+            return None
+
+    def ensure_schema(self) -> bool:
+        """Create and inspect tables only when the stored schema version is missing or older; returns whether it did"""
+        cacheable = not _is_memory_database(self.database_url)
+        if cacheable and self.database_url in _verified_schemas:
+            return False
+
+        # A newer version means a newer release already migrated; an older binary must leave it alone
+        stored = self.stored_schema_version()
+        migrated = stored is None or stored < SCHEMA_VERSION
+        if migrated:
+            self.create_tables()
+            applied_at = datetime.utcnow()
+            try:
+                with self.get_session() as session:
+                    # Conditional, so a newer release that migrated meanwhile is never recorded as older
+                    raised = session.execute(
+                        update(SchemaVersion)
+                        .where(SchemaVersion.id == 1, SchemaVersion.version < SCHEMA_VERSION)
+                        .values(version=SCHEMA_VERSION, applied_at=applied_at)
+                    ).rowcount
+                    if not raised and session.get(SchemaVersion, 1) is None:
+                        session.add(SchemaVersion(id=1, version=SCHEMA_VERSION, applied_at=applied_at))
+            except IntegrityError:
+                # Another process starting at the same time recorded the version first
+                pass
+
+        if cacheable:
+            _verified_schemas.add(self.database_url)
+        return migrated
+
     @contextmanager
     def get_session(self) -> Generator[Session, None, None]:
         session = self.SessionLocal()
@@ -6,6 +6,10 @@ from sqlalchemy import DateTime, Integer, String, Text, Boolean, ForeignKey, Num
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
+# Bump whenever a model or index changes, so running deployments re-verify their tables once
+SCHEMA_VERSION = 3
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -66,6 +70,77 @@ class RedditComment(Base):
         return f"<RedditComment(id='{self.id}', author='{self.author}', body='{body_preview}')>"
 
 
+
+class ExtractionCheckpoint(Base):
+    __tablename__ = "etl_checkpoints"
+
+    subreddit: Mapped[str] = mapped_column(String, primary_key=True)
+    stream: Mapped[str] = mapped_column(String, primary_key=True)
+    high_watermark: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    last_id: Mapped[Optional[str]] = mapped_column(String)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<ExtractionCheckpoint(subreddit='{self.subreddit}', stream='{self.stream}', high_watermark='{self.high_watermark}')>"
+
+
+class PostMetricsSnapshot(Base):
+    __tablename__ = "post_metrics_snapshots"
+
+    # No foreign key: snapshots are appended in bulk, before or without the post row
+    post_id: Mapped[str] = mapped_column(String, primary_key=True)
+    captured_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    score: Mapped[Optional[int]] = mapped_column(Integer)
+    num_comments: Mapped[Optional[int]] = mapped_column(Integer)
+    upvote_ratio: Mapped[Optional[Decimal]] = mapped_column(Numeric(4, 3))
+    # 0 for an observation as fetched, otherwise the width of the rollup bucket this row stands for
+    resolution_seconds: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<PostMetricsSnapshot(post_id='{self.post_id}', captured_at='{self.captured_at}', score={self.score})>"
+
+
+class CommentMetricsSnapshot(Base):
+    __tablename__ = "comment_metrics_snapshots"
+
+    comment_id: Mapped[str] = mapped_column(String, primary_key=True)
+    captured_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    score: Mapped[Optional[int]] = mapped_column(Integer)
+    resolution_seconds: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CommentMetricsSnapshot(comment_id='{self.comment_id}', captured_at='{self.captured_at}')>"
+
+
+class PendingCommentFetch(Base):
+    __tablename__ = "pending_comment_fetches"
+
+    # A post whose comment tree still has to be loaded; the row is removed once it has been
+    post_id: Mapped[str] = mapped_column(String, ForeignKey("raw_reddit_posts.id"), primary_key=True)
+    # num_comments already covered by stored comments, the baseline growth is measured from
+    loaded_num_comments: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    queued_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<PendingCommentFetch(post_id='{self.post_id}', loaded_num_comments={self.loaded_num_comments})>"
+
+
+class SchemaVersion(Base):
+    __tablename__ = "etl_schema_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SchemaVersion(version={self.version}, applied_at='{self.applied_at}')>"
+
+
 if __name__ == "__main__":
     print("Testing complete Reddit models...")
 
@@ -0,0 +1,87 @@
+﻿from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+from ruoa_extractor.src.core.models import RedditPost, RedditComment
+
+
+class PostRecord(NamedTuple):
+    """Plain tuple with the columns of RedditPost, used between extraction and bulk loading"""
+    id: str
+    title: Optional[str]
+    selftext: Optional[str] = None
+    author: Optional[str] = None
+    created_utc: Optional[datetime] = None
+    score: Optional[int] = None
+    num_comments: Optional[int] = None
+    upvote_ratio: Optional[Union[float, Decimal]] = None
+    url: Optional[str] = None
+    subreddit: Optional[str] = None
+    flair_text: Optional[str] = None
+    flair_css_class: Optional[str] = None
+    is_video: Optional[bool] = None
+    is_self: Optional[bool] = None
+    permalink: Optional[str] = None
+    post_hint: Optional[str] = None
+    extraction_timestamp: Optional[datetime] = None
+
+    def to_model(self) -> RedditPost:
+        """Build the mapped ORM object, for callers that need a session-attached instance"""
+        return RedditPost(**_without_unset_timestamp(self._asdict()))
+
+
+class CommentRecord(NamedTuple):
+    """Plain tuple with the columns of RedditComment, used between extraction and bulk loading"""
+    id: str
+    post_id: str
+    parent_id: Optional[str] = None
+    body: Optional[str] = None
+    author: Optional[str] = None
+    created_utc: Optional[datetime] = None
+    score: Optional[int] = None
+    is_submitter: Optional[bool] = None
+    permalink: Optional[str] = None
+    extraction_timestamp: Optional[datetime] = None
+
+    def to_model(self) -> RedditComment:
+        """Build the mapped ORM object, for callers that need a session-attached instance"""
+        return RedditComment(**_without_unset_timestamp(self._asdict()))
+
+
+PostItem = Union[PostRecord, RedditPost]
+CommentItem = Union[CommentRecord, RedditComment]
+
+RECORD_TYPES = (PostRecord, CommentRecord)
+
+
+def _without_unset_timestamp(values: Dict[str, Any]) -> Dict[str, Any]:
+    # Leave the column default in charge when the extractor did not stamp the record
+    if values.get("extraction_timestamp") is None:
+        values.pop("extraction_timestamp", None)
+    return values
+
+
+def as_model(item: Any) -> Any:
+    """Return a mapped ORM object for a record, passing ORM objects through unchanged"""
+    if isinstance(item, RECORD_TYPES):
+        return item.to_model()
+    return item
+
+
+def with_values(item: Any, **changes: Any) -> Any:
+    """Copy a record with some fields changed; ORM objects are updated in place"""
+    if isinstance(item, RECORD_TYPES):
+        return item._replace(**changes)
+    for name, value in changes.items():
+        setattr(item, name, value)
+    return item
+
+
+if __name__ == "__main__":
+    post = PostRecord(id="test123", title="Record post", subreddit="universityofauckland", num_comments=2)
+    comment = CommentRecord(id="comment123", post_id="test123", body="Record comment")
+
+    print(f"Created record: {post}")
+    print(f"As model: {post.to_model()}")
+    print(f"Comment as model: {comment.to_model()}")
+    print("✅ Record types working!")
@@ -1,23 +1,34 @@
 ﻿from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, NamedTuple
 from datetime import datetime, timezone
 
-from ruoa_extractor.src.core.models import RedditPost, RedditComment
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord, PostItem, CommentItem
+
+
+class CommentFetchResult(NamedTuple):
+    """Outcome of fetching one post's comment tree; `comments` may be a lazy iterator"""
+    post_id: str
+    comments: Iterable[CommentItem]
+    error: Optional[Exception] = None
 
 
 class AbstractRedditExtractor(ABC):
     """Abstract base class for Reddit data extractors"""
 
-    def __init__(self, subreddit_name: str):
+    def __init__(self, subreddit_name: str, as_models: bool = False):
         self.subreddit_name = subreddit_name
+        # Records skip ORM instrumentation; mapped objects are only built when asked for
+        self.as_models = as_models
+        # Outcome of each comment tree walk by post ID, for extractors that expand collapsed branches
+        self.comment_expansions: Dict[str, Any] = {}
 
     @abstractmethod
-    def extract_posts(self, limit: int = 10, time_filter: str = "day") -> List[RedditPost]:
+    def extract_posts(self, limit: int = 10, time_filter: str = "day") -> List[PostItem]:
         """Extract Reddit posts from the subreddit"""
         pass
 
     @abstractmethod
-    def extract_comments(self, post_id: str, limit: Optional[int] = None) -> List[RedditComment]:
+    def extract_comments(self, post_id: str, limit: Optional[int] = None) -> List[CommentItem]:
         """Extract comments for a specific post"""
         pass
 
@@ -41,6 +52,54 @@ class AbstractRedditExtractor(ABC):
             return None
         return text.strip().replace('\x00', '')
 
+    def _emit(self, record: Any) -> Any:
+        """Return the record itself, or its mapped ORM object when the caller asked for models"""
+        return record.to_model() if self.as_models else record
+
+    def _json_author(self, author: Optional[str]) -> Optional[str]:
+        """Map the API's deleted-author placeholder to None, as PRAW does"""
+        if not author or author == "[deleted]":
+            return None
+        return author
+
+    def _post_from_json(self, data: Dict[str, Any]) -> PostItem:
+        """Convert the data of a Reddit API t3 (link) object to a post record"""
+        return self._emit(PostRecord(
+            id=data["id"],
+            title=self._sanitize_text(data.get("title")),
+            selftext=self._sanitize_text(data.get("selftext")),
+            author=self._json_author(data.get("author")),
+            created_utc=self._convert_timestamp(float(data["created_utc"])),
+            score=data.get("score"),
+            num_comments=data.get("num_comments"),
+            upvote_ratio=data.get("upvote_ratio"),
+            url=data.get("url"),
+            subreddit=data.get("subreddit"),
+            flair_text=data.get("link_flair_text"),
+            flair_css_class=data.get("link_flair_css_class"),
+            is_video=data.get("is_video"),
+            is_self=data.get("is_self"),
+            permalink=data.get("permalink"),
+            post_hint=data.get("post_hint"),
+        ))
+
+    def _comment_from_json(self, data: Dict[str, Any], post_id: Optional[str] = None) -> CommentItem:
+        """Convert the data of a Reddit API t1 (comment) object to a comment record"""
+        if post_id is None:
+            post_id = data["link_id"].split("_", 1)[-1]
+
+        return self._emit(CommentRecord(
+            id=data["id"],
+            post_id=post_id,
+            parent_id=data.get("parent_id"),
+            body=self._sanitize_text(data.get("body")),
+            author=self._json_author(data.get("author")),
+            created_utc=self._convert_timestamp(float(data["created_utc"])),
+            score=data.get("score"),
+            is_submitter=data.get("is_submitter"),
+            permalink=data.get("permalink"),
+        ))
+
 
 if __name__ == "__main__":
     print("AbstractRedditExtractor created successfully!")
@@ -0,0 +1,211 @@
+﻿import heapq
+import os
+import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import zstandard
+
+from ruoa_extractor.src.extractors.abstract_extractor import AbstractRedditExtractor
+from ruoa_extractor.src.core.records import PostItem, CommentItem
+
+# Pushshift-style dumps are compressed with long-distance windows of up to 2 GiB
+MAX_WINDOW_SIZE = 2 ** 31
+# Decompressed bytes handed to a parser process at a time
+CHUNK_SIZE = 16 * 1024 * 1024
+
+SUBMISSIONS = "submissions"
+COMMENTS = "comments"
+
+TIME_FILTER_SECONDS = {
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+    "all": None,
+}
+
+
+def iter_ndjson_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream a dump (zstd-compressed when it ends in .zst) as chunks that end on a line boundary"""
+    with open(path, "rb") as handle:
+        reader = handle
+        if path.endswith(".zst"):
+            reader = zstandard.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE).stream_reader(handle)
+
+        remainder = b""
+        while True:
+            block = reader.read(chunk_size)
+            if not block:
+                break
+
+            block = remainder + block
+            cut = block.rfind(b"\n")
+            if cut < 0:
+                remainder = block
+                continue
+            remainder = block[cut + 1:]
+            yield block[:cut + 1]
+
+        if remainder.strip():
+            yield remainder
+
+
+def parse_chunk(
+        chunk: bytes,
+        kind: str,
+        subreddit_name: str,
+        since: Optional[float],
+        until: Optional[float]
+) -> List[Any]:
+    """Parse one chunk in a worker process; module level so the process pool can pickle it"""
+    return ArchiveRedditExtractor(subreddit_name)._parse_chunk(chunk, kind, since, until)
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    # Dates without a zone are read as UTC, like created_utc itself
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class ArchiveRedditExtractor(AbstractRedditExtractor):
+    """Reddit extractor over local Pushshift-style NDJSON dumps, parsing chunks on a process pool"""
+
+    def __init__(
+            self,
+            subreddit_name: str,
+            submission_files: Sequence[str] = (),
+            comment_files: Sequence[str] = (),
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            workers: Optional[int] = None,
+            as_models: bool = False,
+            chunk_size: int = CHUNK_SIZE
+    ):
+        super().__init__(subreddit_name, as_models)
+        self.submission_files = list(submission_files)
+        self.comment_files = list(comment_files)
+        self.since = since
+        self.until = until
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def _parse_chunk(self, chunk: bytes, kind: str, since: Optional[float], until: Optional[float]) -> List[Any]:
+        """Records of this subreddit and time range from one chunk; malformed lines are skipped"""
+        wanted = self.subreddit_name.lower()
+        marker = wanted.encode("utf-8")
+        records = []
+
+        for line in chunk.splitlines():
+            # Full-site dumps are mostly other subreddits; skip those before paying for a JSON parse
+            if marker not in line.lower():
+                continue
+            try:
+                data = json.loads(line)
+                if (data.get("subreddit") or "").lower() != wanted:
+                    continue
+
+                created = float(data["created_utc"])
+                if (since is not None and created < since) or (until is not None and created >= until):
+                    continue
+
+                if kind == SUBMISSIONS:
+                    records.append(self._post_from_json(data))
+                else:
+                    records.append(self._comment_from_json(data))
+            except (ValueError, KeyError, TypeError):
+                # Dumps end mid-line when cut, and very old records miss fields
+                continue
+
+        return records
+
+    def _iter_records(self, paths: Iterable[str], kind: str) -> Iterator[Any]:
+        """Decompress in this process, parse on the pool, and yield records in file order"""
+        since, until = _timestamp(self.since), _timestamp(self.until)
+        chunks = (chunk for path in paths for chunk in iter_ndjson_chunks(path, self.chunk_size))
+
+        if self.workers <= 1:
+            for chunk in chunks:
+                yield from self._from_worker(self._parse_chunk(chunk, kind, since, until))
+            return
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        in_flight: Deque[Future] = deque()
+        try:
+            for chunk in chunks:
+                in_flight.append(executor.submit(parse_chunk, chunk, kind, self.subreddit_name, since, until))
+                # Bounded read-ahead keeps memory flat however large the dump is
+                if len(in_flight) >= self.workers * 2:
+                    yield from self._from_worker(in_flight.popleft().result())
+
+            while in_flight:
+                yield from self._from_worker(in_flight.popleft().result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _from_worker(self, records: List[Any]) -> List[Any]:
+        # Workers always return plain records, which pickle cheaply; models are built on this side
+        return [record.to_model() for record in records] if self.as_models else records
+
+    def iter_archived_posts(self) -> Iterator[PostItem]:
+        """Every post of the subreddit and time range in the submission dumps"""
+        return self._iter_records(self.submission_files, SUBMISSIONS)
+
+    def iter_archived_comments(self) -> Iterator[CommentItem]:
+        """Every comment of the subreddit and time range in the comment dumps"""
+        return self._iter_records(self.comment_files, COMMENTS)
+
+    def extract_posts(self, limit: int = 10, time_filter: str = "all") -> List[PostItem]:
+        """Top posts by score, with the time filter counted back from the end of the archived range"""
+        posts = list(self.iter_archived_posts())
+        window = TIME_FILTER_SECONDS[time_filter]
+
+        if window is not None and posts:
+            end = _timestamp(self.until) or max(post.created_utc.timestamp() for post in posts)
+            posts = [post for post in posts if post.created_utc.timestamp() >= end - window]
+
+        return heapq.nlargest(limit, posts, key=lambda post: post.score or 0)
+
+    def extract_comments(self, post_id: str, limit: Optional[int] = None) -> List[CommentItem]:
+        """Comments of one post, in dump order; this scans every comment dump"""
+        return self._comments_by_post([post_id], limit).get(post_id, [])
+
+    def _comments_by_post(self, post_ids: Iterable[str], limit: Optional[int]) -> Dict[str, List[CommentItem]]:
+        """Group the comments of several posts in one scan of the comment dumps"""
+        grouped: Dict[str, List[CommentItem]] = {post_id: [] for post_id in post_ids}
+        for comment in self.iter_archived_comments():
+            comments = grouped.get(comment.post_id)
+            if comments is not None and not (limit and len(comments) >= limit):
+                comments.append(comment)
+        return grouped
+
+    def extract_posts_with_comments(
+            self,
+            limit: int = 10,
+            time_filter: str = "all",
+            comment_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Extract posts along with their comments"""
+        posts = self.extract_posts(limit, time_filter)
+        grouped = self._comments_by_post([post.id for post in posts], comment_limit)
+        all_comments = [comment for post in posts for comment in grouped[post.id]]
+
+        return {
+            "posts": posts,
+            "comments": all_comments,
+            "total_posts": len(posts),
+            "total_comments": len(all_comments)
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    extractor = ArchiveRedditExtractor("universityofauckland", submission_files=sys.argv[1:])
+    print(f"✅ Read {sum(1 for _ in extractor.iter_archived_posts())} archived posts")
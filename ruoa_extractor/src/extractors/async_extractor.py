@@ -0,0 +1,344 @@
+﻿import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import aiohttp
+
+from ruoa_extractor.src.extractors.abstract_extractor import AbstractRedditExtractor
+from ruoa_extractor.src.extractors.comment_expansion import (
+    MORECHILDREN_BATCH_SIZE, ExpansionBudget, ExpansionResult
+)
+from ruoa_extractor.src.extractors.rate_limit import RateLimiter, app_rate_limiter, retry_after_seconds
+from ruoa_extractor.src.core.records import PostItem, CommentItem
+from ruoa_extractor.src.config.config import get_reddit_settings, get_landing_settings, RedditSettings
+from ruoa_extractor.src.storage.raw_landing import RawLandingZone, configured_landing_zone
+
+T = TypeVar("T")
+
+
+class AsyncRedditClient:
+    """Shared aiohttp session, OAuth token and request limits for async extractors"""
+
+    TOKEN_URL = "https://www.reddit.com/api/v1/access_token"
+    API_BASE = "https://oauth.reddit.com"
+    # A request answered 429 is sent again after its Retry-After delay, at most this many times in all
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+            self,
+            reddit_settings: Optional[RedditSettings] = None,
+            max_concurrency: int = 8,
+            rate_limiter: Optional[RateLimiter] = None,
+            landing_zone: Optional[RawLandingZone] = None
+    ):
+        self.reddit_settings = reddit_settings or get_reddit_settings()
+        if not self.reddit_settings.is_configured():
+            raise ValueError("Reddit API credentials not properly configured")
+
+        self.max_concurrency = max_concurrency
+        self._rate_limiter = rate_limiter
+        # The same writer the PRAW extractors land into, so replays see both
+        self.landing_zone = landing_zone or configured_landing_zone(get_landing_settings())
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._token_lock: Optional[asyncio.Lock] = None
+        self._access_token: Optional[str] = None
+        self._token_expires_at = 0.0
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """The OAuth app's limiter, shared with PRAW extractors in this process and other jobs on the host"""
+        if self._rate_limiter is None:
+            self._rate_limiter = app_rate_limiter(self.reddit_settings)
+        return self._rate_limiter
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """Create the session and loop-bound primitives inside the running event loop"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={"User-Agent": self.reddit_settings.user_agent})
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._token_lock = asyncio.Lock()
+        return self._session
+
+    async def _get_token(self) -> str:
+        """Return a valid application-only OAuth token, fetching one when it is missing or expiring"""
+        session = await self._ensure_session()
+        async with self._token_lock:
+            if self._access_token and time.time() < self._token_expires_at - 60:
+                return self._access_token
+
+            auth = aiohttp.BasicAuth(self.reddit_settings.client_id, self.reddit_settings.client_secret)
+            async with session.post(self.TOKEN_URL, auth=auth, data={"grant_type": "client_credentials"}) as response:
+                response.raise_for_status()
+                payload = await response.json()
+
+            self._access_token = payload["access_token"]
+            self._token_expires_at = time.time() + float(payload.get("expires_in", 3600))
+            return self._access_token
+
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET an OAuth API path and decode the JSON body, pacing every attempt through the shared rate limiter"""
+        session = await self._ensure_session()
+        query = {key: value for key, value in (params or {}).items() if value is not None}
+        query["raw_json"] = 1
+        url = f"{self.API_BASE}{path}"
+        limiter = self.rate_limiter
+
+        async with self._semaphore:
+            for attempt in range(1, self.MAX_ATTEMPTS + 1):
+                # Reserves one request of the budget before sending, so concurrent requests cannot overspend it;
+                # acquire sleeps, so it waits on a worker thread instead of the event loop
+                await asyncio.to_thread(limiter.acquire)
+                token = await self._get_token()
+                async with session.get(
+                        url,
+                        params=query,
+                        headers={"Authorization": f"bearer {token}"}
+                ) as response:
+                    if response.status == 429:
+                        # Holds back every client of the app until the window Reddit asked for has passed
+                        limiter.throttle(retry_after_seconds(response.headers))
+                        if attempt < self.MAX_ATTEMPTS:
+                            continue
+                    else:
+                        limiter.update_from_headers(response.headers)
+                    response.raise_for_status()
+                    body = await response.read()
+
+                if self.landing_zone is not None:
+                    await asyncio.to_thread(self.landing_zone.append, "GET", url, query, response.status, body)
+                return json.loads(body)
+
+    async def close(self) -> None:
+        """Close the HTTP session; a later request opens a new one"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+        self._token_lock = None
+
+
+class AsyncCommentExpander:
+    """CommentExpander over the JSON endpoints: resolves a tree's "more" stubs in batched requests within a budget"""
+
+    def __init__(
+            self,
+            client: AsyncRedditClient,
+            submission: Dict[str, Any],
+            budget: ExpansionBudget = ExpansionBudget(),
+            clock: Callable[[], float] = time.monotonic,
+            batch_size: int = MORECHILDREN_BATCH_SIZE
+    ):
+        self._client = client
+        self._submission = submission
+        self.budget = budget
+        self.batch_size = batch_size
+        self._clock = clock
+        self._started = clock()
+        self._child_ids: Deque[str] = deque()
+        # Parent comment IDs of "continue this thread" links, which morechildren cannot expand
+        self._continuations: Deque[str] = deque()
+        self.requests = 0
+
+    def add(self, more: Dict[str, Any]) -> None:
+        """Queue a collapsed branch; its IDs are merged with other branches into full-size batches"""
+        if more.get("children"):
+            self._child_ids.extend(more["children"])
+        else:
+            self._continuations.append(more["parent_id"].split("_", 1)[1])
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._child_ids) + len(self._continuations)
+
+    def _within_budget(self) -> bool:
+        max_requests, max_seconds = self.budget
+        if max_requests is not None and self.requests >= max_requests:
+            return False
+        return max_seconds is None or self._clock() - self._started < max_seconds
+
+    async def next_batch(self) -> Optional[List[Dict[str, Any]]]:
+        """Resolve the next batch with one request; None once nothing is queued or the budget is spent"""
+        if not self.outstanding or not self._within_budget():
+            return None
+
+        self.requests += 1
+        if self._child_ids:
+            ids = [self._child_ids.popleft() for _ in range(min(self.batch_size, len(self._child_ids)))]
+            # Returns the requested comments and their loaded descendants flat, plus any deeper "more" stubs
+            response = await self._client.get_json("/api/morechildren", {
+                "api_type": "json",
+                "children": ",".join(ids),
+                "link_id": f"t3_{self._submission['id']}"
+            })
+            return response["json"]["data"]["things"]
+        return await self._continue_thread(self._continuations.popleft())
+
+    async def _continue_thread(self, comment_id: str) -> List[Dict[str, Any]]:
+        """Load the replies behind a "continue this thread" link through the comment's own permalink"""
+        response = await self._client.get_json(f"/comments/{self._submission['id']}/_/{comment_id}")
+        children = response[1]["data"]["children"]
+        replies = children[0]["data"].get("replies") if children else None
+        return replies["data"]["children"] if replies else []
+
+    def result(self, post_id: str, collected: int, truncated: bool = False) -> ExpansionResult:
+        """Summarize the tree once its walk has ended"""
+        outstanding = self.outstanding
+        if outstanding or truncated:
+            # num_comments also counts removed comments, so a finished tree is measured by what it holds
+            expected = max(self._submission.get("num_comments") or 0, collected + outstanding)
+        else:
+            expected = collected
+        return ExpansionResult(post_id, collected, outstanding, expected, self.requests, truncated)
+
+
+class AsyncRedditExtractor(AbstractRedditExtractor):
+    """Reddit extractor using asyncio and the OAuth JSON endpoints"""
+
+    def __init__(
+            self,
+            subreddit_name: str,
+            client: Optional[AsyncRedditClient] = None,
+            as_models: bool = False,
+            expansion_budget: Optional[ExpansionBudget] = None
+    ):
+        super().__init__(subreddit_name, as_models)
+        self.client = client or AsyncRedditClient()
+        self.expansion_budget = expansion_budget or ExpansionBudget()
+
+    async def extract_posts_async(self, limit: int = 10, time_filter: str = "day") -> AsyncIterator[PostItem]:
+        """Yield top posts from the subreddit page by page"""
+        after = None
+        fetched = 0
+
+        while fetched < limit:
+            listing = await self.client.get_json(
+                f"/r/{self.subreddit_name}/top",
+                {"t": time_filter, "limit": min(100, limit - fetched), "after": after}
+            )
+            children = listing["data"]["children"]
+
+            for child in children:
+                if child["kind"] == "t3":
+                    yield self._post_from_json(child["data"])
+                    fetched += 1
+                    if fetched >= limit:
+                        return
+
+            after = listing["data"].get("after")
+            if not after or not children:
+                return
+
+    async def extract_comments_async(
+            self,
+            post_id: str,
+            limit: Optional[int] = None
+    ) -> AsyncIterator[CommentItem]:
+        """Yield a post's comments breadth-first, expanding collapsed branches within the expansion budget,
+        and stopping as soon as `limit` comments were yielded"""
+        response = await self.client.get_json(f"/comments/{post_id}")
+        submission = response[0]["data"]["children"][0]["data"]
+        expander = AsyncCommentExpander(self.client, submission, self.expansion_budget)
+
+        pending = deque(response[1]["data"]["children"])
+        seen = set()
+
+        while True:
+            while pending and not (limit and len(seen) >= limit):
+                child = pending.popleft()
+                if child["kind"] == "t1":
+                    data = child["data"]
+                    # A continued thread can return comments that an earlier batch already delivered
+                    if data["id"] in seen:
+                        continue
+                    seen.add(data["id"])
+                    yield self._comment_from_json(data, post_id)
+                    replies = data.get("replies")
+                    if replies:
+                        pending.extend(replies["data"]["children"])
+                elif child["kind"] == "more":
+                    expander.add(child["data"])
+
+            if pending or (limit and len(seen) >= limit):
+                break
+            # Collapsed branches are only fetched once the loaded tree is exhausted, so IDs fill whole batches
+            resolved = await expander.next_batch()
+            if resolved is None:
+                break
+            pending.extend(resolved)
+
+        self.comment_expansions[post_id] = expander.result(post_id, len(seen), truncated=bool(pending))
+
+    async def extract_posts_with_comments_async(
+            self,
+            limit: int = 10,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None
+    ) -> AsyncIterator[Tuple[PostItem, List[CommentItem]]]:
+        """Yield each post with its comments, fetching all trees concurrently in completion order"""
+        posts = [post async for post in self.extract_posts_async(limit, time_filter)]
+
+        async def fetch(post: PostItem) -> Tuple[PostItem, List[CommentItem]]:
+            return post, [comment async for comment in self.extract_comments_async(post.id, comment_limit)]
+
+        for next_done in asyncio.as_completed([fetch(post) for post in posts]):
+            yield await next_done
+
+    def extract_posts(self, limit: int = 10, time_filter: str = "day") -> List[PostItem]:
+        """Extract Reddit posts from the subreddit"""
+        async def collect() -> List[PostItem]:
+            return [post async for post in self.extract_posts_async(limit, time_filter)]
+
+        return self._run_sync(collect)
+
+    def extract_comments(self, post_id: str, limit: Optional[int] = None) -> List[CommentItem]:
+        """Extract comments for a specific post"""
+        async def collect() -> List[CommentItem]:
+            return [comment async for comment in self.extract_comments_async(post_id, limit)]
+
+        return self._run_sync(collect)
+
+    def extract_posts_with_comments(
+            self,
+            limit: int = 10,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Extract posts along with their comments"""
+        async def collect() -> List[Tuple[PostItem, List[CommentItem]]]:
+            return [pair async for pair in self.extract_posts_with_comments_async(limit, time_filter, comment_limit)]
+
+        pairs = self._run_sync(collect)
+        posts = [post for post, _ in pairs]
+        all_comments = [comment for _, comments in pairs for comment in comments]
+
+        return {
+            "posts": posts,
+            "comments": all_comments,
+            "total_posts": len(posts),
+            "total_comments": len(all_comments)
+        }
+
+    def _run_sync(self, collect: Callable[[], Awaitable[T]]) -> T:
+        """Run a coroutine on a private event loop and close the session it opened"""
+        async def runner() -> T:
+            try:
+                return await collect()
+            finally:
+                await self.client.close()
+
+        return asyncio.run(runner())
+
+
+if __name__ == "__main__":
+    print("Testing AsyncRedditExtractor...")
+
+    try:
+        extractor = AsyncRedditExtractor("universityofauckland")
+        posts = extractor.extract_posts(limit=3, time_filter="week")
+        print(f"✅ Extracted {len(posts)} posts from r/{extractor.subreddit_name}")
+    except Exception as e:
+        print(f"❌ Error running async extractor: {e}")
+        print("Make sure to set REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, etc. in .env")
@@ -0,0 +1,139 @@
+﻿import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+
+import praw
+from praw.const import API_PATH
+from praw.models import MoreComments, Submission
+
+# /api/morechildren resolves at most 100 comment IDs per request
+MORECHILDREN_BATCH_SIZE = 100
+DEFAULT_MAX_REQUESTS = 4
+DEFAULT_MAX_SECONDS = 30.0
+
+
+class ExpansionBudget(NamedTuple):
+    """Most expansion requests and seconds spent on one comment tree; None means unlimited"""
+    max_requests: Optional[int] = DEFAULT_MAX_REQUESTS
+    max_seconds: Optional[float] = DEFAULT_MAX_SECONDS
+
+
+class ExpansionResult(NamedTuple):
+    """How much of one comment tree was collected, and what expanding its collapsed branches cost"""
+    post_id: str
+    collected: int
+    # Collapsed comment IDs and "continue this thread" links left unresolved
+    outstanding: int
+    # Lower bound on the tree size; equals `collected` when the tree is complete
+    expected: int
+    requests: int
+    # The comment limit stopped the walk before the tree was exhausted
+    truncated: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return self.outstanding == 0 and not self.truncated
+
+    @property
+    def completeness(self) -> float:
+        return self.collected / self.expected if self.expected else 1.0
+
+
+def summarize_expansions(results: Iterable[ExpansionResult]) -> Dict[str, Any]:
+    """Totals over several trees, with the share of their comments that was collected"""
+    summary = {"threads": 0, "threads_incomplete": 0, "requests": 0, "collected": 0, "expected": 0}
+    for result in results:
+        summary["threads"] += 1
+        summary["threads_incomplete"] += 0 if result.complete else 1
+        summary["requests"] += result.requests
+        summary["collected"] += result.collected
+        summary["expected"] += result.expected
+    return _with_completeness(summary)
+
+
+def combine_expansion_summaries(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Add two summaries, recomputing the completeness ratio from the combined counts"""
+    combined = {key: first[key] + second[key] for key in first if key != "completeness"}
+    return _with_completeness(combined)
+
+
+def _with_completeness(summary: Dict[str, Any]) -> Dict[str, Any]:
+    summary["completeness"] = summary["collected"] / summary["expected"] if summary["expected"] else 1.0
+    return summary
+
+
+class CommentExpander:
+    """Collects a tree's MoreComments and resolves them in batched /api/morechildren requests within a budget"""
+
+    def __init__(
+            self,
+            reddit: praw.Reddit,
+            submission: Submission,
+            budget: ExpansionBudget = ExpansionBudget(),
+            clock: Callable[[], float] = time.monotonic,
+            batch_size: int = MORECHILDREN_BATCH_SIZE
+    ):
+        self._reddit = reddit
+        self._submission = submission
+        self.budget = budget
+        self.batch_size = batch_size
+        self._clock = clock
+        self._started = clock()
+        self._child_ids: Deque[str] = deque()
+        # Parent comment IDs of "continue this thread" links, which morechildren cannot expand
+        self._continuations: Deque[str] = deque()
+        self.requests = 0
+
+    def add(self, more: MoreComments) -> None:
+        """Queue a collapsed branch; its IDs are merged with other branches into full-size batches"""
+        if more.children:
+            self._child_ids.extend(more.children)
+        else:
+            self._continuations.append(more.parent_id.split("_", 1)[1])
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._child_ids) + len(self._continuations)
+
+    def _within_budget(self) -> bool:
+        max_requests, max_seconds = self.budget
+        if max_requests is not None and self.requests >= max_requests:
+            return False
+        return max_seconds is None or self._clock() - self._started < max_seconds
+
+    def next_batch(self) -> Optional[List[Any]]:
+        """Resolve the next batch with one request; None once nothing is queued or the budget is spent"""
+        if not self.outstanding or not self._within_budget():
+            return None
+
+        self.requests += 1
+        if self._child_ids:
+            ids = [self._child_ids.popleft() for _ in range(min(self.batch_size, len(self._child_ids)))]
+            # Returns the requested comments and their loaded descendants flat, plus any deeper MoreComments
+            return self._reddit.post(API_PATH["morechildren"], data={
+                "children": ",".join(ids),
+                "link_id": self._submission.fullname,
+                "sort": self._submission.comment_sort
+            })
+        return self._continue_thread(self._continuations.popleft())
+
+    def _continue_thread(self, comment_id: str) -> List[Any]:
+        """Load the replies behind a "continue this thread" link through the comment's own permalink"""
+        path = f"{API_PATH['submission'].format(id=self._submission.id)}_/{comment_id}"
+        _, comments = self._reddit.get(path, params={"sort": self._submission.comment_sort})
+        return list(comments.children[0].replies) if comments.children else []
+
+    def result(self, post_id: str, collected: int, truncated: bool = False) -> ExpansionResult:
+        """Summarize the tree once its walk has ended"""
+        outstanding = self.outstanding
+        if outstanding or truncated:
+            # num_comments also counts removed comments, so a finished tree is measured by what it holds
+            expected = max(self._submission.num_comments or 0, collected + outstanding)
+        else:
+            expected = collected
+        return ExpansionResult(post_id, collected, outstanding, expected, self.requests, truncated)
+
+
+if __name__ == "__main__":
+    results = [ExpansionResult("abc123", 480, 0, 480, 3), ExpansionResult("def456", 150, 12, 600, 4)]
+    print(f"✅ Expansion summary: {summarize_expansions(results)}")
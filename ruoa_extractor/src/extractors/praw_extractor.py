@@ -1,75 +1,256 @@
-﻿from typing import List, Optional, Dict, Any
+﻿import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
 import praw
-from praw.models import Submission, Comment
+from praw.models import Submission, Comment, MoreComments
 
-from ruoa_extractor.src.extractors.abstract_extractor import AbstractRedditExtractor
-from ruoa_extractor.src.core.models import RedditPost, RedditComment
-from ruoa_extractor.src.config.config import get_reddit_settings
+from ruoa_extractor.src.extractors.abstract_extractor import AbstractRedditExtractor, CommentFetchResult
+from ruoa_extractor.src.extractors.comment_expansion import CommentExpander, ExpansionBudget
+from ruoa_extractor.src.extractors.rate_limit import RateLimiter, app_rate_limiter, default_state_path
+from ruoa_extractor.src.extractors.requestor import RateLimitedRequestor
+from ruoa_extractor.src.extractors.token_cache import TokenCache, install_token_cache
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord, PostItem, CommentItem
+from ruoa_extractor.src.config.config import get_reddit_settings, get_landing_settings
+from ruoa_extractor.src.storage.raw_landing import RawLandingZone, configured_landing_zone
+from ruoa_extractor.src.core.batching import chunked
 
 
 class PrawRedditExtractor(AbstractRedditExtractor):
     """Reddit extractor using PRAW (Python Reddit API Wrapper)"""
 
-    def __init__(self, subreddit_name: str):
-        super().__init__(subreddit_name)
+    # /api/info accepts at most 100 fullnames per request
+    INFO_BATCH_SIZE = 100
+
+    def __init__(
+            self,
+            subreddit_name: str,
+            rate_limiter: Optional[RateLimiter] = None,
+            as_models: bool = False,
+            reddit: Optional[praw.Reddit] = None,
+            expansion_budget: Optional[ExpansionBudget] = None,
+            landing_zone: Optional[RawLandingZone] = None
+    ):
+        super().__init__(subreddit_name, as_models)
         self.reddit_settings = get_reddit_settings()
-        self.reddit = self._initialize_reddit_client()
+        self.expansion_budget = expansion_budget or ExpansionBudget()
+        self._rate_limiter = rate_limiter
+        self.landing_zone = landing_zone or self._configured_landing_zone()
+        # Extractors for several subreddits can share one client (and its OAuth token)
+        self.reddit = reddit or self._initialize_reddit_client()
         self.subreddit = self.reddit.subreddit(subreddit_name)
+        self._thread_clients = threading.local()
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """Limiter shared by every client of this OAuth app in the process, and across processes via its state file"""
+        if self._rate_limiter is None:
+            self._rate_limiter = app_rate_limiter(self.reddit_settings)
+        return self._rate_limiter
+
+    @property
+    def token_cache(self) -> Optional[TokenCache]:
+        """OAuth token file shared by every job of this app on the host, or None when disabled"""
+        path = self.reddit_settings.token_cache_file
+        if path is None:
+            path = default_state_path(self.reddit_settings.client_id, kind="token")
+        return TokenCache(path) if path else None
+
+    def _configured_landing_zone(self) -> Optional[RawLandingZone]:
+        """Writer that keeps every raw JSON response this extractor receives, or None when RAW_LANDING_DIR is unset"""
+        return configured_landing_zone(get_landing_settings())
+
+    def _thread_client(self) -> praw.Reddit:
+        """PRAW is not thread safe, so each worker thread gets its own client"""
+        client = getattr(self._thread_clients, "reddit", None)
+        if client is None:
+            client = self._initialize_reddit_client()
+            self._thread_clients.reddit = client
+        return client
 
     def _initialize_reddit_client(self) -> praw.Reddit:
         """Initialize PRAW Reddit client with credentials (read-only access)"""
         if not self.reddit_settings.is_configured():
             raise ValueError("Reddit API credentials not properly configured")
 
-        return praw.Reddit(
+        reddit = praw.Reddit(
             client_id=self.reddit_settings.client_id,
             client_secret=self.reddit_settings.client_secret,
             user_agent=self.reddit_settings.user_agent,
+            requestor_class=RateLimitedRequestor,
+            requestor_kwargs={
+                "get_rate_limiter": lambda: self.rate_limiter,
+                "get_landing_zone": lambda: self.landing_zone,
+            },
         )
 
-    def extract_posts(self, limit: int = 10, time_filter: str = "day") -> List[RedditPost]:
+        # Reuse a still-valid token from an earlier run instead of a token round trip per process
+        token_cache = self.token_cache
+        if token_cache is not None:
+            install_token_cache(reddit, token_cache)
+        return reddit
+
+    def extract_posts(self, limit: int = 10, time_filter: str = "day") -> List[PostItem]:
         """Extract Reddit posts from the subreddit"""
+        return list(self.iter_posts(limit, time_filter))
+
+    def iter_posts(self, limit: int = 10, time_filter: str = "day") -> Iterator[PostItem]:
+        """Yield top posts as PRAW pages through the listing"""
+        for submission in self.subreddit.top(time_filter=time_filter, limit=limit):
+            yield self._submission_to_model(submission)
+
+    def extract_new_posts(self, since: Optional[float] = None, limit: int = 1000) -> List[PostItem]:
+        """Walk the subreddit's new listing newest-first, stopping at the first post at or before `since`"""
         posts = []
 
-        submissions = self.subreddit.top(time_filter=time_filter, limit=limit)
+        for submission in self.subreddit.new(limit=limit):
+            if since is not None and submission.created_utc <= since:
+                break
+            posts.append(self._submission_to_model(submission))
 
-        for submission in submissions:
-            post = self._submission_to_model(submission)
-            posts.append(post)
+        return posts
+
+    def stream_posts(self, pause_after: Optional[int] = -1) -> Iterator[Optional[PostItem]]:
+        """Follow the submission stream oldest-first; yields None after each poll, so callers can interleave"""
+        for submission in self.subreddit.stream.submissions(pause_after=pause_after):
+            yield None if submission is None else self._submission_to_model(submission)
+
+    def stream_comments(self, pause_after: Optional[int] = -1) -> Iterator[Optional[CommentItem]]:
+        """Follow the comment stream oldest-first; yields None after each poll, so callers can interleave"""
+        for comment in self.subreddit.stream.comments(pause_after=pause_after):
+            if comment is None:
+                yield None
+            else:
+                # link_id is "t3_<post id>"; reading comment.submission would cost a request per comment
+                yield self._comment_to_model(comment, comment.link_id.split("_", 1)[1])
+
+    def fetch_posts_info(self, post_ids: Iterable[str]) -> List[PostItem]:
+        """Re-fetch known posts by ID, one /api/info request per 100 posts"""
+        posts = []
+
+        for batch in chunked(post_ids, self.INFO_BATCH_SIZE):
+            for submission in self.reddit.info(fullnames=[f"t3_{post_id}" for post_id in batch]):
+                posts.append(self._submission_to_model(submission))
 
         return posts
 
-    def extract_comments(self, post_id: str, limit: Optional[int] = None) -> List[RedditComment]:
+    def extract_comments(self, post_id: str, limit: Optional[int] = None) -> List[CommentItem]:
         """Extract comments for a specific post"""
-        comments = []
+        return self._fetch_comments(self.reddit, post_id, limit)
 
-        submission = self.reddit.submission(id=post_id)
-        submission.comments.replace_more(limit=0)
+    def iter_comments(self, post_id: str, limit: Optional[int] = None) -> Iterator[CommentItem]:
+        """Yield a post's comments breadth-first, converting each only when it is consumed"""
+        return self._iter_comment_tree(self.reddit, post_id, limit)
 
-        comment_list = submission.comments.list()
-        if limit:
-            comment_list = comment_list[:limit]
+    def iter_posts_with_comments(
+            self,
+            limit: int = 10,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None
+    ) -> Iterator[Tuple[PostItem, Iterator[CommentItem]]]:
+        """Yield each post with a lazy comment iterator; a tree is only fetched when its iterator is consumed"""
+        for post in self.iter_posts(limit, time_filter):
+            yield post, self.iter_comments(post.id, comment_limit)
+
+    def iter_comments_concurrently(
+            self,
+            post_ids: Iterable[str],
+            limit: Optional[int] = None,
+            max_workers: int = 4
+    ) -> Iterator[CommentFetchResult]:
+        """Fetch comment trees on a bounded thread pool, yielding results in completion order"""
+        pending_ids = iter(post_ids)
+        in_flight = {}
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comment-fetch")
+        try:
+            while True:
+                # Keep at most one queued fetch per worker so unconsumed results cannot pile up
+                while len(in_flight) < max_workers * 2:
+                    post_id = next(pending_ids, None)
+                    if post_id is None:
+                        break
+                    in_flight[executor.submit(self._fetch_comments_in_worker, post_id, limit)] = post_id
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    post_id = in_flight.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        yield CommentFetchResult(post_id, [], error)
+                    else:
+                        yield CommentFetchResult(post_id, future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_comments_in_thread(self, post_id: str, limit: Optional[int] = None) -> Iterator[CommentItem]:
+        """Stream one comment tree from any thread, with that thread's client"""
+        return self._iter_comment_tree(self._thread_client(), post_id, limit)
 
-        for comment in comment_list:
-            if isinstance(comment, Comment):
-                comment_model = self._comment_to_model(comment, post_id)
-                comments.append(comment_model)
+    def _fetch_comments_in_worker(self, post_id: str, limit: Optional[int]) -> List[CommentItem]:
+        """Fetch one comment tree from a worker thread; every request it makes goes through the shared limiter"""
+        return self._fetch_comments(self._thread_client(), post_id, limit)
 
-        return comments
+    def _fetch_comments(self, reddit: praw.Reddit, post_id: str, limit: Optional[int]) -> List[CommentItem]:
+        """Fetch and convert the comment tree of one post with the given client"""
+        return list(self._iter_comment_tree(reddit, post_id, limit))
+
+    def _iter_comment_tree(self, reddit: praw.Reddit, post_id: str, limit: Optional[int]) -> Iterator[CommentItem]:
+        """Walk a post's comment forest breadth-first, expanding collapsed branches within the expansion budget,
+        and stopping as soon as `limit` comments were yielded"""
+        submission = reddit.submission(id=post_id)
+        expander = CommentExpander(reddit, submission, self.expansion_budget)
+
+        # Same order as CommentForest.list(), without flattening the whole tree up front
+        pending = deque(submission.comments)
+        seen = set()
+
+        while True:
+            while pending and not (limit and len(seen) >= limit):
+                item = pending.popleft()
+                if isinstance(item, Comment):
+                    # A continued thread can return comments that an earlier batch already delivered
+                    if item.id in seen:
+                        continue
+                    seen.add(item.id)
+                    yield self._comment_to_model(item, post_id)
+                    pending.extend(item.replies)
+                elif isinstance(item, MoreComments):
+                    expander.add(item)
+
+            if pending or (limit and len(seen) >= limit):
+                break
+            # Collapsed branches are only fetched once the loaded tree is exhausted, so IDs fill whole batches
+            resolved = expander.next_batch()
+            if resolved is None:
+                break
+            pending.extend(resolved)
+
+        self.comment_expansions[post_id] = expander.result(post_id, len(seen), truncated=bool(pending))
 
     def extract_posts_with_comments(
             self,
             limit: int = 10,
             time_filter: str = "day",
-            comment_limit: Optional[int] = None
+            comment_limit: Optional[int] = None,
+            max_workers: int = 1
     ) -> Dict[str, Any]:
         """Extract posts along with their comments"""
         posts = self.extract_posts(limit, time_filter)
         all_comments = []
 
-        for post in posts:
-            post_comments = self.extract_comments(post.id, comment_limit)
-            all_comments.extend(post_comments)
+        if max_workers > 1:
+            for result in self.iter_comments_concurrently([post.id for post in posts], comment_limit, max_workers):
+                if result.error is not None:
+                    raise result.error
+                all_comments.extend(result.comments)
+        else:
+            for post in posts:
+                post_comments = self.extract_comments(post.id, comment_limit)
+                all_comments.extend(post_comments)
 
         return {
             "posts": posts,
@@ -78,9 +259,9 @@ class PrawRedditExtractor(AbstractRedditExtractor):
             "total_comments": len(all_comments)
         }
 
-    def _submission_to_model(self, submission: Submission) -> RedditPost:
-        """Convert PRAW submission to RedditPost model"""
-        return RedditPost(
+    def _submission_to_model(self, submission: Submission) -> PostItem:
+        """Convert PRAW submission to a post record"""
+        return self._emit(PostRecord(
             id=submission.id,
             title=self._sanitize_text(submission.title),
             selftext=self._sanitize_text(submission.selftext),
@@ -97,11 +278,11 @@ class PrawRedditExtractor(AbstractRedditExtractor):
             is_self=submission.is_self,
             permalink=submission.permalink,
             post_hint=getattr(submission, 'post_hint', None),
-        )
+        ))
 
-    def _comment_to_model(self, comment: Comment, post_id: str) -> RedditComment:
-        """Convert PRAW comment to RedditComment model"""
-        return RedditComment(
+    def _comment_to_model(self, comment: Comment, post_id: str) -> CommentItem:
+        """Convert PRAW comment to a comment record"""
+        return self._emit(CommentRecord(
             id=comment.id,
             post_id=post_id,
             parent_id=comment.parent_id,
@@ -111,7 +292,7 @@ class PrawRedditExtractor(AbstractRedditExtractor):
             score=comment.score,
             is_submitter=comment.is_submitter,
             permalink=comment.permalink,
-        )
+        ))
 
 
 if __name__ == "__main__":
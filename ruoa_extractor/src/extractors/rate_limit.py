@@ -0,0 +1,207 @@
+﻿import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process can be coordinated
+    fcntl = None
+
+# Responses from the same server window can arrive out of order; resets this close apart are one window
+WINDOW_MATCH_SECONDS = 2.0
+# Reddit answers 429 without a Retry-After header at times; wait out a short window then
+DEFAULT_RETRY_AFTER_SECONDS = 10.0
+
+
+def _header_float(headers: Mapping[str, Any], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(headers: Mapping[str, Any]) -> float:
+    """Delay a 429 response asks for, or a short default when it names none"""
+    retry_after = _header_float(headers, "retry-after")
+    return retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS
+
+
+def default_state_path(client_id: str, kind: str = "ratelimit") -> Optional[str]:
+    """Per-OAuth-app state file in the temp dir, so every job using that app shares one budget (or token)"""
+    if fcntl is None:
+        return None
+    digest = hashlib.sha1(client_id.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"ruoa-{kind}-{digest}.json")
+
+
+class RateLimiter:
+    """Token bucket shared by threads (and optionally processes), re-synced from Reddit's X-Ratelimit headers"""
+
+    def __init__(
+            self,
+            max_requests: int = 100,
+            period_seconds: float = 60.0,
+            clock: Callable[[], float] = time.time,
+            sleep: Callable[[float], None] = time.sleep,
+            state_path: Optional[str] = None
+    ):
+        if max_requests < 1:
+            raise ValueError("max_requests must be at least 1")
+        if state_path is not None and fcntl is None:
+            raise ValueError("Sharing a rate limit between processes needs fcntl file locks")
+
+        self.max_requests = max_requests
+        self.period_seconds = period_seconds
+        self.capacity = float(max_requests)
+        self.refill_rate = max_requests / period_seconds
+        # Wall clock, not monotonic: the shared state file is read by other processes
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.state_path = state_path
+        self._state = self._initial_state()
+
+    def _initial_state(self) -> Dict[str, Any]:
+        return {"tokens": self.capacity, "updated_at": self._clock(), "remaining": None, "reset_at": None}
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, Any]]:
+        """Hold the thread lock, plus an exclusive lock on the state file when one is configured"""
+        with self._lock:
+            if self.state_path is None:
+                yield self._state
+                return
+
+            with open(self.state_path, "a+") as handle:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                try:
+                    handle.seek(0)
+                    try:
+                        state = json.loads(handle.read())
+                    except ValueError:
+                        state = self._initial_state()
+
+                    yield state
+
+                    handle.seek(0)
+                    handle.truncate()
+                    json.dump(state, handle)
+                    handle.flush()
+                finally:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        elapsed = max(0.0, now - state["updated_at"])
+        state["tokens"] = min(self.capacity, state["tokens"] + elapsed * self.refill_rate)
+        state["updated_at"] = now
+
+        if state["reset_at"] is not None and now >= state["reset_at"]:
+            # The server window rolled over; fall back to our own budget until the next response
+            state["remaining"] = None
+            state["reset_at"] = None
+
+    def _try_take(self, state: Dict[str, Any], now: float) -> float:
+        """Take one token and return 0, or return how long to wait before trying again"""
+        self._refill(state, now)
+
+        remaining = state["remaining"]
+        if remaining is not None and remaining < 1:
+            return state["reset_at"] - now
+
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            if remaining is not None:
+                state["remaining"] = remaining - 1
+            return 0.0
+
+        wait = (1 - state["tokens"]) / self.refill_rate
+        if state["reset_at"] is not None:
+            wait = min(wait, state["reset_at"] - now)
+        return wait
+
+    def acquire(self) -> None:
+        """Block until one more request fits in both our bucket and the server's remaining budget"""
+        while True:
+            with self._locked_state() as state:
+                wait = self._try_take(state, self._clock())
+
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+    def update(self, remaining: float, reset_seconds: float) -> None:
+        """Adopt the budget Reddit reports: `remaining` requests until the window resets in `reset_seconds`"""
+        with self._locked_state() as state:
+            now = self._clock()
+            self._refill(state, now)
+            reset_at = now + reset_seconds
+
+            same_window = state["reset_at"] is not None and abs(state["reset_at"] - reset_at) < WINDOW_MATCH_SECONDS
+            if same_window and state["remaining"] is not None:
+                # A late response cannot give back budget that newer requests already spent
+                remaining = min(remaining, state["remaining"])
+
+            state["remaining"] = remaining
+            state["reset_at"] = reset_at
+            state["tokens"] = min(state["tokens"], max(0.0, remaining))
+
+    def update_from_headers(self, headers: Mapping[str, Any]) -> None:
+        """Read X-Ratelimit-Remaining/Reset from a response, ignoring responses without them"""
+        remaining = _header_float(headers, "x-ratelimit-remaining")
+        reset = _header_float(headers, "x-ratelimit-reset")
+        if remaining is not None and reset is not None:
+            self.update(remaining, reset)
+
+    def throttle(self, retry_after: float) -> None:
+        """Spend the whole budget after a 429, so nobody sends again before `retry_after` seconds"""
+        self.update(0.0, retry_after)
+
+    def available(self) -> float:
+        """Requests that could be sent right now without waiting"""
+        with self._locked_state() as state:
+            self._refill(state, self._clock())
+            if state["remaining"] is None:
+                return state["tokens"]
+            return min(state["tokens"], state["remaining"])
+
+
+_shared_limiters: Dict[str, RateLimiter] = {}
+_shared_limiters_lock = threading.Lock()
+
+
+def shared_rate_limiter(key: str, max_requests: int = 100, state_path: Optional[str] = None) -> RateLimiter:
+    """One limiter per OAuth app in this process, so every extractor and thread draws from the same bucket"""
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(max_requests=max_requests, state_path=state_path)
+            _shared_limiters[key] = limiter
+        return limiter
+
+
+def app_rate_limiter(reddit_settings: Any) -> RateLimiter:
+    """Limiter of the configured OAuth app, shared in the process and across processes via its state file"""
+    state_path = reddit_settings.rate_limit_file
+    if state_path is None:
+        state_path = default_state_path(reddit_settings.client_id)
+    return shared_rate_limiter(
+        reddit_settings.client_id,
+        max_requests=reddit_settings.requests_per_minute,
+        state_path=state_path or None
+    )
+
+
+if __name__ == "__main__":
+    limiter = RateLimiter(max_requests=3, period_seconds=1.0)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    print(f"✅ 6 requests through a 3/s limiter took {time.monotonic() - start:.2f}s")
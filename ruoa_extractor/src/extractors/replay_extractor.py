@@ -0,0 +1,72 @@
+﻿from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from ruoa_extractor.src.extractors.archive_extractor import ArchiveRedditExtractor
+from ruoa_extractor.src.core.records import PostItem, CommentItem
+from ruoa_extractor.src.storage.raw_landing import iter_landed_records, list_segments
+
+POST_KIND = "t3"
+COMMENT_KIND = "t1"
+
+
+def iter_things(payload: Any, kind: str) -> Iterator[Dict[str, Any]]:
+    """Data of every `kind` thing anywhere in a response: listings, comment reply trees and morechildren results"""
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            data = node.get("data")
+            if node.get("kind") == kind and isinstance(data, dict):
+                yield data
+            # Replies of a comment sit inside its data; listings keep children there too
+            stack.extend(reversed(list(node.values())))
+
+
+class ReplayRedditExtractor(ArchiveRedditExtractor):
+    """Reddit extractor over landed raw API responses; rebuilds posts and comments without any API calls"""
+
+    def __init__(
+            self,
+            subreddit_name: str,
+            landing_dir: Optional[str] = None,
+            segment_paths: Sequence[str] = (),
+            as_models: bool = False
+    ):
+        super().__init__(subreddit_name, as_models=as_models, workers=1)
+        self.segment_paths = list(segment_paths) or (list_segments(landing_dir) if landing_dir else [])
+
+    def _latest(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        """Newest landed version of each thing of this subreddit, by when its response was received"""
+        wanted = self.subreddit_name.lower()
+        # Segment order is not arrival order when several writers land at once, so compare the envelopes
+        latest: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        for record in iter_landed_records(self.segment_paths):
+            received_at = record.get("received_at") or 0
+            for data in iter_things(record.get("body"), kind):
+                if (data.get("subreddit") or "").lower() == wanted and "id" in data:
+                    seen = latest.get(data["id"])
+                    if seen is None or received_at >= seen[0]:
+                        latest[data["id"]] = (received_at, data)
+
+        # Output follows the latest sighting
+        ordered = sorted(latest.items(), key=lambda entry: entry[1][0])
+        return {thing_id: data for thing_id, (_, data) in ordered}
+
+    def iter_archived_posts(self) -> Iterator[PostItem]:
+        """Latest landed version of every post of the subreddit"""
+        for data in self._latest(POST_KIND).values():
+            yield self._post_from_json(data)
+
+    def iter_archived_comments(self) -> Iterator[CommentItem]:
+        """Latest landed version of every comment of the subreddit"""
+        for data in self._latest(COMMENT_KIND).values():
+            yield self._comment_from_json(data)
+
+
+if __name__ == "__main__":
+    import sys
+
+    extractor = ReplayRedditExtractor("universityofauckland", landing_dir=sys.argv[1])
+    replayed = sum(1 for _ in extractor.iter_archived_posts())
+    print(f"✅ Replayed {replayed} posts from {len(extractor.segment_paths)} segments")
@@ -0,0 +1,53 @@
+﻿from typing import Any, Callable, Optional
+
+from prawcore import Requestor
+from requests import Response
+
+from ruoa_extractor.src.extractors.rate_limit import RateLimiter, retry_after_seconds
+from ruoa_extractor.src.storage.raw_landing import RawLandingZone
+
+
+def _is_json(response: Response) -> bool:
+    return response.headers.get("content-type", "").startswith("application/json")
+
+
+class RateLimitedRequestor(Requestor):
+    """prawcore requestor that paces every OAuth API call through a shared RateLimiter"""
+
+    def __init__(
+            self,
+            *args: Any,
+            get_rate_limiter: Callable[[], RateLimiter],
+            get_landing_zone: Callable[[], Optional[RawLandingZone]] = lambda: None,
+            **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        # Resolved on first use, so a client can be built before its limiter is configured
+        self._get_rate_limiter = get_rate_limiter
+        self._get_landing_zone = get_landing_zone
+
+    def request(self, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Response:
+        url = args[1] if len(args) > 1 else kwargs.get("url")
+        # Token requests go to www.reddit.com and do not count against the OAuth budget
+        if not str(url).startswith(self.oauth_url):
+            return super().request(*args, timeout=timeout, **kwargs)
+
+        limiter = self._get_rate_limiter()
+        limiter.acquire()
+        response = super().request(*args, timeout=timeout, **kwargs)
+
+        if response.status_code == 429:
+            limiter.throttle(retry_after_seconds(response.headers))
+        else:
+            limiter.update_from_headers(response.headers)
+
+        landing_zone = self._get_landing_zone()
+        if landing_zone is not None and response.status_code == 200 and _is_json(response):
+            method = args[0] if args else kwargs.get("method")
+            landing_zone.append(method, str(url), kwargs.get("params"), response.status_code, response.content)
+        return response
+
+
+if __name__ == "__main__":
+    requestor = RateLimitedRequestor(user_agent="pk-uoa-etl/1.0", get_rate_limiter=RateLimiter)
+    print(f"✅ Rate-limited requestor ready for {requestor.oauth_url}")
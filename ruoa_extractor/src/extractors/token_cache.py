@@ -0,0 +1,137 @@
+﻿import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import praw
+from prawcore.auth import BaseAuthenticator, ReadOnlyAuthorizer
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process cache, every process fetches its own token
+    fcntl = None
+
+# A cached token this close to expiry is replaced rather than handed to a starting job
+EXPIRY_MARGIN_SECONDS = 60.0
+# Private prawcore attribute holding a token's expiry, as of prawcore 3 and 4 (see requirements.txt)
+EXPIRY_ATTRIBUTE = "_expiration_timestamp_ns"
+
+logger = logging.getLogger("RedditTokenCache")
+
+
+def tracks_token_expiry() -> bool:
+    """Whether the installed prawcore judges token validity by the expiry attribute this cache sets"""
+    return EXPIRY_ATTRIBUTE in ReadOnlyAuthorizer.is_valid.__code__.co_names
+
+
+class TokenCache:
+    """Application-only OAuth tokens keyed by client_id in an fcntl-locked JSON file shared by the host's jobs"""
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise ValueError("Sharing OAuth tokens between processes needs fcntl file locks")
+        self.path = path
+
+    @contextmanager
+    def locked(self) -> Iterator[Dict[str, Any]]:
+        """Hold an exclusive lock on the cache file and yield its entries, writing them back on exit"""
+        # Tokens are credentials: only the owner may read the file
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    entries = json.loads(handle.read())
+                except ValueError:
+                    entries = {}
+
+                yield entries
+
+                handle.seek(0)
+                handle.truncate()
+                json.dump(entries, handle)
+                handle.flush()
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class CachedReadOnlyAuthorizer(ReadOnlyAuthorizer):
+    """Read-only authorizer that reuses a token from the TokenCache until it expires instead of fetching one"""
+
+    def __init__(
+            self,
+            *,
+            authenticator: BaseAuthenticator,
+            cache: TokenCache,
+            scopes: Optional[List[str]] = None,
+            clock: Callable[[], float] = time.time
+    ):
+        super().__init__(authenticator=authenticator, scopes=scopes)
+        self._cache = cache
+        # Wall clock, not monotonic: expiry times are read by other processes
+        self._clock = clock
+        self._rejected_token: Optional[str] = None
+
+    def _clear_access_token(self) -> None:
+        # prawcore clears the token after a 401; that token must not be adopted from the cache again
+        if getattr(self, "access_token", None) is not None:
+            self._rejected_token = self.access_token
+        super()._clear_access_token()
+
+    def _adopt(self, entry: Dict[str, Any], now: float) -> None:
+        self.access_token = entry["access_token"]
+        self.scopes = set(entry["scopes"])
+        self._expiration_timestamp_ns = time.monotonic_ns() + int((entry["expires_at"] - now) * 1e9)
+
+    def refresh(self) -> None:
+        """Adopt the cached token, or fetch and cache a new one while other jobs wait on the lock"""
+        client_id = self._authenticator.client_id
+        # Holding the lock across the fetch means jobs starting together request one token, not one each
+        with self._cache.locked() as entries:
+            now = self._clock()
+            entry = entries.get(client_id)
+            if (
+                    entry is not None
+                    and entry["access_token"] != self._rejected_token
+                    and entry["expires_at"] - now > EXPIRY_MARGIN_SECONDS
+            ):
+                self._adopt(entry, now)
+                return
+
+            super().refresh()
+            if not hasattr(self, EXPIRY_ATTRIBUTE):
+                logger.warning(f"prawcore keeps no {EXPIRY_ATTRIBUTE}; not caching the token")
+                return
+            entries[client_id] = {
+                "access_token": self.access_token,
+                "scopes": sorted(self.scopes),
+                "expires_at": now + (self._expiration_timestamp_ns - time.monotonic_ns()) / 1e9
+            }
+
+
+def install_token_cache(reddit: praw.Reddit, cache: TokenCache) -> None:
+    """Back a read-only PRAW client's authorizer with the cache; PRAW offers no option for this, so it is swapped"""
+    session = reddit._read_only_core
+    authorizer = session.authorizer
+    if type(authorizer) is not ReadOnlyAuthorizer:
+        return
+    if not tracks_token_expiry():
+        logger.warning("Unsupported prawcore version: OAuth tokens are not shared between jobs")
+        return
+    session._authorizer = CachedReadOnlyAuthorizer(authenticator=authorizer.authenticator, cache=cache)
+
+
+if __name__ == "__main__":
+    from ruoa_extractor.src.config.config import get_reddit_settings
+    from ruoa_extractor.src.extractors.rate_limit import default_state_path
+
+    settings = get_reddit_settings()
+    reddit = praw.Reddit(
+        client_id=settings.client_id,
+        client_secret=settings.client_secret,
+        user_agent=settings.user_agent
+    )
+    install_token_cache(reddit, TokenCache(default_state_path(settings.client_id, kind="token")))
+    print(f"✅ Authorized as read-only: {reddit.subreddit('universityofauckland').display_name}")
@@ -8,10 +8,14 @@ and loads them into a PostgreSQL database for analysis.
 import argparse
 import sys
 import logging
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 
-from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
-from ruoa_extractor.src.config.config import get_reddit_settings, get_database_url
+from ruoa_extractor.src.config.config import get_reddit_settings, get_database_url, get_landing_settings, get_lake_settings
+from ruoa_extractor.src.core.database import dispose_engines
+
+# Commands that never call the Reddit API; they skip the Reddit credential check and never import PRAW
+OFFLINE_COMMANDS = ('stats', 'import-archive', 'replay', 'compact', 'rollup')
 
 
 def setup_logging(log_level: str = "INFO") -> None:
@@ -28,17 +32,18 @@ def setup_logging(log_level: str = "INFO") -> None:
     )
 
 
-def check_configuration() -> bool:
-    """Check if application is properly configured"""
+def check_configuration(needs_reddit: bool = True) -> bool:
+    """Check if application is properly configured for a command"""
     logger = logging.getLogger(__name__)
 
-    reddit_settings = get_reddit_settings()
-    if not reddit_settings.is_configured():
-        logger.error("Reddit API credentials not configured!")
-        logger.error("Please set REDDIT_CLIENT_ID and REDDIT_CLIENT_SECRET in your .env file")
-        return False
+    if needs_reddit:
+        reddit_settings = get_reddit_settings()
+        if not reddit_settings.is_configured():
+            logger.error("Reddit API credentials not configured!")
+            logger.error("Please set REDDIT_CLIENT_ID and REDDIT_CLIENT_SECRET in your .env file")
+            return False
 
-    logger.info("Reddit API credentials configured")
+        logger.info("Reddit API credentials configured")
 
     try:
         db_url = get_database_url(use_test_db=False)
@@ -55,25 +60,48 @@ def run_single_extraction(
         post_limit: int = 25,
         time_filter: str = "day",
         comment_limit: int = None,
-        use_test_db: bool = False
+        use_test_db: bool = False,
+        storage_backend: str = "database",
+        comment_workers: int = 1,
+        incremental: bool = False,
+        max_comment_refreshes: int = None,
+        staged: bool = False,
+        expansion_budget: Any = None
 ) -> Dict[str, Any]:
     """Run a single extraction cycle"""
+    from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
     logger = logging.getLogger(__name__)
 
     logger.info(f"Starting single extraction for r/{subreddit}")
     logger.info(f"Parameters: posts={post_limit}, filter={time_filter}, comments={comment_limit}")
 
     try:
-        pipeline = RedditETLPipeline(subreddit, use_test_db=use_test_db)
+        pipeline = RedditETLPipeline(
+            subreddit,
+            use_test_db=use_test_db,
+            storage_backend=storage_backend,
+            comment_workers=comment_workers,
+            max_comment_refreshes=max_comment_refreshes,
+            expansion_budget=expansion_budget
+        )
 
         stats = pipeline.get_pipeline_stats()
         logger.info(f"Current stats - Posts: {stats['total_posts']}, Comments: {stats['total_comments']}")
 
-        results = pipeline.run_full_pipeline(
-            post_limit=post_limit,
-            time_filter=time_filter,
-            comment_limit=comment_limit
-        )
+        if staged:
+            results = pipeline.run_staged_pipeline(
+                post_limit=post_limit,
+                time_filter=time_filter,
+                comment_limit=comment_limit
+            )
+        else:
+            results = pipeline.run_full_pipeline(
+                post_limit=post_limit,
+                time_filter=time_filter,
+                comment_limit=comment_limit,
+                incremental=incremental
+            )
 
         duration = results['pipeline_duration_seconds']
         total_data = results['total_data_points']
@@ -83,6 +111,11 @@ def run_single_extraction(
         logger.info(f"Posts: {results['posts']['posts_saved']} saved, {results['posts']['posts_skipped']} skipped")
         logger.info(
             f"Comments: {results['comments']['comments_saved']} saved, {results['comments']['comments_skipped']} skipped")
+        expansion = results['comments']['expansion']
+        logger.info(
+            f"Comment trees: {expansion['completeness']:.1%} complete, {expansion['threads_incomplete']} of "
+            f"{expansion['threads']} cut short, {expansion['requests']} expansion requests"
+        )
 
         return results
 
@@ -91,20 +124,123 @@ def run_single_extraction(
         raise
 
 
+def run_async_extraction(
+        subreddits: List[str],
+        post_limit: int = 25,
+        time_filter: str = "day",
+        comment_limit: int = None,
+        use_test_db: bool = False,
+        storage_backend: str = "database",
+        max_concurrency: int = 8,
+        max_comment_refreshes: int = None,
+        expansion_budget: Any = None
+) -> Dict[str, Any]:
+    """Run one extraction cycle for several subreddits on a single event loop"""
+    from ruoa_extractor.src.pipeline.async_pipeline import AsyncRedditETLPipeline
+
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting async extraction for {', '.join(f'r/{name}' for name in subreddits)}")
+
+    try:
+        pipeline = AsyncRedditETLPipeline(
+            subreddits,
+            use_test_db=use_test_db,
+            storage_backend=storage_backend,
+            max_concurrency=max_concurrency,
+            max_comment_refreshes=max_comment_refreshes,
+            expansion_budget=expansion_budget
+        )
+        results = pipeline.run_full_pipeline(
+            post_limit=post_limit,
+            time_filter=time_filter,
+            comment_limit=comment_limit
+        )
+
+        logger.info(f"Async extraction completed in {results['pipeline_duration_seconds']:.2f}s")
+        for name, result in results['subreddits'].items():
+            logger.info(
+                f"r/{name} - Posts: {result['posts']['posts_saved']} saved, "
+                f"Comments: {result['comments']['comments_saved']} saved"
+            )
+
+        return results
+
+    except Exception as e:
+        logger.error(f"Async extraction failed: {e}")
+        raise
+
+
+def run_multi_extraction(
+        jobs: List[Any],
+        use_test_db: bool = False,
+        storage_backend: str = "database",
+        max_comment_refreshes: int = None,
+        expansion_budget: Any = None
+) -> Dict[str, Any]:
+    """Run one extraction cycle for several subreddits sharing one client, pool and rate limit"""
+    from ruoa_extractor.src.pipeline.multi import MultiSubredditRunner
+
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting multi-subreddit extraction for {len(jobs)} subreddits")
+
+    try:
+        runner = MultiSubredditRunner(
+            jobs,
+            use_test_db=use_test_db,
+            storage_backend=storage_backend,
+            max_comment_refreshes=max_comment_refreshes,
+            expansion_budget=expansion_budget
+        )
+        results = runner.run()
+
+        logger.info(f"Multi-subreddit extraction completed in {results['pipeline_duration_seconds']:.2f}s")
+        for name, result in results['subreddits'].items():
+            status = f" (failed: {result['error']})" if 'error' in result else ""
+            logger.info(
+                f"r/{name} - Posts: {result['posts']['posts_saved']} saved, "
+                f"Comments: {result['comments']['comments_saved']} saved in {result['steps']} steps{status}"
+            )
+
+        return results
+
+    except Exception as e:
+        logger.error(f"Multi-subreddit extraction failed: {e}")
+        raise
+
+
 def run_continuous_mode(
         subreddit: str = "universityofauckland",
-        interval_hours: int = 12,
+        interval_hours: float = 12,
         post_limit: int = 25,
         time_filter: str = "day",
-        comment_limit: int = None
+        comment_limit: int = None,
+        storage_backend: str = "database",
+        comment_workers: int = 1,
+        incremental: bool = False,
+        max_comment_refreshes: int = None,
+        staged: bool = False,
+        min_interval_minutes: float = 15,
+        max_interval_hours: float = 48,
+        target_items: int = 100,
+        expansion_budget: Any = None
 ) -> None:
-    """Run continuous extraction every N hours"""
+    """Run extraction continuously, waiting longer when the subreddit is quiet and less when it is busy"""
     import time
+    from ruoa_extractor.src.pipeline.scheduling import AdaptiveScheduler
 
     logger = logging.getLogger(__name__)
-    logger.info(f"Starting continuous mode - every {interval_hours} hours")
+    logger.info(
+        f"Starting continuous mode - every {interval_hours} hours, adapting between "
+        f"{min_interval_minutes} minutes and {max_interval_hours} hours"
+    )
 
     interval_seconds = interval_hours * 3600
+    scheduler = AdaptiveScheduler(
+        base_interval=interval_seconds,
+        min_interval=min(min_interval_minutes * 60, interval_seconds),
+        max_interval=max(max_interval_hours * 3600, interval_seconds),
+        target_items=target_items
+    )
 
     try:
         while True:
@@ -114,38 +250,323 @@ def run_continuous_mode(
                     post_limit=post_limit,
                     time_filter=time_filter,
                     comment_limit=comment_limit,
-                    use_test_db=False
+                    use_test_db=False,
+                    storage_backend=storage_backend,
+                    comment_workers=comment_workers,
+                    incremental=incremental,
+                    max_comment_refreshes=max_comment_refreshes,
+                    staged=staged,
+                    expansion_budget=expansion_budget
                 )
 
-                logger.info(f"Sleeping for {interval_hours} hours until next extraction...")
-                time.sleep(interval_seconds)
+                delay = scheduler.record_success(subreddit, results['total_data_points'])
+                logger.info(
+                    f"Found {results['total_data_points']} new items, "
+                    f"sleeping {delay / 60:.1f} minutes until next extraction..."
+                )
+                time.sleep(delay)
 
             except KeyboardInterrupt:
                 logger.info("Received interrupt signal, stopping continuous mode")
                 break
             except Exception as e:
                 logger.error(f"Error in continuous cycle: {e}")
-                logger.info(f"Waiting {interval_hours} hours before retry...")
-                time.sleep(interval_seconds)
+                delay = scheduler.record_failure(subreddit)
+                logger.info(f"Retrying in {delay:.0f} seconds...")
+                time.sleep(delay)
 
     except KeyboardInterrupt:
         logger.info("Continuous mode stopped by user")
+    finally:
+        dispose_engines()
+
+
+def run_daemon_mode(
+        subreddit: str = "universityofauckland",
+        interval_hours: float = 1,
+        post_limit: int = 25,
+        time_filter: str = "day",
+        comment_limit: int = None,
+        storage_backend: str = "database",
+        comment_workers: int = 1,
+        incremental: bool = False,
+        max_comment_refreshes: int = None,
+        staged: bool = False,
+        min_interval_minutes: float = 15,
+        max_interval_hours: float = 48,
+        target_items: int = 100,
+        recheck_schema: bool = False,
+        expansion_budget: Any = None
+) -> Dict[str, Any]:
+    """Run cycles on one pipeline built at startup, until interrupted or sent SIGTERM"""
+    import signal
+    from ruoa_extractor.src.pipeline.daemon import RedditDaemon
+    from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+    from ruoa_extractor.src.pipeline.scheduling import AdaptiveScheduler
+
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting daemon for r/{subreddit} - schema recheck {'every cycle' if recheck_schema else 'at startup'}")
+
+    interval_seconds = interval_hours * 3600
+    try:
+        pipeline = RedditETLPipeline(
+            subreddit,
+            storage_backend=storage_backend,
+            comment_workers=comment_workers,
+            max_comment_refreshes=max_comment_refreshes,
+            expansion_budget=expansion_budget
+        )
+        daemon = RedditDaemon(
+            pipeline,
+            AdaptiveScheduler(
+                base_interval=interval_seconds,
+                min_interval=min(min_interval_minutes * 60, interval_seconds),
+                max_interval=max(max_interval_hours * 3600, interval_seconds),
+                target_items=target_items
+            ),
+            post_limit=post_limit,
+            time_filter=time_filter,
+            comment_limit=comment_limit,
+            incremental=incremental,
+            staged=staged,
+            recheck_schema=recheck_schema
+        )
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+        try:
+            return daemon.run()
+        except KeyboardInterrupt:
+            logger.info("Daemon stopped by user")
+            return {}
+    finally:
+        dispose_engines()
+
+
+def run_metric_refresh(
+        subreddit: str = "universityofauckland",
+        max_posts: int = 1000,
+        max_age_days: float = 7,
+        comment_limit: int = None,
+        use_test_db: bool = False,
+        comment_workers: int = 1,
+        max_comment_refreshes: int = None,
+        expansion_budget: Any = None
+) -> Dict[str, Any]:
+    """Refresh score and comment counts of recently stored posts"""
+    from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting metric refresh for r/{subreddit} - up to {max_posts} posts from the last {max_age_days} days")
+
+    try:
+        pipeline = RedditETLPipeline(
+            subreddit,
+            use_test_db=use_test_db,
+            comment_workers=comment_workers,
+            max_comment_refreshes=max_comment_refreshes,
+            expansion_budget=expansion_budget
+        )
+        results = pipeline.refresh_post_metrics(
+            max_posts=max_posts,
+            max_age_days=max_age_days,
+            comment_limit=comment_limit
+        )
+
+        logger.info(f"Posts: {results['posts_updated']} of {results['posts_requested']} updated")
+        logger.info(f"Comments: {results['comments']['comments_saved']} saved")
+
+        return results
+
+    except Exception as e:
+        logger.error(f"Metric refresh failed: {e}")
+        raise
+
+
+def run_stream_mode(
+        subreddits: List[str],
+        flush_size: int = 100,
+        flush_interval: float = 5.0,
+        use_test_db: bool = False,
+        storage_backend: str = "database"
+) -> Dict[str, Any]:
+    """Follow live submissions and comments until interrupted, resuming from the stored stream position"""
+    from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
+    logger = logging.getLogger(__name__)
+
+    # PRAW streams several subreddits at once through a "a+b" multireddit
+    subreddit = "+".join(subreddits)
+    logger.info(f"Starting stream for r/{subreddit} - flushing every {flush_size} items or {flush_interval}s")
+
+    try:
+        pipeline = RedditETLPipeline(subreddit, use_test_db=use_test_db, storage_backend=storage_backend)
+        try:
+            results = pipeline.run_stream(flush_size=flush_size, flush_interval=flush_interval)
+        except KeyboardInterrupt:
+            logger.info("Stream stopped by user")
+            return {}
+
+        logger.info(
+            f"Posts: {results['posts']['posts_saved']} saved, Comments: {results['comments']['comments_saved']} saved"
+        )
+        return results
+
+    except Exception as e:
+        logger.error(f"Stream failed: {e}")
+        raise
+    finally:
+        dispose_engines()
+
+
+def run_archive_import(
+        subreddit: str,
+        submission_files: List[str],
+        comment_files: List[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        workers: Optional[int] = None,
+        use_test_db: bool = False
+) -> Dict[str, Any]:
+    """Bulk load posts and comments of one subreddit from local Pushshift-style dumps"""
+    from ruoa_extractor.src.core.database import DatabaseManager
+    from ruoa_extractor.src.extractors.archive_extractor import ArchiveRedditExtractor
+    from ruoa_extractor.src.pipeline.archive_import import ArchiveImportPipeline
+    from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
+
+    logger = logging.getLogger(__name__)
+    logger.info(
+        f"Starting archive import for r/{subreddit} from {len(submission_files)} submission and "
+        f"{len(comment_files)} comment dumps"
+    )
+
+    try:
+        db_manager = DatabaseManager(get_database_url(use_test_db=use_test_db))
+        db_manager.ensure_schema()
+        extractor = ArchiveRedditExtractor(
+            subreddit,
+            submission_files=submission_files,
+            comment_files=comment_files,
+            since=since,
+            until=until,
+            workers=workers
+        )
+        results = ArchiveImportPipeline(extractor, CopyRedditStorage(db_manager)).run()
+
+        logger.info(f"Archive import completed in {results['import_duration_seconds']:.2f}s")
+        logger.info(f"Posts: {results['posts']['posts_saved']} saved, {results['posts']['posts_skipped']} skipped")
+        logger.info(
+            f"Comments: {results['comments']['comments_saved']} saved, "
+            f"{results['comments']['orphaned']} without a stored post"
+        )
+        return results
+
+    except Exception as e:
+        logger.error(f"Archive import failed: {e}")
+        raise
+    finally:
+        dispose_engines()
+
+
+def run_replay(subreddit: str, landing_dir: str, use_test_db: bool = False) -> Dict[str, Any]:
+    """Rebuild posts and comments of one subreddit from landed raw API responses, without calling the API"""
+    from ruoa_extractor.src.core.database import DatabaseManager
+    from ruoa_extractor.src.extractors.replay_extractor import ReplayRedditExtractor
+    from ruoa_extractor.src.pipeline.archive_import import ArchiveImportPipeline
+    from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
+
+    logger = logging.getLogger(__name__)
+
+    try:
+        extractor = ReplayRedditExtractor(subreddit, landing_dir=landing_dir)
+        logger.info(f"Starting replay for r/{subreddit} from {len(extractor.segment_paths)} segments in {landing_dir}")
+
+        db_manager = DatabaseManager(get_database_url(use_test_db=use_test_db))
+        db_manager.ensure_schema()
+        # Replay overwrites stored rows, so it can repair what an earlier transform got wrong
+        results = ArchiveImportPipeline(extractor, CopyRedditStorage(db_manager), update_existing=True).run()
+
+        logger.info(f"Replay completed in {results['import_duration_seconds']:.2f}s")
+        logger.info(f"Posts: {results['posts']['posts_saved']} saved, {results['posts']['posts_updated']} overwritten")
+        logger.info(
+            f"Comments: {results['comments']['comments_saved']} saved, "
+            f"{results['comments']['comments_updated']} overwritten, "
+            f"{results['comments']['orphaned']} without a stored post"
+        )
+        return results
+
+    except Exception as e:
+        logger.error(f"Replay failed: {e}")
+        raise
+    finally:
+        dispose_engines()
+
+
+def run_lake_compaction(lake_dir: str, target_file_mb: float = 128, remove_orphans: bool = False) -> Dict[str, Any]:
+    """Merge small Parquet files of the lake, keep the latest version of each row and refresh the manifests"""
+    from ruoa_extractor.src.storage.lake_compaction import LakeCompactor
+
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting lake compaction of {lake_dir} - target {target_file_mb} MB per file")
+
+    try:
+        compactor = LakeCompactor(lake_dir, target_file_bytes=int(target_file_mb * 1024 * 1024))
+        results = compactor.compact()
+        logger.info(
+            f"Compacted {results['partitions_compacted']} partitions: {results['files_removed']} files into "
+            f"{results['files_written']}, {results['duplicates_removed']} superseded rows dropped"
+        )
+        if remove_orphans:
+            results["orphans_removed"] = compactor.remove_orphans()
+        return results
+
+    except Exception as e:
+        logger.error(f"Lake compaction failed: {e}")
+        raise
+
+
+def run_metric_rollup(use_test_db: bool = False) -> Dict[str, int]:
+    """Downsample metric snapshots of older posts and comments to hourly and daily points"""
+    from ruoa_extractor.src.core.database import DatabaseManager
+    from ruoa_extractor.src.storage.metric_snapshots import MetricSnapshotRollup
+
+    logger = logging.getLogger(__name__)
+
+    try:
+        db_manager = DatabaseManager(get_database_url(use_test_db=use_test_db))
+        db_manager.ensure_schema()
+        results = MetricSnapshotRollup(db_manager).run()
+        logger.info(
+            f"Rolled up snapshots: {results['post_snapshots_removed']} post and "
+            f"{results['comment_snapshots_removed']} comment points removed"
+        )
+        return results
+
+    except Exception as e:
+        logger.error(f"Metric rollup failed: {e}")
+        raise
+    finally:
+        dispose_engines()
 
 
 def show_stats(subreddit: str = "universityofauckland", use_test_db: bool = False) -> None:
-    """Show current pipeline statistics"""
+    """Show current pipeline statistics, reading the database directly without building an extractor"""
+    from ruoa_extractor.src.core.database import DatabaseManager
+    from ruoa_extractor.src.storage.database_storage import DatabaseRedditStorage
+
     logger = logging.getLogger(__name__)
 
     try:
-        pipeline = RedditETLPipeline(subreddit, use_test_db=use_test_db)
-        stats = pipeline.get_pipeline_stats()
+        database_url = get_database_url(use_test_db=use_test_db)
+        db_manager = DatabaseManager(database_url)
+        db_manager.ensure_schema()
+        storage = DatabaseRedditStorage(db_manager)
 
         print(f"\nPipeline Statistics for r/{subreddit}")
         print("=" * 50)
-        print(f"Total Posts: {stats['total_posts']:,}")
-        print(f"Total Comments: {stats['total_comments']:,}")
-        print(f"Latest Post: {stats['latest_post_timestamp']}")
-        print(f"Database: {stats['database_url'].split('@')[0]}@[HIDDEN]")
+        print(f"Total Posts: {storage.get_post_count(subreddit):,}")
+        print(f"Total Comments: {storage.get_comment_count(subreddit):,}")
+        print(f"Latest Post: {storage.get_latest_post_timestamp(subreddit)}")
+        print(f"Database: {database_url.split('@')[0]}@[HIDDEN]")
         print("=" * 50)
 
     except Exception as e:
@@ -162,15 +583,31 @@ Examples:
   python main.py extract                           # Extract 25 posts from today
   python main.py extract --posts 50 --filter week # Extract 50 posts from this week
   python main.py extract --comments 20            # Limit comments per post to 20
+  python main.py extract --expand-requests 20     # Resolve up to 2000 collapsed comments per thread
   python main.py continuous --interval 6          # Run every 6 hours
+  python main.py continuous --incremental         # Only fetch posts newer than the last run
+  python main.py daemon --interval 1 --min-interval 5  # One warm pipeline, cycles every few minutes
   python main.py stats                             # Show current statistics
+  python main.py refresh --refresh-days 3         # Update metrics of posts from the last 3 days
   python main.py extract --test                   # Use test database
+  python main.py extract --storage copy           # Bulk load through PostgreSQL COPY
+  python main.py extract --comment-workers 4      # Fetch 4 comment trees at a time
+  python main.py extract --staged                 # Load while posts and comments are still downloading
+  python main.py extract --extractor async --subreddit universityofauckland,newzealand
+  python main.py multi --subreddit universityofauckland:3,newzealand --budget 20
+  python main.py multi --jobs jobs.json           # Subreddits, weights and budgets from a job file
+  python main.py stream --subreddit universityofauckland,newzealand --flush-size 50
+  python main.py import-archive --archive-posts RS_2023-01.zst --archive-comments RC_2023-01.zst
+  python main.py replay --raw-landing /data/raw      # Rebuild tables from landed API responses
+  python main.py compact --lake /data/lake         # Merge small Parquet files and refresh manifests
+  python main.py rollup                            # Thin metric snapshots of older posts to hourly/daily points
         """
     )
 
     parser.add_argument(
         'command',
-        choices=['extract', 'continuous', 'stats'],
+        choices=['extract', 'continuous', 'daemon', 'stats', 'refresh', 'multi', 'stream', 'import-archive', 'replay',
+                 'compact', 'rollup'],
         help='Command to run'
     )
 
@@ -202,9 +639,193 @@ Examples:
 
     parser.add_argument(
         '--interval',
-        type=int,
+        type=float,
         default=12,
-        help='Hours between extractions in continuous mode (default: 12)'
+        help='Starting hours between extractions in continuous mode, adapted to activity (default: 12)'
+    )
+
+    parser.add_argument(
+        '--min-interval',
+        type=float,
+        default=15,
+        help='Shortest wait between continuous cycles for a busy subreddit, in minutes (default: 15)'
+    )
+
+    parser.add_argument(
+        '--max-interval',
+        type=float,
+        default=48,
+        help='Longest wait between continuous cycles for an idle subreddit, in hours (default: 48)'
+    )
+
+    parser.add_argument(
+        '--target-items',
+        type=int,
+        default=100,
+        help='New posts and comments a continuous cycle should find at the observed rate (default: 100)'
+    )
+
+    parser.add_argument(
+        '--refresh-days',
+        type=float,
+        default=7,
+        help='Refresh metrics of posts created within this many days (default: 7)'
+    )
+
+    parser.add_argument(
+        '--refresh-limit',
+        type=int,
+        default=1000,
+        help='Most stored posts to refresh, newest first; 100 per API request (default: 1000)'
+    )
+
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Walk new posts down to the stored per-subreddit watermark instead of re-listing top posts'
+    )
+
+    parser.add_argument(
+        '--staged',
+        action='store_true',
+        help='Overlap post extraction, comment fetching and database writes behind bounded queues'
+    )
+
+    parser.add_argument(
+        '--max-comment-refreshes',
+        type=int,
+        help='Cap on already-stored posts whose grown comment threads are refetched, largest growth first'
+    )
+
+    parser.add_argument(
+        '--expand-requests',
+        type=int,
+        default=4,
+        help='Batched requests per comment tree for collapsed "load more" branches, 100 comments each; '
+             '0 drops them (default: 4)'
+    )
+
+    parser.add_argument(
+        '--expand-seconds',
+        type=float,
+        default=30,
+        help='Time budget per comment tree for expanding collapsed branches, in seconds (default: 30)'
+    )
+
+    parser.add_argument(
+        '--recheck-schema',
+        action='store_true',
+        help='Daemon mode: create and inspect tables before every cycle instead of trusting the stored schema version'
+    )
+
+    parser.add_argument(
+        '--flush-size',
+        type=int,
+        default=100,
+        help='Stream mode: write a micro-batch once this many items are buffered (default: 100)'
+    )
+
+    parser.add_argument(
+        '--flush-interval',
+        type=float,
+        default=5.0,
+        help='Stream mode: write buffered items at least this often, in seconds (default: 5)'
+    )
+
+    parser.add_argument(
+        '--jobs',
+        help='JSON job file for the multi command: subreddits with optional weight, budget and limits'
+    )
+
+    parser.add_argument(
+        '--budget',
+        type=int,
+        help='Most comment trees fetched per subreddit per multi run; the rest wait for the next run'
+    )
+
+    parser.add_argument(
+        '--archive-posts',
+        action='append',
+        default=[],
+        help='Archive import: submission dump (.zst or plain NDJSON); repeat for several files'
+    )
+
+    parser.add_argument(
+        '--archive-comments',
+        action='append',
+        default=[],
+        help='Archive import: comment dump (.zst or plain NDJSON); repeat for several files'
+    )
+
+    parser.add_argument(
+        '--since',
+        type=datetime.fromisoformat,
+        help='Archive import: only records created at or after this UTC date, e.g. 2020-01-01'
+    )
+
+    parser.add_argument(
+        '--until',
+        type=datetime.fromisoformat,
+        help='Archive import: only records created before this UTC date'
+    )
+
+    parser.add_argument(
+        '--archive-workers',
+        type=int,
+        help='Archive import: processes parsing dump chunks (default: one per CPU)'
+    )
+
+    parser.add_argument(
+        '--raw-landing',
+        default=get_landing_settings().directory,
+        help='Replay: directory of landed raw response segments (default: RAW_LANDING_DIR)'
+    )
+
+    parser.add_argument(
+        '--lake',
+        default=get_lake_settings().directory,
+        help='Compact: root directory of the Parquet lake (default: LAKE_DIR)'
+    )
+
+    parser.add_argument(
+        '--target-file-mb',
+        type=float,
+        default=128,
+        help='Compact: size of the merged Parquet files in MB (default: 128)'
+    )
+
+    parser.add_argument(
+        '--remove-orphans',
+        action='store_true',
+        help='Compact: also delete Parquet files the manifest does not list, left over an hour by crashed writers'
+    )
+
+    parser.add_argument(
+        '--comment-workers',
+        type=int,
+        default=1,
+        help='Posts whose comments are fetched concurrently (default: 1)'
+    )
+
+    parser.add_argument(
+        '--max-concurrency',
+        type=int,
+        default=8,
+        help='Async extractor: most Reddit requests in flight at once; lower it when rate limited (default: 8)'
+    )
+
+    parser.add_argument(
+        '--extractor',
+        choices=['praw', 'async'],
+        default='praw',
+        help='Extractor: PRAW, or asyncio over the OAuth API with comma-separated subreddits (default: praw)'
+    )
+
+    parser.add_argument(
+        '--storage',
+        choices=['database', 'copy'],
+        default='database',
+        help='Storage backend: row upserts or PostgreSQL COPY bulk loading (default: database)'
     )
 
     parser.add_argument(
@@ -222,23 +843,93 @@ Examples:
 
     args = parser.parse_args()
 
+    if args.staged and args.incremental:
+        parser.error("--staged lists top posts and cannot be combined with --incremental")
+    if args.extractor == 'async' and (args.staged or args.incremental):
+        parser.error("--extractor async lists top posts on its own schedule and cannot be combined with "
+                     "--staged or --incremental")
+    if args.command == 'import-archive' and not (args.archive_posts or args.archive_comments):
+        parser.error("import-archive needs --archive-posts and/or --archive-comments")
+    if args.command == 'replay' and not args.raw_landing:
+        parser.error("replay needs --raw-landing or RAW_LANDING_DIR")
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    if args.command == 'compact' and not args.lake:
+        parser.error("compact needs --lake or LAKE_DIR")
+
     setup_logging(args.log_level)
     logger = logging.getLogger(__name__)
 
     logger.info(f"Starting Reddit ETL Pipeline - Command: {args.command}")
 
-    if not check_configuration():
+    if not check_configuration(needs_reddit=args.command not in OFFLINE_COMMANDS):
         logger.error("Configuration check failed. Please fix configuration and try again.")
         sys.exit(1)
 
+    expansion_budget = None
+    if args.command not in OFFLINE_COMMANDS:
+        from ruoa_extractor.src.extractors.comment_expansion import ExpansionBudget
+        expansion_budget = ExpansionBudget(max_requests=args.expand_requests, max_seconds=args.expand_seconds)
+
     try:
-        if args.command == 'extract':
+        if args.command == 'extract' and args.extractor == 'async':
+            run_async_extraction(
+                subreddits=[name.strip() for name in args.subreddit.split(',') if name.strip()],
+                post_limit=args.posts,
+                time_filter=args.filter,
+                comment_limit=args.comments,
+                use_test_db=args.test,
+                storage_backend=args.storage,
+                max_concurrency=args.max_concurrency,
+                max_comment_refreshes=args.max_comment_refreshes,
+                expansion_budget=expansion_budget
+            )
+
+        elif args.command == 'extract':
             run_single_extraction(
                 subreddit=args.subreddit,
                 post_limit=args.posts,
                 time_filter=args.filter,
                 comment_limit=args.comments,
-                use_test_db=args.test
+                use_test_db=args.test,
+                storage_backend=args.storage,
+                comment_workers=args.comment_workers,
+                incremental=args.incremental,
+                max_comment_refreshes=args.max_comment_refreshes,
+                staged=args.staged,
+                expansion_budget=expansion_budget
+            )
+
+        elif args.command == 'multi':
+            from ruoa_extractor.src.pipeline.multi import jobs_from_spec, load_job_file
+
+            if args.jobs:
+                jobs = load_job_file(args.jobs)
+            else:
+                jobs = jobs_from_spec(
+                    args.subreddit,
+                    post_limit=args.posts,
+                    time_filter=args.filter,
+                    comment_limit=args.comments,
+                    budget=args.budget,
+                    incremental=args.incremental
+                )
+
+            run_multi_extraction(
+                jobs,
+                use_test_db=args.test,
+                storage_backend=args.storage,
+                max_comment_refreshes=args.max_comment_refreshes,
+                expansion_budget=expansion_budget
+            )
+
+        elif args.command == 'stream':
+            run_stream_mode(
+                subreddits=[name.strip() for name in args.subreddit.split(',') if name.strip()],
+                flush_size=args.flush_size,
+                flush_interval=args.flush_interval,
+                use_test_db=args.test,
+                storage_backend=args.storage
             )
 
         elif args.command == 'continuous':
@@ -250,9 +941,72 @@ Examples:
                 interval_hours=args.interval,
                 post_limit=args.posts,
                 time_filter=args.filter,
-                comment_limit=args.comments
+                comment_limit=args.comments,
+                storage_backend=args.storage,
+                comment_workers=args.comment_workers,
+                incremental=args.incremental,
+                max_comment_refreshes=args.max_comment_refreshes,
+                staged=args.staged,
+                min_interval_minutes=args.min_interval,
+                max_interval_hours=args.max_interval,
+                target_items=args.target_items,
+                expansion_budget=expansion_budget
             )
 
+        elif args.command == 'daemon':
+            if args.test:
+                logger.warning("Daemon mode should not use test database. Using production database.")
+
+            run_daemon_mode(
+                subreddit=args.subreddit,
+                interval_hours=args.interval,
+                post_limit=args.posts,
+                time_filter=args.filter,
+                comment_limit=args.comments,
+                storage_backend=args.storage,
+                comment_workers=args.comment_workers,
+                incremental=args.incremental,
+                max_comment_refreshes=args.max_comment_refreshes,
+                staged=args.staged,
+                min_interval_minutes=args.min_interval,
+                max_interval_hours=args.max_interval,
+                target_items=args.target_items,
+                recheck_schema=args.recheck_schema,
+                expansion_budget=expansion_budget
+            )
+
+        elif args.command == 'refresh':
+            run_metric_refresh(
+                subreddit=args.subreddit,
+                max_posts=args.refresh_limit,
+                max_age_days=args.refresh_days,
+                comment_limit=args.comments,
+                use_test_db=args.test,
+                comment_workers=args.comment_workers,
+                max_comment_refreshes=args.max_comment_refreshes,
+                expansion_budget=expansion_budget
+            )
+
+        elif args.command == 'import-archive':
+            run_archive_import(
+                subreddit=args.subreddit,
+                submission_files=args.archive_posts,
+                comment_files=args.archive_comments,
+                since=args.since,
+                until=args.until,
+                workers=args.archive_workers,
+                use_test_db=args.test
+            )
+
+        elif args.command == 'replay':
+            run_replay(subreddit=args.subreddit, landing_dir=args.raw_landing, use_test_db=args.test)
+
+        elif args.command == 'compact':
+            run_lake_compaction(args.lake, target_file_mb=args.target_file_mb, remove_orphans=args.remove_orphans)
+
+        elif args.command == 'rollup':
+            run_metric_rollup(use_test_db=args.test)
+
         elif args.command == 'stats':
             show_stats(args.subreddit, use_test_db=args.test)
 
@@ -261,6 +1015,11 @@ Examples:
     except Exception as e:
         logger.error(f"Application error: {e}")
         sys.exit(1)
+    finally:
+        if args.command not in OFFLINE_COMMANDS:
+            from ruoa_extractor.src.storage.raw_landing import close_landing_zones
+            # Seals the open raw segment, uploading it when an S3 target is configured
+            close_landing_zones()
 
     logger.info("Application finished")
 
@@ -0,0 +1,97 @@
+﻿import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set
+
+from ruoa_extractor.src.core.batching import chunked
+from ruoa_extractor.src.pipeline.loading import LoadResult, load_new_items, replace_items
+
+
+class ArchiveImportPipeline:
+    """Bulk loads an archive extractor's posts, then the comments whose posts are stored, skipping known rows"""
+
+    def __init__(self, extractor: Any, storage: Any, load_batch_size: int = 10000, update_existing: bool = False):
+        self.extractor = extractor
+        self.storage = storage
+        self.load_batch_size = load_batch_size
+        # Overwrite stored rows instead of skipping them, e.g. to repair rows written by a faulty transform
+        self.update_existing = update_existing
+        self.logger = logging.getLogger(f"RedditArchiveImport-{extractor.subreddit_name}")
+
+    def _with_stored_parents(self, comments: Iterable[Any], result: Dict[str, Any]) -> Iterator[Any]:
+        """Drop comments whose post is in neither the dump nor the database, batch by batch"""
+        for batch in chunked(comments, self.load_batch_size):
+            stored = self.storage.get_existing_post_ids({comment.post_id for comment in batch})
+            for comment in batch:
+                if comment.post_id in stored:
+                    yield comment
+                else:
+                    # Usually replies to posts from before the imported time range
+                    result["orphaned"] += 1
+
+    def _load(
+            self,
+            items: Iterable[Any],
+            get_existing_ids: Callable[[List[str]], Set[str]],
+            upsert_items: Callable[..., Dict[str, int]],
+            item_type: str
+    ) -> LoadResult:
+        if self.update_existing:
+            return replace_items(items, upsert_items, self.load_batch_size, self.logger, item_type)
+        return load_new_items(items, get_existing_ids, upsert_items, self.load_batch_size, self.logger, item_type)
+
+    def run(self) -> Dict[str, Any]:
+        """Import every post first, so the comments loaded afterwards always find their parent rows"""
+        name = self.extractor.subreddit_name
+        self.logger.info(f"Starting archive import for r/{name}")
+        import_start = datetime.now()
+
+        posts = self._load(
+            self.extractor.iter_archived_posts(),
+            self.storage.get_existing_post_ids,
+            self.storage.upsert_posts,
+            "posts"
+        )
+        self.logger.info(f"Imported {posts.saved} posts, {posts.skipped} already stored, {posts.updated} overwritten")
+
+        comment_result = {"orphaned": 0}
+        comments = self._load(
+            self._with_stored_parents(self.extractor.iter_archived_comments(), comment_result),
+            self.storage.get_existing_comment_ids,
+            self.storage.upsert_comments,
+            "comments"
+        )
+
+        duration = (datetime.now() - import_start).total_seconds()
+        result = {
+            "import_duration_seconds": duration,
+            "posts": {
+                "posts_saved": posts.saved,
+                "posts_skipped": posts.skipped,
+                "posts_updated": posts.updated,
+                "total_extracted": posts.extracted
+            },
+            "comments": {
+                "comments_saved": comments.saved,
+                "comments_skipped": comments.skipped,
+                "comments_updated": comments.updated,
+                "total_extracted": comments.extracted + comment_result["orphaned"],
+                "orphaned": comment_result["orphaned"]
+            },
+            "total_data_points": posts.saved + comments.saved
+        }
+
+        self.logger.info(f"Archive import completed in {duration:.2f}s: {result}")
+        return result
+
+
+if __name__ == "__main__":
+    import sys
+    from ruoa_extractor.src.config.config import get_database_url
+    from ruoa_extractor.src.core.database import DatabaseManager
+    from ruoa_extractor.src.extractors.archive_extractor import ArchiveRedditExtractor
+    from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
+
+    db_manager = DatabaseManager(get_database_url(use_test_db=True))
+    db_manager.ensure_schema()
+    extractor = ArchiveRedditExtractor("universityofauckland", submission_files=sys.argv[1:2], comment_files=sys.argv[2:3])
+    print(f"✅ Imported: {ArchiveImportPipeline(extractor, CopyRedditStorage(db_manager)).run()}")
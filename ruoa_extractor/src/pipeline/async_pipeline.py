@@ -0,0 +1,206 @@
+﻿import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from ruoa_extractor.src.extractors.async_extractor import AsyncRedditExtractor, AsyncRedditClient
+from ruoa_extractor.src.extractors.comment_expansion import ExpansionBudget
+from ruoa_extractor.src.storage.database_storage import DatabaseRedditStorage
+from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
+from ruoa_extractor.src.core.database import DatabaseManager
+from ruoa_extractor.src.config.config import get_database_url
+from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
+
+class AsyncStorageWriter:
+    """Runs every storage call on one dedicated thread, so the event loop never blocks on the database"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-loader")
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class AsyncRedditETLPipeline:
+    """ETL pipeline that extracts many subreddits from one event loop while loading in the background.
+    Each subreddit loads through a RedditETLPipeline, so comment planning, the pending queue, metric snapshots
+    and the lake behave as in the synchronous pipeline"""
+
+    def __init__(
+            self,
+            subreddit_names: List[str],
+            use_test_db: bool = False,
+            load_batch_size: int = 500,
+            storage_backend: str = "database",
+            max_concurrency: int = 8,
+            queue_size: int = 64,
+            max_comment_refreshes: Optional[int] = None,
+            max_comment_fetches: Optional[int] = None,
+            expansion_budget: Optional[ExpansionBudget] = None,
+            lake_dir: Optional[str] = None
+    ):
+        self.subreddit_names = subreddit_names
+        self.use_test_db = use_test_db
+        self.load_batch_size = load_batch_size
+        self.storage_backend = storage_backend
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.max_comment_refreshes = max_comment_refreshes
+        self.max_comment_fetches = max_comment_fetches
+        self.expansion_budget = expansion_budget
+        self.lake_dir = lake_dir
+
+        self.db_manager = DatabaseManager(get_database_url(use_test_db=use_test_db))
+        if storage_backend == "copy":
+            self.storage = CopyRedditStorage(self.db_manager)
+        else:
+            self.storage = DatabaseRedditStorage(self.db_manager)
+
+        self.logger = logging.getLogger("AsyncRedditETL")
+        self.db_manager.ensure_schema()
+
+    def _empty_result(self) -> Dict[str, Any]:
+        return {
+            "posts": {"posts_saved": 0, "posts_skipped": 0, "total_extracted": 0, "comment_post_ids": []},
+            "comments": {"comments_saved": 0, "comments_skipped": 0, "total_extracted": 0, "posts_processed": 0},
+        }
+
+    def _subreddit_pipeline(self, name: str, client: AsyncRedditClient) -> RedditETLPipeline:
+        """Loader for one subreddit, sharing this pipeline's database and the client's session"""
+        return RedditETLPipeline(
+            name,
+            use_test_db=self.use_test_db,
+            load_batch_size=self.load_batch_size,
+            storage_backend=self.storage_backend,
+            max_comment_refreshes=self.max_comment_refreshes,
+            max_comment_fetches=self.max_comment_fetches,
+            extractor=AsyncRedditExtractor(name, client=client, expansion_budget=self.expansion_budget),
+            db_manager=self.db_manager,
+            lake_dir=self.lake_dir
+        )
+
+    async def _extract_subreddit(
+            self,
+            etl: RedditETLPipeline,
+            writer: AsyncStorageWriter,
+            queue: asyncio.Queue,
+            result: Dict[str, Any],
+            post_limit: int,
+            time_filter: str,
+            comment_limit: Optional[int]
+    ) -> None:
+        """Load one subreddit's posts, then queue the planned comment trees as each fetch finishes"""
+        extractor = etl.extractor
+        posts = [post async for post in extractor.extract_posts_async(limit=post_limit, time_filter=time_filter)]
+        self.logger.info(f"Extracted {len(posts)} posts from r/{extractor.subreddit_name}")
+
+        # Queued and grown threads are fetched as well as new posts, within the refresh and fetch caps
+        result["posts"] = await writer.run(etl._load_posts, posts)
+        post_ids = result["posts"]["comment_post_ids"]
+        result["comments"]["posts_processed"] = len(post_ids)
+
+        async def fetch(post_id: str) -> None:
+            try:
+                comments = [c async for c in extractor.extract_comments_async(post_id, limit=comment_limit)]
+            except Exception as e:
+                # The post stays queued, so its tree is fetched again next run
+                self.logger.error(f"Error extracting comments for post {post_id}: {e}")
+                return
+            # Backpressure: fetches wait here while the loader is behind
+            await queue.put((etl, result, post_id, comments))
+
+        await asyncio.gather(*(fetch(post_id) for post_id in post_ids))
+
+    async def _load_comments(self, writer: AsyncStorageWriter, queue: asyncio.Queue) -> None:
+        """Consume fetched comment trees until the end-of-stream marker arrives"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            etl, result, post_id, comments = item
+            try:
+                loaded = await writer.run(etl.load_new_comments, comments)
+                await writer.run(etl._finish_comment_load, post_id, loaded.failed)
+            except Exception as e:
+                # Keep draining, otherwise producers would block on a full queue
+                self.logger.error(f"Error loading {len(comments)} comments of post {post_id}: {e}")
+                continue
+
+            result["comments"]["comments_saved"] += loaded.saved
+            result["comments"]["comments_skipped"] += loaded.skipped
+            result["comments"]["total_extracted"] += len(comments)
+
+    async def run(
+            self,
+            post_limit: int = 25,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Run the pipeline for every subreddit and return per-subreddit results"""
+        pipeline_start = datetime.now()
+        results = {name: self._empty_result() for name in self.subreddit_names}
+
+        client = AsyncRedditClient(max_concurrency=self.max_concurrency)
+        pipelines = {name: self._subreddit_pipeline(name, client) for name in self.subreddit_names}
+        writer = AsyncStorageWriter()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        loader = asyncio.create_task(self._load_comments(writer, queue))
+
+        try:
+            outcomes = await asyncio.gather(
+                *(
+                    self._extract_subreddit(
+                        etl, writer, queue, results[name], post_limit, time_filter, comment_limit
+                    )
+                    for name, etl in pipelines.items()
+                ),
+                return_exceptions=True
+            )
+            for name, outcome in zip(self.subreddit_names, outcomes):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Extraction failed for r/{name}: {outcome}")
+                    results[name]["error"] = str(outcome)
+
+            await queue.put(None)
+            await loader
+
+            for name, etl in pipelines.items():
+                comments = results[name]["comments"]
+                comments["expansion"] = etl._expansion_summary(results[name]["posts"]["comment_post_ids"])
+        finally:
+            if not loader.done():
+                loader.cancel()
+            for name, etl in pipelines.items():
+                try:
+                    # Writes out rows the lake still buffers
+                    await writer.run(etl.storage.flush)
+                except Exception as e:
+                    self.logger.error(f"Error flushing storage of r/{name}: {e}")
+            await client.close()
+            writer.close()
+
+        duration = (datetime.now() - pipeline_start).total_seconds()
+        final_results = {"pipeline_duration_seconds": duration, "subreddits": results}
+        self.logger.info(f"Async pipeline completed in {duration:.2f}s: {final_results}")
+        return final_results
+
+    def run_full_pipeline(
+            self,
+            post_limit: int = 25,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Synchronous entry point that runs the async pipeline to completion"""
+        return asyncio.run(self.run(post_limit=post_limit, time_filter=time_filter, comment_limit=comment_limit))
+
+
+if __name__ == "__main__":
+    pipeline = AsyncRedditETLPipeline(["universityofauckland"], use_test_db=True)
+    print(pipeline.run_full_pipeline(post_limit=5, time_filter="week", comment_limit=10))
@@ -0,0 +1,71 @@
+﻿from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class CommentRefreshTarget(NamedTuple):
+    """A post whose comment tree should be fetched, with how many comments it gained"""
+    post: Any
+    delta: int
+    is_new: bool
+
+
+class CommentRefreshPlan(NamedTuple):
+    """Comment fetches for one extraction, largest comment growth first"""
+    targets: List[CommentRefreshTarget]
+    unchanged: int
+    deferred: int
+    # New posts cut by a fetch budget; they must be stored without their comment count to be picked up later
+    deferred_new_ids: Tuple[str, ...] = ()
+
+    @property
+    def post_ids(self) -> List[str]:
+        return [target.post.id for target in self.targets]
+
+    @property
+    def grown_posts(self) -> List[Any]:
+        return [target.post for target in self.targets if not target.is_new]
+
+
+def plan_comment_refresh(
+        posts: Iterable[Any],
+        stored_counts: Dict[str, int],
+        max_refreshes: Optional[int] = None,
+        max_fetches: Optional[int] = None
+) -> CommentRefreshPlan:
+    """Schedule comment fetches only for posts whose num_comments grew since they were stored"""
+    new_targets = []
+    grown_targets = []
+    unchanged = 0
+
+    for post in posts:
+        current = post.num_comments or 0
+        if post.id not in stored_counts:
+            if current > 0:
+                new_targets.append(CommentRefreshTarget(post, current, True))
+            else:
+                unchanged += 1
+            continue
+
+        delta = current - stored_counts[post.id]
+        if delta > 0:
+            grown_targets.append(CommentRefreshTarget(post, delta, False))
+        else:
+            unchanged += 1
+
+    # New posts have nothing stored yet, so only already-stored posts are capped; the rest wait a run
+    grown_targets.sort(key=lambda target: target.delta, reverse=True)
+    deferred = 0
+    if max_refreshes is not None and len(grown_targets) > max_refreshes:
+        deferred = len(grown_targets) - max_refreshes
+        grown_targets = grown_targets[:max_refreshes]
+
+    targets = sorted(new_targets + grown_targets, key=lambda target: target.delta, reverse=True)
+
+    # A fetch budget caps every comment fetch, new posts included
+    deferred_new_ids: Tuple[str, ...] = ()
+    if max_fetches is not None and len(targets) > max_fetches:
+        cut = targets[max_fetches:]
+        targets = targets[:max_fetches]
+        deferred += len(cut)
+        deferred_new_ids = tuple(target.post.id for target in cut if target.is_new)
+
+    return CommentRefreshPlan(targets, unchanged, deferred, deferred_new_ids)
@@ -0,0 +1,94 @@
+﻿import threading
+from typing import Any, Dict, Optional
+
+from ruoa_extractor.src.pipeline.scheduling import AdaptiveScheduler
+
+
+class RedditDaemon:
+    """Runs extraction cycles on one long-lived pipeline, keeping its PRAW client, OAuth token and pool warm"""
+
+    def __init__(
+            self,
+            pipeline: Any,
+            scheduler: AdaptiveScheduler,
+            post_limit: int = 25,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None,
+            incremental: bool = False,
+            staged: bool = False,
+            recheck_schema: bool = False
+    ):
+        if staged and incremental:
+            raise ValueError("Staged cycles list top posts and cannot be incremental")
+
+        self.pipeline = pipeline
+        self.scheduler = scheduler
+        self.post_limit = post_limit
+        self.time_filter = time_filter
+        self.comment_limit = comment_limit
+        self.incremental = incremental
+        self.staged = staged
+        self.recheck_schema = recheck_schema
+        self.logger = pipeline.logger
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """Finish the running cycle, then exit instead of sleeping; safe to call from a signal handler"""
+        self._stop_event.set()
+
+    def run_cycle(self) -> Dict[str, Any]:
+        """One extraction cycle on the warm pipeline"""
+        if self.recheck_schema:
+            self.pipeline.db_manager.create_tables()
+
+        if self.staged:
+            return self.pipeline.run_staged_pipeline(
+                post_limit=self.post_limit,
+                time_filter=self.time_filter,
+                comment_limit=self.comment_limit
+            )
+        return self.pipeline.run_full_pipeline(
+            post_limit=self.post_limit,
+            time_filter=self.time_filter,
+            comment_limit=self.comment_limit,
+            incremental=self.incremental
+        )
+
+    def run(self, max_cycles: Optional[int] = None) -> Dict[str, Any]:
+        """Cycle until stopped (or `max_cycles` ran), waiting between cycles as the scheduler decides"""
+        name = self.pipeline.subreddit_name
+        summary = {"cycles": 0, "failures": 0, "total_data_points": 0}
+
+        while not self._stop_event.is_set():
+            try:
+                results = self.run_cycle()
+                summary["total_data_points"] += results["total_data_points"]
+                delay = self.scheduler.record_success(name, results["total_data_points"])
+                self.logger.info(
+                    f"Cycle found {results['total_data_points']} new items, next in {delay / 60:.1f} minutes"
+                )
+            except Exception as e:
+                summary["failures"] += 1
+                delay = self.scheduler.record_failure(name)
+                self.logger.error(f"Daemon cycle failed: {e}; retrying in {delay:.0f} seconds")
+
+            summary["cycles"] += 1
+            if max_cycles is not None and summary["cycles"] >= max_cycles:
+                break
+
+            # Returns early when stop() is called during the wait
+            self._stop_event.wait(delay)
+
+        self.logger.info(f"Daemon stopped: {summary}")
+        return summary
+
+
+if __name__ == "__main__":
+    from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
+    daemon = RedditDaemon(
+        RedditETLPipeline("universityofauckland", use_test_db=True),
+        AdaptiveScheduler(base_interval=600, min_interval=60, max_interval=3600),
+        post_limit=5
+    )
+    print(f"✅ Daemon ran: {daemon.run(max_cycles=1)}")
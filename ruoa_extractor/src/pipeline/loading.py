@@ -0,0 +1,104 @@
+﻿import logging
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Set
+
+from ruoa_extractor.src.core.batching import chunked
+
+
+class LoadResult(NamedTuple):
+    """Counts from loading a stream of items, plus the IDs that were written"""
+    saved: int
+    skipped: int
+    new_ids: List[str]
+    extracted: int
+    # Items that are not stored because their batch or their row failed
+    failed: int = 0
+    # Stored items overwritten by a replacing load
+    updated: int = 0
+
+
+def load_new_items(
+        items: Iterable[Any],
+        get_existing_ids: Callable[[List[str]], Set[str]],
+        upsert_items: Callable[..., Dict[str, int]],
+        batch_size: int,
+        logger: logging.Logger,
+        item_type: str
+) -> LoadResult:
+    """Write only unseen items, with one existence query and one transaction per batch"""
+    saved = 0
+    skipped = 0
+    extracted = 0
+    failed = 0
+    new_ids: List[str] = []
+
+    # Pulls one batch at a time, so a generator source is never held in memory whole
+    for batch in chunked(items, batch_size):
+        extracted += len(batch)
+        existing_ids = get_existing_ids([item.id for item in batch])
+
+        new_items = []
+        for item in batch:
+            if item.id in existing_ids:
+                skipped += 1
+                logger.debug(f"{item_type.capitalize()[:-1]} {item.id} already exists, skipping")
+            else:
+                # Guards against the same ID appearing twice in one batch
+                existing_ids.add(item.id)
+                new_items.append(item)
+
+        if not new_items:
+            continue
+
+        try:
+            counts = upsert_items(new_items, update_existing=False)
+        except Exception as e:
+            logger.error(f"Failed to save batch of {len(new_items)} {item_type}: {e}")
+            failed += len(new_items)
+            continue
+
+        written = [item.id for item in new_items]
+        if counts["inserted"] < len(written):
+            # A row not inserted was either stored by another writer first or skipped as bad
+            stored = get_existing_ids(written)
+            written = [item_id for item_id in written if item_id in stored]
+            failed += len(new_items) - len(written)
+
+        saved += counts["inserted"]
+        skipped += len(written) - counts["inserted"]
+        new_ids.extend(written)
+        logger.debug(f"Saved {counts['inserted']} {item_type} in one batch")
+
+    return LoadResult(saved, skipped, new_ids, extracted, failed)
+
+
+def replace_items(
+        items: Iterable[Any],
+        upsert_items: Callable[..., Dict[str, int]],
+        batch_size: int,
+        logger: logging.Logger,
+        item_type: str
+) -> LoadResult:
+    """Write every item, overwriting stored versions, with one transaction per batch"""
+    saved = 0
+    updated = 0
+    extracted = 0
+    failed = 0
+    new_ids: List[str] = []
+
+    for batch in chunked(items, batch_size):
+        extracted += len(batch)
+        try:
+            counts = upsert_items(batch, update_existing=True)
+        except Exception as e:
+            logger.error(f"Failed to save batch of {len(batch)} {item_type}: {e}")
+            failed += len(batch)
+            continue
+
+        saved += counts["inserted"]
+        updated += counts["updated"]
+        # Rows skipped as bad are neither inserted nor updated; duplicates within a batch collapse to one row
+        failed += max(0, len({item.id for item in batch}) - counts["inserted"] - counts["updated"])
+        new_ids.extend(item.id for item in batch)
+        logger.debug(f"Saved {counts['inserted']} and overwrote {counts['updated']} {item_type} in one batch")
+
+    return LoadResult(saved, 0, new_ids, extracted, failed, updated)
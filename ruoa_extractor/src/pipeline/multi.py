@@ -0,0 +1,229 @@
+﻿import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from ruoa_extractor.src.extractors.praw_extractor import PrawRedditExtractor
+from ruoa_extractor.src.extractors.comment_expansion import (
+    ExpansionBudget, combine_expansion_summaries, summarize_expansions
+)
+from ruoa_extractor.src.core.database import DatabaseManager
+from ruoa_extractor.src.config.config import get_database_url
+from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
+
+class SubredditJob(NamedTuple):
+    """One subreddit of a multi-subreddit run, with its share of the schedule"""
+    name: str
+    weight: int = 1
+    post_limit: int = 25
+    time_filter: str = "day"
+    comment_limit: Optional[int] = None
+    # Most comment trees fetched per run; the rest are picked up by later runs
+    budget: Optional[int] = None
+    incremental: bool = False
+
+
+def make_job(values: Dict[str, Any]) -> SubredditJob:
+    """Build a job from a settings dict, rejecting unknown keys and non-positive weights"""
+    unknown = set(values) - set(SubredditJob._fields)
+    if unknown:
+        raise ValueError(f"Unknown job settings: {', '.join(sorted(unknown))}")
+    if "name" not in values:
+        raise ValueError("Every subreddit job needs a name")
+
+    job = SubredditJob(**values)
+    if job.weight < 1:
+        raise ValueError(f"Weight of r/{job.name} must be at least 1")
+    return job
+
+
+def jobs_from_spec(spec: str, **defaults: Any) -> List[SubredditJob]:
+    """Parse 'name[:weight],...' from the command line, applying the same settings to every job"""
+    jobs = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition(":")
+        values = dict(defaults, name=name.strip())
+        if weight:
+            values["weight"] = int(weight)
+        jobs.append(make_job(values))
+    return jobs
+
+
+def load_job_file(path: str) -> List[SubredditJob]:
+    """Read jobs from JSON: {"defaults": {...}, "subreddits": ["name", {"name": ..., "weight": 3}, ...]}"""
+    with open(path, encoding="utf-8") as handle:
+        config = json.load(handle)
+
+    if isinstance(config, list):
+        config = {"subreddits": config}
+
+    defaults = config.get("defaults", {})
+    jobs = []
+    for entry in config.get("subreddits", []):
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        jobs.append(make_job({**defaults, **entry}))
+    return jobs
+
+
+class SmoothWeightedScheduler:
+    """Smooth weighted round-robin: each key gets its weight's share of picks, spread out rather than in bursts"""
+
+    def __init__(self):
+        self._weights: Dict[str, int] = {}
+        self._current: Dict[str, int] = {}
+
+    def add(self, key: str, weight: int = 1) -> None:
+        self._weights[key] = weight
+        self._current[key] = 0
+
+    def remove(self, key: str) -> None:
+        self._weights.pop(key, None)
+        self._current.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def next(self) -> str:
+        """Pick the key with the highest running credit; ties go to the key added first"""
+        if not self._weights:
+            raise LookupError("No keys to schedule")
+
+        for key, weight in self._weights.items():
+            self._current[key] += weight
+        chosen = max(self._current, key=self._current.get)
+        self._current[chosen] -= sum(self._weights.values())
+        return chosen
+
+
+class MultiSubredditRunner:
+    """Extracts many subreddits in one process, sharing one PRAW client, connection pool and rate limiter"""
+
+    def __init__(
+            self,
+            jobs: List[SubredditJob],
+            use_test_db: bool = False,
+            load_batch_size: int = 500,
+            storage_backend: str = "database",
+            max_comment_refreshes: Optional[int] = None,
+            expansion_budget: Optional[ExpansionBudget] = None
+    ):
+        if not jobs:
+            raise ValueError("At least one subreddit job is required")
+        names = [job.name for job in jobs]
+        if len(set(names)) != len(names):
+            raise ValueError("Each subreddit may only appear once per run")
+
+        self.jobs = jobs
+        self.use_test_db = use_test_db
+        self.logger = logging.getLogger("MultiSubredditETL")
+
+        self.db_manager = DatabaseManager(get_database_url(use_test_db=use_test_db))
+        self.db_manager.ensure_schema()
+
+        self.pipelines: Dict[str, RedditETLPipeline] = {}
+        shared: Optional[PrawRedditExtractor] = None
+        for job in jobs:
+            if shared is None:
+                extractor = shared = PrawRedditExtractor(job.name, expansion_budget=expansion_budget)
+            else:
+                extractor = PrawRedditExtractor(
+                    job.name,
+                    rate_limiter=shared.rate_limiter,
+                    reddit=shared.reddit,
+                    expansion_budget=expansion_budget
+                )
+
+            self.pipelines[job.name] = RedditETLPipeline(
+                job.name,
+                use_test_db=use_test_db,
+                load_batch_size=load_batch_size,
+                storage_backend=storage_backend,
+                max_comment_refreshes=max_comment_refreshes,
+                max_comment_fetches=job.budget,
+                extractor=extractor,
+                db_manager=self.db_manager
+            )
+
+    def _empty_result(self, job: SubredditJob) -> Dict[str, Any]:
+        return {
+            "weight": job.weight,
+            "budget": job.budget,
+            "steps": 0,
+            "posts": {"posts_saved": 0, "posts_skipped": 0, "total_extracted": 0, "comment_post_ids": []},
+            "comments": {
+                "comments_saved": 0, "comments_skipped": 0, "total_extracted": 0, "posts_processed": 0,
+                "expansion": summarize_expansions([])
+            },
+        }
+
+    def _steps(self, job: SubredditJob, result: Dict[str, Any]) -> Iterator[None]:
+        """A subreddit's work as schedulable steps: the post listing, then one comment tree per step"""
+        pipeline = self.pipelines[job.name]
+
+        if job.incremental:
+            result["posts"] = pipeline.extract_and_load_new_posts()
+        else:
+            result["posts"] = pipeline.extract_and_load_posts(limit=job.post_limit, time_filter=job.time_filter)
+        result["steps"] += 1
+        yield
+
+        for post_id in result["posts"]["comment_post_ids"]:
+            loaded = pipeline.extract_and_load_comments(post_ids=[post_id], comment_limit=job.comment_limit)
+            for key, value in loaded.items():
+                if key == "expansion":
+                    result["comments"][key] = combine_expansion_summaries(result["comments"][key], value)
+                else:
+                    result["comments"][key] += value
+            result["steps"] += 1
+            yield
+
+    def run(self) -> Dict[str, Any]:
+        """Interleave every subreddit's steps by weight until all are done, and report per-subreddit results"""
+        self.logger.info(f"Starting multi-subreddit run for {', '.join(f'r/{job.name}' for job in self.jobs)}")
+        pipeline_start = datetime.now()
+
+        results = {job.name: self._empty_result(job) for job in self.jobs}
+        scheduler = SmoothWeightedScheduler()
+        steps = {}
+        for job in self.jobs:
+            scheduler.add(job.name, job.weight)
+            steps[job.name] = self._steps(job, results[job.name])
+
+        while len(scheduler):
+            name = scheduler.next()
+            try:
+                next(steps[name])
+            except StopIteration:
+                scheduler.remove(name)
+            except Exception as e:
+                # One failing subreddit must not stop the others
+                self.logger.error(f"Extraction failed for r/{name}: {e}")
+                results[name]["error"] = str(e)
+                scheduler.remove(name)
+
+        for pipeline in self.pipelines.values():
+            pipeline.storage.flush()
+
+        duration = (datetime.now() - pipeline_start).total_seconds()
+        final_results = {
+            "pipeline_duration_seconds": duration,
+            "subreddits": results,
+            "total_data_points": sum(
+                result["posts"]["posts_saved"] + result["comments"]["comments_saved"] for result in results.values()
+            )
+        }
+
+        self.logger.info(f"Multi-subreddit run completed in {duration:.2f}s: {final_results}")
+        return final_results
+
+
+if __name__ == "__main__":
+    scheduler = SmoothWeightedScheduler()
+    scheduler.add("universityofauckland", 3)
+    scheduler.add("newzealand", 1)
+    print(f"✅ Schedule: {[scheduler.next() for _ in range(8)]}")
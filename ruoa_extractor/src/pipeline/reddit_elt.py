@@ -1,31 +1,95 @@
-﻿from typing import Dict, Any, Optional
+﻿from typing import Dict, Any, Optional, List, Callable, Iterable, Iterator, Set
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from ruoa_extractor.src.extractors.praw_extractor import PrawRedditExtractor
+from ruoa_extractor.src.extractors.abstract_extractor import CommentFetchResult
+from ruoa_extractor.src.extractors.comment_expansion import ExpansionBudget, ExpansionResult, summarize_expansions
 from ruoa_extractor.src.storage.database_storage import DatabaseRedditStorage
+from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
 from ruoa_extractor.src.core.database import DatabaseManager
-from ruoa_extractor.src.config.config import get_database_url
+from ruoa_extractor.src.config.config import get_database_url, get_lake_settings
+from ruoa_extractor.src.core.batching import chunked
+from ruoa_extractor.src.pipeline.loading import load_new_items, LoadResult
+from ruoa_extractor.src.pipeline.comment_refresh import plan_comment_refresh
+from ruoa_extractor.src.pipeline.staged import StagedRedditPipeline
+from ruoa_extractor.src.pipeline.streaming import RedditStreamPipeline
+
+
+def _remaining(cap: Optional[int], used: int) -> Optional[int]:
+    """What is left of a per-run cap; None means unlimited"""
+    return None if cap is None else max(0, cap - used)
 
 
 class RedditETLPipeline:
     """Complete ETL pipeline for Reddit data extraction, transformation, and loading"""
 
-    def __init__(self, subreddit_name: str, use_test_db: bool = False):
-        self.subreddit_name = subreddit_name
-        self.use_test_db = use_test_db
+    STORAGE_BACKENDS = ("database", "copy")
+    POSTS_STREAM = "posts_new"
+    # Reddit listings never return more than 1000 items
+    MAX_INCREMENTAL_POSTS = 1000
 
-        self.extractor = PrawRedditExtractor(subreddit_name)
+    def __init__(
+            self,
+            subreddit_name: str,
+            use_test_db: bool = False,
+            load_batch_size: int = 500,
+            storage_backend: str = "database",
+            comment_workers: int = 1,
+            overlap_seconds: int = 600,
+            max_comment_refreshes: Optional[int] = None,
+            max_comment_fetches: Optional[int] = None,
+            extractor: Optional[PrawRedditExtractor] = None,
+            db_manager: Optional[DatabaseManager] = None,
+            expansion_budget: Optional[ExpansionBudget] = None,
+            lake_dir: Optional[str] = None
+    ):
+        if storage_backend not in self.STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend: {storage_backend}")
 
-        db_url = get_database_url(use_test_db=use_test_db)
-        print("db_url", db_url)
-        self.database_manager = DatabaseManager(db_url)
-        self.db_manager = DatabaseManager(db_url)
-        self.storage = DatabaseRedditStorage(self.db_manager)
+        self.subreddit_name = subreddit_name
+        self.use_test_db = use_test_db
+        self.load_batch_size = load_batch_size
+        self.storage_backend = storage_backend
+        self.comment_workers = comment_workers
+        self.overlap_seconds = overlap_seconds
+        self.max_comment_refreshes = max_comment_refreshes
+        self.max_comment_fetches = max_comment_fetches
+
+        self.extractor = extractor or PrawRedditExtractor(subreddit_name, expansion_budget=expansion_budget)
+
+        # A shared manager comes from a caller that already prepared the schema
+        owns_database = db_manager is None
+        if owns_database:
+            db_url = get_database_url(use_test_db=use_test_db)
+            print("db_url", db_url)
+            db_manager = DatabaseManager(db_url)
+        self.db_manager = db_manager
+        self.database_manager = self.db_manager
+        if storage_backend == "copy":
+            self.storage = CopyRedditStorage(self.db_manager)
+        else:
+            self.storage = DatabaseRedditStorage(self.db_manager)
+
+        lake_settings = get_lake_settings()
+        lake_dir = lake_dir or lake_settings.directory
+        if lake_dir:
+            # Imported here so runs without a lake never load pyarrow
+            from ruoa_extractor.src.storage.fanout_storage import FanOutRedditStorage
+            from ruoa_extractor.src.storage.parquet_storage import ParquetRedditStorage
+
+            lake = ParquetRedditStorage(
+                lake_dir,
+                subreddit=subreddit_name,
+                rows_per_file=lake_settings.rows_per_file,
+                max_buffer_seconds=lake_settings.flush_seconds
+            )
+            self.storage = FanOutRedditStorage(self.storage, [lake])
 
         self._setup_logging()
 
-        self.db_manager.create_tables()
+        if owns_database:
+            self.db_manager.ensure_schema()
 
     def _setup_logging(self) -> None:
         """Setup logging for the pipeline"""
@@ -49,27 +113,9 @@ class RedditETLPipeline:
 
             if not posts:
                 self.logger.warning("No posts extracted")
-                return {"posts_saved": 0, "posts_skipped": 0, "total_extracted": 0}
-
-            posts_saved = 0
-            posts_skipped = 0
-
-            for post in posts:
-                if self.storage.post_exists(post.id):
-                    posts_skipped += 1
-                    self.logger.debug(f"Post {post.id} already exists, skipping")
-                else:
-                    if self.storage.save_post(post):
-                        posts_saved += 1
-                        self.logger.debug(f"Saved post: {post.id}")
-                    else:
-                        self.logger.error(f"Failed to save post: {post.id}")
+                return {"posts_saved": 0, "posts_skipped": 0, "total_extracted": 0, "comment_post_ids": []}
 
-            result = {
-                "posts_saved": posts_saved,
-                "posts_skipped": posts_skipped,
-                "total_extracted": len(posts)
-            }
+            result = self._load_posts(posts)
 
             self.logger.info(f"Post extraction completed: {result}")
             return result
@@ -78,6 +124,182 @@ class RedditETLPipeline:
             self.logger.error(f"Error in post extraction: {e}")
             raise
 
+    def extract_and_load_new_posts(self, max_posts: int = MAX_INCREMENTAL_POSTS) -> Dict[str, Any]:
+        """Extract posts newer than the subreddit's stored watermark and load them"""
+        watermark = self.storage.get_watermark(self.subreddit_name, self.POSTS_STREAM)
+        if watermark is None:
+            watermark = self.storage.get_latest_post_timestamp(self.subreddit_name)
+
+        # Re-read a small window below the watermark to catch posts that surfaced late in /new
+        since = watermark - self.overlap_seconds if watermark is not None else None
+        self.logger.info(f"Starting incremental post extraction since {since}")
+
+        try:
+            posts = self.extractor.extract_new_posts(since=since, limit=max_posts)
+            self.logger.info(f"Extracted {len(posts)} new posts from r/{self.subreddit_name}")
+
+            if len(posts) >= max_posts:
+                self.logger.warning(f"Incremental extraction hit the {max_posts} post cap before the watermark")
+
+            result = self._load_posts(posts)
+
+            # Only advance once every post is stored, so a failed batch is retried next run
+            if posts and result["posts_saved"] + result["posts_skipped"] == len(posts):
+                newest = max(posts, key=lambda post: post.created_utc)
+                new_watermark = newest.created_utc.timestamp()
+                if watermark is None or new_watermark > watermark:
+                    self.storage.save_watermark(self.subreddit_name, self.POSTS_STREAM, new_watermark, newest.id)
+                    watermark = new_watermark
+
+            result["watermark"] = watermark
+
+            self.logger.info(f"Incremental post extraction completed: {result}")
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Error in incremental post extraction: {e}")
+            raise
+
+    def _load_posts(
+            self,
+            posts: List[Any],
+            refreshes_used: int = 0,
+            fetches_used: int = 0,
+            carry_pending: bool = True
+    ) -> Dict[str, Any]:
+        """Insert unseen posts and plan comment fetches for queued posts and posts whose comment count grew"""
+        self._record_metrics(self.storage.record_post_metrics, posts, "posts")
+
+        # Queued threads may never be listed again, so they are fetched ahead of this listing's targets
+        carried = self._carried_comment_posts(posts, refreshes_used, fetches_used) if carry_pending else []
+
+        # Read stored counts before anything is written, so growth is measured against the last loaded comments
+        stored_counts = self.storage.get_comment_baselines([post.id for post in posts])
+        # A run loading posts in several batches spends one budget, not one per batch
+        plan = plan_comment_refresh(
+            posts,
+            stored_counts,
+            _remaining(self.max_comment_refreshes, refreshes_used + len(carried)),
+            _remaining(self.max_comment_fetches, fetches_used + len(carried))
+        )
+
+        loaded = self._load_new_items(
+            posts,
+            self.storage.get_existing_post_ids,
+            self.storage.upsert_posts,
+            "posts"
+        )
+
+        # A post whose insert failed has no row for its comments to reference
+        stored_ids = set(loaded.new_ids) | set(stored_counts)
+        targets = [target for target in plan.targets if target.post.id in stored_ids]
+        if len(targets) < len(plan.targets):
+            self.logger.warning(
+                f"Not fetching comments of {len(plan.targets) - len(targets)} posts that failed to save"
+            )
+
+        # Queued before the new counts are written, so growth whose comments never load is seen again next run.
+        # Over-budget new posts are stored with their true count and queued with none of it loaded.
+        pending = {target.post.id: stored_counts.get(target.post.id, 0) for target in targets}
+        pending.update((post_id, 0) for post_id in plan.deferred_new_ids if post_id in stored_ids)
+        self.storage.mark_comments_pending(pending)
+        grown_posts = [target.post for target in targets if not target.is_new]
+        if grown_posts:
+            # Deferred posts keep their old count
+            self.storage.upsert_posts(grown_posts, update_existing=True)
+
+        self.logger.info(
+            f"Comment refresh plan: {len(carried)} queued, {len(targets) - len(grown_posts)} new, "
+            f"{len(grown_posts)} grown, {plan.unchanged} unchanged, {plan.deferred} deferred"
+        )
+
+        return {
+            "posts_saved": loaded.saved,
+            "posts_skipped": loaded.skipped,
+            "total_extracted": len(posts),
+            "comment_post_ids": carried + [target.post.id for target in targets],
+            "comment_posts_carried": len(carried),
+            "comment_posts_grown": len(grown_posts),
+            "comment_posts_unchanged": plan.unchanged,
+            "comment_posts_deferred": plan.deferred
+        }
+
+    def _carried_comment_posts(self, posts: List[Any], refreshes_used: int, fetches_used: int) -> List[str]:
+        """Queued posts of this subreddit to fetch comments for, within both remaining budgets"""
+        # Carried threads are refetches of stored posts, so they count against the refresh cap too
+        caps = (
+            _remaining(self.max_comment_refreshes, refreshes_used),
+            _remaining(self.max_comment_fetches, fetches_used)
+        )
+        budget = min((cap for cap in caps if cap is not None), default=None)
+        if budget == 0:
+            return []
+
+        # Listed posts are planned from their baselines instead
+        listed = {post.id for post in posts}
+        limit = budget + len(listed) if budget is not None else None
+        pending = self.storage.get_pending_comment_post_ids(self.subreddit_name, limit)
+        return [post_id for post_id in pending if post_id not in listed][:budget]
+
+    def refresh_post_metrics(
+            self,
+            post_ids: Optional[List[str]] = None,
+            max_posts: int = 1000,
+            max_age_days: Optional[float] = 7,
+            comment_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Re-fetch stored posts through /api/info, update their metrics and load comments of grown threads"""
+        if post_ids is None:
+            since = (datetime.now() - timedelta(days=max_age_days)).timestamp() if max_age_days is not None else None
+            post_ids = self.storage.get_recent_post_ids(self.subreddit_name, since=since, limit=max_posts)
+
+        self.logger.info(f"Starting metric refresh for {len(post_ids)} posts")
+
+        try:
+            stored_counts = self.storage.get_comment_baselines(post_ids)
+            posts = self.extractor.fetch_posts_info(post_ids)
+            self._record_metrics(self.storage.record_post_metrics, posts, "posts")
+            plan = plan_comment_refresh(posts, stored_counts, self.max_comment_refreshes)
+
+            # Every grown thread, refetched now or not, is queued before its true count is written,
+            # so a later run still sees the growth
+            pending = {
+                post.id: stored_counts[post.id]
+                for post in posts
+                if post.id in stored_counts and (post.num_comments or 0) > stored_counts[post.id]
+            }
+            pending.update((post_id, stored_counts.get(post_id, 0)) for post_id in plan.post_ids)
+            self.storage.mark_comments_pending(pending)
+            posts_updated = self.storage.update_post_metrics(posts)
+
+            if plan.post_ids:
+                comment_results = self.extract_and_load_comments(post_ids=plan.post_ids, comment_limit=comment_limit)
+            else:
+                comment_results = {
+                    "comments_saved": 0,
+                    "comments_skipped": 0,
+                    "total_extracted": 0,
+                    "posts_processed": 0,
+                    "expansion": summarize_expansions([])
+                }
+
+            result = {
+                "posts_requested": len(post_ids),
+                "posts_refreshed": len(posts),
+                "posts_updated": posts_updated,
+                "comment_posts_deferred": plan.deferred,
+                "comments": comment_results
+            }
+
+            self.logger.info(f"Metric refresh completed: {result}")
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Error in metric refresh: {e}")
+            raise
+        finally:
+            self.storage.flush()
+
     def extract_and_load_comments(
             self,
             post_ids: Optional[list] = None,
@@ -102,31 +324,34 @@ class RedditETLPipeline:
             comments_saved = 0
             comments_skipped = 0
 
-            for post_id in post_ids:
-                try:
-                    comments = self.extractor.extract_comments(post_id, limit=comment_limit)
-                    total_comments += len(comments)
-
-                    for comment in comments:
-                        if self.storage.comment_exists(comment.id):
-                            comments_skipped += 1
-                            self.logger.debug(f"Comment {comment.id} already exists")
-                        else:
-                            if self.storage.save_comment(comment):
-                                comments_saved += 1
-                                self.logger.debug(f"Saved comment: {comment.id}")
-                            else:
-                                self.logger.error(f"Failed to save comment: {comment.id}")
+            if self.comment_workers > 1:
+                fetches = self.extractor.iter_comments_concurrently(
+                    post_ids, limit=comment_limit, max_workers=self.comment_workers
+                )
+            else:
+                fetches = self._iter_comments_sequentially(post_ids, comment_limit)
 
-                except Exception as e:
-                    self.logger.error(f"Error extracting comments for post {post_id}: {e}")
+            # Each tree is loaded as soon as its fetch completes; sequential trees stream in batches
+            for fetch in fetches:
+                if fetch.error is not None:
+                    self.logger.error(f"Error extracting comments for post {fetch.post_id}: {fetch.error}")
                     continue
 
+                try:
+                    loaded = self.load_new_comments(fetch.comments)
+                    total_comments += loaded.extracted
+                    comments_saved += loaded.saved
+                    comments_skipped += loaded.skipped
+                    self._finish_comment_load(fetch.post_id, loaded.failed)
+                except Exception as e:
+                    self.logger.error(f"Error loading comments for post {fetch.post_id}: {e}")
+
             result = {
                 "comments_saved": comments_saved,
                 "comments_skipped": comments_skipped,
                 "total_extracted": total_comments,
-                "posts_processed": len(post_ids)
+                "posts_processed": len(post_ids),
+                "expansion": self._expansion_summary(post_ids)
             }
 
             self.logger.info(f"Comment extraction completed: {result}")
@@ -136,11 +361,76 @@ class RedditETLPipeline:
             self.logger.error(f"Error in comment extraction: {e}")
             raise
 
+    def _finish_comment_load(self, post_id: str, failed: int) -> None:
+        """Take a post off the comment queue, unless some of its comments failed to save"""
+        if failed:
+            self.logger.warning(f"{failed} comments of post {post_id} failed to save, keeping it queued")
+            return
+        self.storage.clear_comments_pending([post_id])
+
+    def _record_metrics(self, record: Callable[[List[Any]], int], items: List[Any], item_type: str) -> None:
+        """Append metric snapshots; a failed snapshot is logged rather than failing the load"""
+        try:
+            written = record(items)
+            self.logger.debug(f"Recorded {written} changed {item_type} metric snapshots of {len(items)}")
+        except Exception as e:
+            self.logger.error(f"Failed to record metric snapshots of {len(items)} {item_type}: {e}")
+
+    def _with_comment_snapshots(self, comments: Iterable[Any]) -> Iterator[Any]:
+        """Pass a comment stream through, snapshotting each batch's scores on the way"""
+        for batch in chunked(comments, self.load_batch_size):
+            self._record_metrics(self.storage.record_comment_metrics, batch, "comments")
+            yield from batch
+
+    def _expansion_summary(self, post_ids: Iterable[str]) -> Dict[str, Any]:
+        """Sum up (and forget) the extractor's expansion outcome of each finished comment tree"""
+        expansions = self.extractor.comment_expansions
+        taken = [expansions.pop(post_id, None) for post_id in post_ids]
+        return summarize_expansions(expansion for expansion in taken if isinstance(expansion, ExpansionResult))
+
+    def _iter_comments_sequentially(
+            self,
+            post_ids: List[str],
+            comment_limit: Optional[int]
+    ) -> Iterator[CommentFetchResult]:
+        """Stream comment trees one post at a time, without materializing a tree before loading it"""
+        for post_id in post_ids:
+            try:
+                yield CommentFetchResult(post_id, self.extractor.iter_comments(post_id, limit=comment_limit))
+            except Exception as e:
+                yield CommentFetchResult(post_id, [], e)
+
+    def load_new_posts(self, posts: Iterable[Any]) -> LoadResult:
+        """Snapshot the posts' metrics and write unseen posts in batches, without planning comment fetches"""
+        posts = list(posts)
+        self._record_metrics(self.storage.record_post_metrics, posts, "posts")
+        return self._load_new_items(posts, self.storage.get_existing_post_ids, self.storage.upsert_posts, "posts")
+
+    def load_new_comments(self, comments: Iterable[Any]) -> LoadResult:
+        """Snapshot the comments' scores and write unseen comments in batches"""
+        return self._load_new_items(
+            self._with_comment_snapshots(comments),
+            self.storage.get_existing_comment_ids,
+            self.storage.upsert_comments,
+            "comments"
+        )
+
+    def _load_new_items(
+            self,
+            items: Iterable[Any],
+            get_existing_ids: Callable[[List[str]], Set[str]],
+            upsert_items: Callable[..., Dict[str, int]],
+            item_type: str
+    ) -> LoadResult:
+        """Write only unseen items, with one existence query and one transaction per batch"""
+        return load_new_items(items, get_existing_ids, upsert_items, self.load_batch_size, self.logger, item_type)
+
     def run_full_pipeline(
             self,
             post_limit: int = 25,
             time_filter: str = "day",
-            comment_limit: Optional[int] = None
+            comment_limit: Optional[int] = None,
+            incremental: bool = False
     ) -> Dict[str, Any]:
         """Run the complete ETL pipeline - extract posts and their comments"""
         self.logger.info(f"Starting full ETL pipeline for r/{self.subreddit_name}")
@@ -148,32 +438,27 @@ class RedditETLPipeline:
         pipeline_start = datetime.now()
 
         try:
-            post_results = self.extract_and_load_posts(
-                limit=post_limit,
-                time_filter=time_filter
-            )
-
-            if post_results["posts_saved"] > 0:
-                with self.db_manager.get_session() as session:
-                    from ruoa_extractor.src.core.models import RedditPost
-                    recent_posts = (session.query(RedditPost.id)
-                                    .filter_by(subreddit=self.subreddit_name)
-                                    .order_by(RedditPost.extraction_timestamp.desc())
-                                    .limit(post_results["posts_saved"])
-                                    .all())
-                    new_post_ids = [post.id for post in recent_posts]
+            if incremental:
+                post_results = self.extract_and_load_new_posts()
+            else:
+                post_results = self.extract_and_load_posts(
+                    limit=post_limit,
+                    time_filter=time_filter
+                )
 
+            if post_results["comment_post_ids"]:
                 comment_results = self.extract_and_load_comments(
-                    post_ids=new_post_ids,
+                    post_ids=post_results["comment_post_ids"],
                     comment_limit=comment_limit
                 )
             else:
-                self.logger.info("No new posts saved, skipping comment extraction")
+                self.logger.info("No new or grown comment threads, skipping comment extraction")
                 comment_results = {
                     "comments_saved": 0,
                     "comments_skipped": 0,
                     "total_extracted": 0,
-                    "posts_processed": 0
+                    "posts_processed": 0,
+                    "expansion": summarize_expansions([])
                 }
 
             pipeline_end = datetime.now()
@@ -195,6 +480,36 @@ class RedditETLPipeline:
         except Exception as e:
             self.logger.error(f"Pipeline failed: {e}")
             raise
+        finally:
+            self.storage.flush()
+
+    def run_staged_pipeline(
+            self,
+            post_limit: int = 25,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None,
+            queue_size: int = 64
+    ) -> Dict[str, Any]:
+        """Run the ETL with extraction, comment fetching and loading overlapped behind bounded queues"""
+        staged = StagedRedditPipeline(self, queue_size=queue_size)
+        try:
+            return staged.run(post_limit=post_limit, time_filter=time_filter, comment_limit=comment_limit)
+        finally:
+            self.storage.flush()
+
+    def run_stream(
+            self,
+            flush_size: int = 100,
+            flush_interval: float = 5.0,
+            max_items: Optional[int] = None,
+            max_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Follow the live submission and comment streams, resuming from the stored stream positions"""
+        stream = RedditStreamPipeline(self, flush_size=flush_size, flush_interval=flush_interval)
+        try:
+            return stream.run(max_items=max_items, max_seconds=max_seconds)
+        finally:
+            self.storage.flush()
 
     def get_pipeline_stats(self) -> Dict[str, Any]:
         """Get current statistics about the data in the pipeline"""
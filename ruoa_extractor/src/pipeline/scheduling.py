@@ -0,0 +1,95 @@
+﻿import random
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+
+class CycleOutcome(NamedTuple):
+    """How many new items one cycle found, and over how many seconds they accumulated"""
+    new_items: int
+    window_seconds: float
+
+
+class _SubredditState:
+
+    def __init__(self, history_size: int):
+        self.history: Deque[CycleOutcome] = deque(maxlen=history_size)
+        self.last_delay: Optional[float] = None
+        self.idle_cycles = 0
+        self.failures = 0
+
+
+class AdaptiveScheduler:
+    """Chooses the wait before each subreddit's next cycle from its recent activity and failures"""
+
+    def __init__(
+            self,
+            base_interval: float,
+            min_interval: float,
+            max_interval: float,
+            target_items: int = 100,
+            history_size: int = 5,
+            backoff_factor: float = 2.0,
+            retry_base: float = 60.0,
+            random_fraction: Callable[[], float] = random.random
+    ):
+        if not 0 < min_interval <= base_interval <= max_interval:
+            raise ValueError("Intervals must satisfy 0 < min_interval <= base_interval <= max_interval")
+
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_items = target_items
+        self.history_size = history_size
+        self.backoff_factor = backoff_factor
+        self.retry_base = retry_base
+        self._random_fraction = random_fraction
+        self._states: Dict[str, _SubredditState] = {}
+
+    def _state(self, key: str) -> _SubredditState:
+        if key not in self._states:
+            self._states[key] = _SubredditState(self.history_size)
+        return self._states[key]
+
+    def _clamp(self, seconds: float) -> float:
+        return max(self.min_interval, min(self.max_interval, seconds))
+
+    def record_success(self, key: str, new_items: int) -> float:
+        """Record a finished cycle and return the seconds to wait before the next one"""
+        state = self._state(key)
+        state.failures = 0
+        # Items found now accumulated since the previous cycle; the first cycle covers about one base interval
+        state.history.append(CycleOutcome(new_items, state.last_delay or self.base_interval))
+
+        if new_items == 0:
+            state.idle_cycles += 1
+            delay = self._clamp(self.base_interval * self.backoff_factor ** state.idle_cycles)
+        else:
+            state.idle_cycles = 0
+            items = sum(outcome.new_items for outcome in state.history)
+            seconds = sum(outcome.window_seconds for outcome in state.history)
+            # Aim for about target_items per cycle at the recently observed arrival rate
+            delay = self._clamp(self.target_items * seconds / items)
+
+        state.last_delay = delay
+        return delay
+
+    def record_failure(self, key: str) -> float:
+        """Record a failed cycle and return a short, jittered, exponentially growing retry delay"""
+        state = self._state(key)
+        state.failures += 1
+        ceiling = min(self.base_interval, self.retry_base * self.backoff_factor ** (state.failures - 1))
+        # Equal jitter: at least half the ceiling, so retries from many subreddits do not line up
+        delay = ceiling / 2 + self._random_fraction() * ceiling / 2
+        # The retry does not reset the window that new items accumulate over
+        state.last_delay = (state.last_delay or self.base_interval) + delay
+        return delay
+
+    def history(self, key: str) -> List[CycleOutcome]:
+        return list(self._state(key).history)
+
+
+if __name__ == "__main__":
+    scheduler = AdaptiveScheduler(base_interval=3600, min_interval=300, max_interval=86400)
+    for found in (400, 250, 0, 0, 0):
+        print(f"Found {found} items, next cycle in {scheduler.record_success('universityofauckland', found):.0f}s")
+    print(f"✅ Retry after failure in {scheduler.record_failure('universityofauckland'):.0f}s")
@@ -0,0 +1,225 @@
+﻿import logging
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from ruoa_extractor.src.core.batching import chunked
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage once the pipeline has been told to stop"""
+
+
+class StageRunner:
+    """Threads joined by bounded queues, sharing one stop signal so blocked stages can always exit"""
+
+    def __init__(self, poll_interval: float = 0.1):
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.errors: List[BaseException] = []
+        self._threads: List[threading.Thread] = []
+
+    def start(self, name: str, target: Callable[..., None], *args: Any) -> None:
+        """Run a stage on its own thread; an error in any stage stops all of them"""
+        def run() -> None:
+            try:
+                target(*args)
+            except PipelineStopped:
+                pass
+            except BaseException as e:
+                self.errors.append(e)
+                self.stop_event.set()
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def put(self, target_queue: queue.Queue, item: Any) -> None:
+        """Block while the queue is full (backpressure), giving up once the pipeline stops"""
+        while not self.stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=self.poll_interval)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def get(self, source_queue: queue.Queue) -> Any:
+        """Block until an item arrives, giving up once the pipeline stops"""
+        while True:
+            try:
+                return source_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    raise PipelineStopped()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def raise_first_error(self) -> None:
+        if self.errors:
+            raise self.errors[0]
+
+
+# Messages on the load queue, consumed in order by the loader
+POSTS = "posts"
+POSTS_DONE = "posts_done"
+COMMENTS = "comments"
+COMMENTS_DONE = "comments_done"
+COMMENTS_FAILED = "comments_failed"
+WORKER_DONE = "worker_done"
+
+_NO_MORE_POSTS = None
+
+
+class StagedRedditPipeline:
+    """Post extraction, comment-tree workers and the loader running concurrently behind bounded queues"""
+
+    def __init__(self, etl: Any, queue_size: int = 64, comment_workers: Optional[int] = None):
+        self.etl = etl
+        self.queue_size = queue_size
+        self.comment_workers = max(1, comment_workers or etl.comment_workers)
+        self.logger: logging.Logger = etl.logger
+
+    def _extract_posts(self, runner: StageRunner, load_queue: queue.Queue, post_limit: int, time_filter: str) -> None:
+        """Stage 1: page through the listing and hand posts to the loader one batch at a time"""
+        try:
+            for batch in chunked(self.etl.extractor.iter_posts(post_limit, time_filter), self.etl.load_batch_size):
+                runner.put(load_queue, (POSTS, batch))
+        finally:
+            # Always release the loader, even when the listing fails part way
+            runner.put(load_queue, (POSTS_DONE,))
+
+    def _fetch_comments(
+            self,
+            runner: StageRunner,
+            post_id_queue: queue.Queue,
+            load_queue: queue.Queue,
+            comment_limit: Optional[int]
+    ) -> None:
+        """Stage 2: turn each scheduled post ID into batches of comment models"""
+        try:
+            while not runner.stop_event.is_set():
+                post_id = runner.get(post_id_queue)
+                if post_id is _NO_MORE_POSTS:
+                    return
+
+                try:
+                    comments = self.etl.extractor.iter_comments_in_thread(post_id, limit=comment_limit)
+                    for batch in chunked(comments, self.etl.load_batch_size):
+                        runner.put(load_queue, (COMMENTS, post_id, batch))
+                    runner.put(load_queue, (COMMENTS_DONE, post_id))
+                except PipelineStopped:
+                    raise
+                except Exception as e:
+                    runner.put(load_queue, (COMMENTS_FAILED, post_id, e))
+        finally:
+            runner.put(load_queue, (WORKER_DONE,))
+
+    def run(
+            self,
+            post_limit: int = 25,
+            time_filter: str = "day",
+            comment_limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Run every stage to completion; the loader runs in the calling thread, which owns all DB sessions"""
+        self.logger.info(f"Starting staged ETL pipeline for r/{self.etl.subreddit_name}")
+        pipeline_start = datetime.now()
+
+        post_results = {
+            "posts_saved": 0,
+            "posts_skipped": 0,
+            "total_extracted": 0,
+            "comment_post_ids": [],
+            "comment_posts_carried": 0,
+            "comment_posts_unchanged": 0,
+            "comment_posts_deferred": 0
+        }
+        comment_results = {"comments_saved": 0, "comments_skipped": 0, "total_extracted": 0, "posts_processed": 0}
+
+        runner = StageRunner()
+        load_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        # Unbounded on purpose: the loader must never block on its own feedback queue, or it could deadlock
+        post_id_queue: queue.Queue = queue.Queue()
+
+        runner.start("staged-posts", self._extract_posts, runner, load_queue, post_limit, time_filter)
+        for worker in range(self.comment_workers):
+            runner.start(
+                f"staged-comments-{worker}", self._fetch_comments, runner, post_id_queue, load_queue, comment_limit
+            )
+
+        workers_running = self.comment_workers
+        # Comments per post that failed to save, so a partly loaded tree stays queued
+        comment_failures: Dict[str, int] = {}
+        # Stored threads refetched so far; the refresh cap holds for the whole run
+        refreshes_used = 0
+        batches_loaded = 0
+        try:
+            while workers_running:
+                message = runner.get(load_queue)
+                kind = message[0]
+
+                if kind == POSTS:
+                    loaded = self.etl._load_posts(
+                        message[1],
+                        refreshes_used=refreshes_used,
+                        fetches_used=len(post_results["comment_post_ids"]),
+                        # Queued threads are picked up once per run, with the first batch
+                        carry_pending=not batches_loaded
+                    )
+                    batches_loaded += 1
+                    refreshes_used += loaded["comment_posts_carried"] + loaded["comment_posts_grown"]
+                    for key in ("posts_saved", "posts_skipped", "total_extracted", "comment_posts_carried",
+                                "comment_posts_unchanged", "comment_posts_deferred"):
+                        post_results[key] += loaded[key]
+                    # Saved post IDs go straight to the comment workers, after their rows are committed
+                    for post_id in loaded["comment_post_ids"]:
+                        post_results["comment_post_ids"].append(post_id)
+                        post_id_queue.put(post_id)
+
+                elif kind == POSTS_DONE:
+                    for _ in range(self.comment_workers):
+                        post_id_queue.put(_NO_MORE_POSTS)
+
+                elif kind == COMMENTS:
+                    loaded = self.etl.load_new_comments(message[2])
+                    comment_results["comments_saved"] += loaded.saved
+                    comment_results["comments_skipped"] += loaded.skipped
+                    comment_results["total_extracted"] += loaded.extracted
+                    comment_failures[message[1]] = comment_failures.get(message[1], 0) + loaded.failed
+
+                elif kind == COMMENTS_DONE:
+                    self.etl._finish_comment_load(message[1], comment_failures.pop(message[1], 0))
+
+                elif kind == COMMENTS_FAILED:
+                    self.logger.error(f"Error extracting comments for post {message[1]}: {message[2]}")
+
+                elif kind == WORKER_DONE:
+                    workers_running -= 1
+
+        except PipelineStopped:
+            pass
+        finally:
+            runner.stop()
+            runner.join()
+
+        runner.raise_first_error()
+
+        comment_results["posts_processed"] = len(post_results["comment_post_ids"])
+        comment_results["expansion"] = self.etl._expansion_summary(post_results["comment_post_ids"])
+        duration = (datetime.now() - pipeline_start).total_seconds()
+
+        final_results = {
+            "pipeline_duration_seconds": duration,
+            "posts": post_results,
+            "comments": comment_results,
+            "total_data_points": post_results["posts_saved"] + comment_results["comments_saved"]
+        }
+
+        self.logger.info(f"Staged pipeline completed in {duration:.2f}s: {final_results}")
+        return final_results
@@ -0,0 +1,225 @@
+﻿import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from ruoa_extractor.src.core.batching import MicroBatcher
+
+
+def stream_position_key(subreddit_name: str) -> str:
+    """Checkpoint key of a subreddit or "a+b" multireddit, the same whatever the order and case of its names"""
+    return "+".join(sorted({name.strip().lower() for name in subreddit_name.split("+") if name.strip()}))
+
+
+class RedditStreamPipeline:
+    """Follows the submission and comment streams, loading micro-batches and checkpointing the stream position"""
+
+    POSTS_STREAM = "submissions_stream"
+    COMMENTS_STREAM = "comments_stream"
+
+    def __init__(
+            self,
+            etl: Any,
+            flush_size: int = 100,
+            flush_interval: float = 5.0,
+            idle_sleep: float = 5.0,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep
+    ):
+        self.etl = etl
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.idle_sleep = idle_sleep
+        self._clock = clock
+        self._sleep = sleep
+        self.logger = etl.logger
+        self.position_key = stream_position_key(etl.subreddit_name)
+        self.positions: Dict[str, Optional[float]] = {}
+        # Items that failed to load, retried with their stream's next flush
+        self.unloaded: Dict[str, Dict[str, Any]] = {self.POSTS_STREAM: {}, self.COMMENTS_STREAM: {}}
+
+    def _stored_position(self, stream: str) -> Optional[float]:
+        """The stream's checkpoint, falling back to one saved under the name as given before keys were normalised"""
+        storage = self.etl.storage
+        position = storage.get_watermark(self.position_key, stream)
+        if position is None and self.etl.subreddit_name != self.position_key:
+            position = storage.get_watermark(self.etl.subreddit_name, stream)
+        return position
+
+    def _empty_result(self) -> Dict[str, Any]:
+        return {
+            "posts": {"received": 0, "replayed": 0, "posts_saved": 0, "posts_skipped": 0},
+            "comments": {
+                "received": 0, "replayed": 0, "comments_saved": 0, "comments_skipped": 0,
+                "parents_fetched": 0, "orphaned": 0
+            },
+            "flushes": 0
+        }
+
+    def _with_unloaded(self, stream: str, batch: List[Any]) -> List[Any]:
+        """Put items that failed in earlier flushes back in front of the batch"""
+        unloaded = self.unloaded[stream]
+        return list(unloaded.values()) + [item for item in batch if item.id not in unloaded]
+
+    @staticmethod
+    def _stored_ids(items: List[Any], failed: int, get_existing_ids: Callable[[Iterable[str]], Set[str]]) -> Set[str]:
+        """IDs of the items that are stored now; only asks the database when some failed"""
+        ids = [item.id for item in items]
+        return get_existing_ids(ids) if failed else set(ids)
+
+    def _advance(self, stream: str, batch: List[Any], stored_ids: Set[str]) -> None:
+        """Move the checkpoint to the newest stored item, never past one that has not loaded yet"""
+        unloaded = self.unloaded[stream]
+        for item in batch:
+            if item.id in stored_ids:
+                unloaded.pop(item.id, None)
+            else:
+                unloaded[item.id] = item
+
+        loaded = [item for item in batch if item.id in stored_ids]
+        if unloaded:
+            # Items from the oldest unloaded one on must stay after the position, so a restart reloads them
+            oldest = min(item.created_utc for item in unloaded.values())
+            loaded = [item for item in loaded if item.created_utc < oldest]
+            self.logger.warning(f"{len(unloaded)} items not stored yet, holding the {stream} position before {oldest}")
+        if not loaded:
+            return
+
+        newest = max(loaded, key=lambda item: item.created_utc)
+        position = newest.created_utc.timestamp()
+        if self.positions.get(stream) is None or position > self.positions[stream]:
+            self.etl.storage.save_watermark(self.position_key, stream, position, newest.id)
+            self.positions[stream] = position
+
+    def _flush_posts(self, batch: List[Any], result: Dict[str, Any]) -> None:
+        batch = self._with_unloaded(self.POSTS_STREAM, batch)
+        loaded = self.etl.load_new_posts(batch)
+        result["posts"]["posts_saved"] += loaded.saved
+        result["posts"]["posts_skipped"] += loaded.skipped
+        result["flushes"] += 1
+        self._advance(
+            self.POSTS_STREAM, batch, self._stored_ids(batch, loaded.failed, self.etl.storage.get_existing_post_ids)
+        )
+
+    def _flush_comments(self, batch: List[Any], result: Dict[str, Any]) -> None:
+        """Load parent posts the database has not seen yet, then the comments that now have a parent"""
+        storage = self.etl.storage
+        batch = self._with_unloaded(self.COMMENTS_STREAM, batch)
+        parent_ids = {comment.post_id for comment in batch}
+        missing = parent_ids - storage.get_existing_post_ids(parent_ids)
+
+        unavailable: Set[str] = set()
+        if missing:
+            parents = list(self.etl.extractor.fetch_posts_info(sorted(missing)))
+            unavailable = missing - {parent.id for parent in parents}
+            loaded = self.etl.load_new_posts(parents)
+            result["comments"]["parents_fetched"] += loaded.saved
+            missing -= set(loaded.new_ids)
+
+        comments = batch
+        if missing:
+            # Deleted or unavailable parents would break the foreign key for the whole batch
+            comments = [comment for comment in batch if comment.post_id not in missing]
+            result["comments"]["orphaned"] += len(batch) - len(comments)
+            self.logger.warning(f"Dropping {len(batch) - len(comments)} comments whose posts could not be fetched")
+
+        loaded = self.etl.load_new_comments(comments)
+        result["comments"]["comments_saved"] += loaded.saved
+        result["comments"]["comments_skipped"] += loaded.skipped
+        result["flushes"] += 1
+
+        # Comments of deleted posts are dropped for good; those whose parent failed to save are retried
+        stored_ids = self._stored_ids(comments, loaded.failed, storage.get_existing_comment_ids)
+        stored_ids.update(comment.id for comment in batch if comment.post_id in unavailable)
+        self._advance(self.COMMENTS_STREAM, batch, stored_ids)
+
+    def _drain_poll(
+            self,
+            stream: str,
+            items: Iterator[Optional[Any]],
+            batcher: MicroBatcher,
+            flush: Callable[[List[Any], Dict[str, Any]], None],
+            result: Dict[str, Any],
+            key: str
+    ) -> int:
+        """Consume one poll's worth of a stream, flushing whenever the batch fills up"""
+        received = 0
+        for item in items:
+            if item is None:
+                break
+
+            received += 1
+            position = self.positions.get(stream)
+            # Streams start with recent history; anything older than the checkpoint was loaded before a restart
+            if position is not None and item.created_utc.timestamp() < position:
+                result[key]["replayed"] += 1
+                continue
+
+            result[key]["received"] += 1
+            if batcher.add(item):
+                flush(batcher.drain(), result)
+
+        return received
+
+    def run(
+            self,
+            max_items: Optional[int] = None,
+            max_seconds: Optional[float] = None,
+            stop_event: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """Stream until stopped, the item cap or the time limit is reached; buffered items are flushed on exit"""
+        name = self.etl.subreddit_name
+        self.logger.info(f"Starting stream for r/{name}")
+        stream_start = datetime.now()
+        started = self._clock()
+
+        self.positions = {stream: self._stored_position(stream) for stream in (self.POSTS_STREAM, self.COMMENTS_STREAM)}
+        self.unloaded = {self.POSTS_STREAM: {}, self.COMMENTS_STREAM: {}}
+        self.logger.info(f"Resuming from stream positions {self.positions}")
+
+        result = self._empty_result()
+        post_batcher: MicroBatcher = MicroBatcher(self.flush_size, self.flush_interval, self._clock)
+        comment_batcher: MicroBatcher = MicroBatcher(self.flush_size, self.flush_interval, self._clock)
+        streams = [
+            (self.POSTS_STREAM, self.etl.extractor.stream_posts(), post_batcher, self._flush_posts, "posts"),
+            (self.COMMENTS_STREAM, self.etl.extractor.stream_comments(), comment_batcher, self._flush_comments,
+             "comments"),
+        ]
+
+        def finished() -> bool:
+            received = result["posts"]["received"] + result["comments"]["received"]
+            return (
+                    (stop_event is not None and stop_event.is_set())
+                    or (max_items is not None and received >= max_items)
+                    or (max_seconds is not None and self._clock() - started >= max_seconds)
+            )
+
+        try:
+            while not finished():
+                polled = 0
+                for stream, items, batcher, flush, key in streams:
+                    polled += self._drain_poll(stream, items, batcher, flush, result, key)
+
+                # Time-based flush, so a quiet subreddit still lands within flush_interval
+                for _, _, batcher, flush, _ in streams:
+                    if batcher.due():
+                        flush(batcher.drain(), result)
+
+                if not polled and not finished():
+                    self._sleep(self.idle_sleep)
+        finally:
+            for _, _, batcher, flush, _ in streams:
+                if len(batcher):
+                    flush(batcher.drain(), result)
+
+        result["stream_duration_seconds"] = (datetime.now() - stream_start).total_seconds()
+        result["positions"] = dict(self.positions)
+        self.logger.info(f"Stream stopped: {result}")
+        return result
+
+
+if __name__ == "__main__":
+    from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+
+    pipeline = RedditStreamPipeline(RedditETLPipeline("universityofauckland", use_test_db=True), flush_size=10)
+    print(f"✅ Streamed: {pipeline.run(max_seconds=30)}")
@@ -1,5 +1,6 @@
 ﻿from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Dict, Iterable, Set
 
 from ruoa_extractor.src.core.models import RedditPost, RedditComment
 
@@ -42,6 +43,89 @@ class AbstractRedditStorage(ABC):
         """Get timestamp of the most recent post for incremental extraction"""
         pass
 
+    def get_watermark(self, subreddit: str, stream: str) -> Optional[float]:
+        """Get the stored high-water mark (Unix timestamp) of an extraction stream"""
+        return None
+
+    def save_watermark(self, subreddit: str, stream: str, timestamp: float, last_id: Optional[str] = None) -> None:
+        """Persist the high-water mark of an extraction stream"""
+        pass
+
+    def flush(self) -> None:
+        """Write out anything buffered; storage that writes through has nothing to do"""
+        pass
+
+    def get_existing_post_ids(self, post_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of post IDs that are already stored"""
+        return {post_id for post_id in post_ids if self.post_exists(post_id)}
+
+    def get_existing_comment_ids(self, comment_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of comment IDs that are already stored"""
+        return {comment_id for comment_id in comment_ids if self.comment_exists(comment_id)}
+
+    def get_post_comment_counts(self, post_ids: Iterable[str]) -> Dict[str, int]:
+        """Return the stored num_comments of each known post; backends without it report no posts"""
+        return {}
+
+    def get_comment_baselines(self, post_ids: Iterable[str]) -> Dict[str, int]:
+        """Return the comment count each stored post's loaded comments cover; without a queue that is num_comments"""
+        return self.get_post_comment_counts(post_ids)
+
+    def mark_comments_pending(self, baselines: Dict[str, int]) -> None:
+        """Queue posts whose comments still have to be loaded, with the count already covered"""
+        pass
+
+    def clear_comments_pending(self, post_ids: Iterable[str]) -> None:
+        """Drop posts from the comment queue once their comments are loaded"""
+        pass
+
+    def get_pending_comment_post_ids(self, subreddit: str, limit: Optional[int] = None) -> List[str]:
+        """Return queued posts of the subreddit, longest waiting first; backends without a queue report none"""
+        return []
+
+    def get_recent_post_ids(
+            self,
+            subreddit: str,
+            since: Optional[float] = None,
+            limit: Optional[int] = None
+    ) -> List[str]:
+        """Return IDs of stored posts created after `since`, newest first; backends without it report none"""
+        return []
+
+    def record_post_metrics(self, posts: Iterable[RedditPost], captured_at: Optional[datetime] = None) -> int:
+        """Append a metrics snapshot for each post whose metrics changed; backends without snapshots write none"""
+        return 0
+
+    def record_comment_metrics(self, comments: Iterable[RedditComment], captured_at: Optional[datetime] = None) -> int:
+        """Append a score snapshot for each comment whose score changed; backends without snapshots write none"""
+        return 0
+
+    def update_post_metrics(self, posts: Iterable[RedditPost]) -> int:
+        """Overwrite the engagement metrics of stored posts, return count of updated posts"""
+        return self.upsert_posts(posts, update_existing=True)["updated"]
+
+    def upsert_posts(self, posts: Iterable[RedditPost], update_existing: bool = True) -> Dict[str, int]:
+        """Save posts and report how many were inserted or updated"""
+        inserted = updated = 0
+        for post in posts:
+            if self.post_exists(post.id):
+                if update_existing and self.save_post(post):
+                    updated += 1
+            elif self.save_post(post):
+                inserted += 1
+        return {"inserted": inserted, "updated": updated}
+
+    def upsert_comments(self, comments: Iterable[RedditComment], update_existing: bool = True) -> Dict[str, int]:
+        """Save comments and report how many were inserted or updated"""
+        inserted = updated = 0
+        for comment in comments:
+            if self.comment_exists(comment.id):
+                if update_existing and self.save_comment(comment):
+                    updated += 1
+            elif self.save_comment(comment):
+                inserted += 1
+        return {"inserted": inserted, "updated": updated}
+
 
 if __name__ == "__main__":
     print("AbstractRedditStorage created successfully!")
@@ -0,0 +1,118 @@
+﻿import io
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple, Type
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ruoa_extractor.src.storage.database_storage import DatabaseRedditStorage, model_to_row
+from ruoa_extractor.src.core.models import Base
+from ruoa_extractor.src.core.database import DatabaseManager
+from ruoa_extractor.src.core.batching import chunked
+
+
+def _csv_field(value: Any) -> str:
+    """Encode one value for COPY ... CSV, where an unquoted empty field means NULL"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def rows_to_csv(rows: Iterable[Dict[str, Any]], columns: List[str]) -> io.StringIO:
+    """Render rows as a CSV buffer in the given column order"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_csv_field(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+class CopyRedditStorage(DatabaseRedditStorage):
+    """Database storage that bulk loads through PostgreSQL COPY and a staging-table merge"""
+
+    STAGING_PREFIX = "stg_"
+
+    def __init__(self, database_manager: DatabaseManager, batch_size: int = 10000):
+        super().__init__(database_manager, batch_size=batch_size)
+
+    def _bulk_upsert(self, model: Type[Base], items: Iterable[Any], update_existing: bool) -> Dict[str, int]:
+        """COPY each batch into staging and merge it in one statement, or fall back to INSERT on SQLite"""
+        if self.db_manager.engine.dialect.name != "postgresql":
+            return super()._bulk_upsert(model, items, update_existing)
+
+        counts = {"inserted": 0, "updated": 0}
+        for batch in chunked((model_to_row(item, model) for item in items), self.batch_size):
+            try:
+                with self.db_manager.get_session() as session:
+                    inserted, updated = self._copy_batch(session, model, batch, update_existing)
+            except Exception as e:
+                # One bad row must not cost the whole batch
+                self.logger.warning(
+                    f"COPY of {len(batch)} {model.__tablename__} rows failed, retrying row by row: {e}"
+                )
+                inserted, updated = self._merge_rows(model, batch, update_existing)
+            counts["inserted"] += inserted
+            counts["updated"] += updated
+
+        return counts
+
+    def _copy_batch(
+            self,
+            session: Session,
+            model: Type[Base],
+            batch: List[Dict[str, Any]],
+            update_existing: bool
+    ) -> Tuple[int, int]:
+        """COPY one batch into a staging table private to the transaction and merge it into the target"""
+        table = model.__table__
+        staging = f"{self.STAGING_PREFIX}{table.name}"
+        columns = [column.name for column in table.columns]
+        column_list = ", ".join(columns)
+
+        # Built from the live table on every transaction, so it always matches the migrated schema;
+        # a temporary table is private to its connection, so concurrent loaders never share one
+        session.execute(text(
+            f"CREATE TEMPORARY TABLE {staging} "
+            f"(LIKE {table.name} INCLUDING DEFAULTS, _load_seq BIGSERIAL) ON COMMIT DROP"
+        ))
+
+        cursor = session.connection().connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                rows_to_csv(batch, columns)
+            )
+        finally:
+            cursor.close()
+
+        if update_existing:
+            updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != "id")
+            conflict = f"DO UPDATE SET {updates}"
+        else:
+            conflict = "DO NOTHING"
+
+        # DISTINCT ON keeps the last staged copy of each id, as ON CONFLICT may touch a row only once
+        counts = session.execute(text(
+            f"WITH merged AS ("
+            f"INSERT INTO {table.name} ({column_list}) "
+            f"SELECT DISTINCT ON (id) {column_list} FROM {staging} ORDER BY id, _load_seq DESC "
+            f"ON CONFLICT (id) {conflict} "
+            f"RETURNING (xmax = 0) AS inserted"
+            f") SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged"
+        )).one()
+        return counts[0], counts[1]
+
+
+if __name__ == "__main__":
+    from ruoa_extractor.src.config.config import get_database_url
+
+    db_manager = DatabaseManager(get_database_url(use_test_db=True))
+    db_manager.create_tables()
+
+    storage = CopyRedditStorage(db_manager)
+    print(f"✅ CopyRedditStorage ready on {db_manager.engine.dialect.name}")
@@ -1,23 +1,68 @@
-﻿from typing import List, Optional
+﻿import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Optional, Dict, Any, Iterable, Type, Set, Tuple
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from sqlalchemy import and_, delete, func, insert, literal_column, select, update, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from ruoa_extractor.src.storage.abstract_storage import AbstractRedditStorage
-from ruoa_extractor.src.core.models import RedditPost, RedditComment
+from ruoa_extractor.src.core.models import (
+    Base, RedditPost, RedditComment, ExtractionCheckpoint, PostMetricsSnapshot, CommentMetricsSnapshot,
+    PendingCommentFetch
+)
 from ruoa_extractor.src.core.database import DatabaseManager
+from ruoa_extractor.src.core.batching import chunked
+from ruoa_extractor.src.core.records import RECORD_TYPES, as_model
+
+# Both PostgreSQL and modern SQLite accept 32766 bound parameters per statement
+MAX_STATEMENT_PARAMETERS = 32766
+
+# Post columns that change after a post is first stored
+POST_METRIC_COLUMNS = ("score", "num_comments", "upvote_ratio")
+COMMENT_METRIC_COLUMNS = ("score",)
+
+
+def model_to_row(item: Any, model: Type[Base]) -> Dict[str, Any]:
+    """Convert a record or model instance into a plain column dict for Core statements"""
+    if isinstance(item, RECORD_TYPES):
+        # Record fields are exactly the table columns
+        row = item._asdict()
+    else:
+        row = {column.name: getattr(item, column.name, None) for column in model.__table__.columns}
+    if row.get("extraction_timestamp") is None:
+        row["extraction_timestamp"] = datetime.utcnow()
+    return row
+
+
+def _metric_value(value: Any) -> Any:
+    """Normalize a metric for comparison: the API sends floats, the database returns Decimals"""
+    if isinstance(value, (float, Decimal)):
+        return round(float(value), 3)
+    return value
+
+
+def _utc_timestamp(value: datetime) -> float:
+    """Convert a stored timestamp to Unix time, reading naive values as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
 
 
 class DatabaseRedditStorage(AbstractRedditStorage):
     """Concrete implementation of Reddit storage using database"""
 
-    def __init__(self, database_manager: DatabaseManager):
+    def __init__(self, database_manager: DatabaseManager, batch_size: int = 1000):
         self.db_manager = database_manager
+        self.batch_size = batch_size
+        self.logger = logging.getLogger("RedditDatabaseStorage")
 
     def save_post(self, post: RedditPost) -> bool:
         """Save a single Reddit post"""
         try:
             with self.db_manager.get_session() as session:
-                session.merge(post)
+                session.merge(as_model(post))
                 return True
         except Exception as e:
             print(f"Error saving post {post.id}: {e}")
@@ -25,24 +70,14 @@ class DatabaseRedditStorage(AbstractRedditStorage):
 
     def save_posts(self, posts: List[RedditPost]) -> int:
         """Save multiple Reddit posts, return count of saved posts"""
-        saved_count = 0
-
-        with self.db_manager.get_session() as session:
-            for post in posts:
-                try:
-                    session.merge(post)
-                    saved_count += 1
-                except Exception as e:
-                    print(f"Error saving post {post.id}: {e}")
-                    session.rollback()
-
-        return saved_count
+        counts = self.upsert_posts(posts)
+        return counts["inserted"] + counts["updated"]
 
     def save_comment(self, comment: RedditComment) -> bool:
         """Save a single Reddit comment"""
         try:
             with self.db_manager.get_session() as session:
-                session.merge(comment)
+                session.merge(as_model(comment))
                 return True
         except Exception as e:
             print(f"Error saving comment {comment.id}: {e}")
@@ -50,18 +85,128 @@ class DatabaseRedditStorage(AbstractRedditStorage):
 
     def save_comments(self, comments: List[RedditComment]) -> int:
         """Save multiple Reddit comments, return count of saved comments"""
-        saved_count = 0
+        counts = self.upsert_comments(comments)
+        return counts["inserted"] + counts["updated"]
 
-        with self.db_manager.get_session() as session:
-            for comment in comments:
-                try:
-                    session.merge(comment)
-                    saved_count += 1
-                except Exception as e:
-                    print(f"Error saving comment {comment.id}: {e}")
-                    session.rollback()
+    def upsert_posts(self, posts: Iterable[RedditPost], update_existing: bool = True) -> Dict[str, int]:
+        """Insert posts in set-based batches, return inserted/updated counts"""
+        return self._bulk_upsert(RedditPost, posts, update_existing)
+
+    def upsert_comments(self, comments: Iterable[RedditComment], update_existing: bool = True) -> Dict[str, int]:
+        """Insert comments in set-based batches, return inserted/updated counts"""
+        return self._bulk_upsert(RedditComment, comments, update_existing)
+
+    def _bulk_upsert(self, model: Type[Base], items: Iterable[Any], update_existing: bool) -> Dict[str, int]:
+        """Write rows with INSERT ... ON CONFLICT (id), one statement per batch"""
+        # Later duplicates win, and ON CONFLICT cannot touch the same row twice in one statement
+        rows = {}
+        for item in items:
+            row = model_to_row(item, model)
+            rows[row["id"]] = row
+
+        counts = {"inserted": 0, "updated": 0}
+        if not rows:
+            return counts
+
+        columns = len(model.__table__.columns)
+        batch_size = max(1, min(self.batch_size, MAX_STATEMENT_PARAMETERS // columns))
+
+        for batch in chunked(rows.values(), batch_size):
+            try:
+                with self.db_manager.get_session() as session:
+                    inserted, updated = self._upsert_batch(session, model, batch, update_existing)
+            except Exception as e:
+                # One bad row must not cost the whole batch
+                self.logger.warning(
+                    f"Batch of {len(batch)} {model.__tablename__} rows failed, retrying row by row: {e}"
+                )
+                inserted, updated = self._merge_rows(model, batch, update_existing)
+            counts["inserted"] += inserted
+            counts["updated"] += updated
 
-        return saved_count
+        return counts
+
+    def _merge_rows(self, model: Type[Base], rows: List[Dict[str, Any]], update_existing: bool) -> Tuple[int, int]:
+        """Write rows one transaction each, logging and skipping the ones that fail"""
+        inserted = updated = 0
+        for row in rows:
+            try:
+                with self.db_manager.get_session() as session:
+                    row_inserted, row_updated = self._merge_row(session, model, row, update_existing)
+            except Exception as e:
+                self.logger.error(f"Skipping {model.__tablename__} row {row['id']}: {e}")
+                continue
+            inserted += row_inserted
+            updated += row_updated
+        return inserted, updated
+
+    @staticmethod
+    def _merge_row(session: Session, model: Type[Base], row: Dict[str, Any], update_existing: bool) -> Tuple[int, int]:
+        """Insert or merge one row through the ORM, the portable path for any dialect"""
+        if session.get(model, row["id"]) is None:
+            session.add(model(**row))
+            return 1, 0
+        if not update_existing:
+            return 0, 0
+        session.merge(model(**row))
+        return 0, 1
+
+    def _upsert_batch(
+            self,
+            session: Session,
+            model: Type[Base],
+            batch: List[Dict[str, Any]],
+            update_existing: bool
+    ) -> tuple[int, int]:
+        """Upsert one batch and count inserted/updated rows from RETURNING"""
+        table = model.__table__
+        dialect = session.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            statement = postgresql.insert(table).values(batch)
+            if update_existing:
+                statement = statement.on_conflict_do_update(
+                    index_elements=[table.c.id],
+                    set_=self._conflict_updates(statement, table)
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=[table.c.id])
+
+            # xmax is zero only for tuples created by this statement
+            statement = statement.returning(table.c.id, literal_column("(xmax = 0)").label("inserted"))
+            returned = session.execute(statement).all()
+            inserted = sum(1 for row in returned if row.inserted)
+            return inserted, len(returned) - inserted
+
+        if dialect == "sqlite":
+            # SQLite cannot tell inserts from updates in one RETURNING, so split the batch
+            statement = sqlite.insert(table).values(batch).on_conflict_do_nothing(index_elements=[table.c.id])
+            inserted_ids = set(session.execute(statement.returning(table.c.id)).scalars())
+
+            remaining = [row for row in batch if row["id"] not in inserted_ids]
+            if not update_existing or not remaining:
+                return len(inserted_ids), 0
+
+            statement = sqlite.insert(table).values(remaining)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_=self._conflict_updates(statement, table)
+            )
+            updated = len(session.execute(statement.returning(table.c.id)).all())
+            return len(inserted_ids), updated
+
+        # Dialects without ON CONFLICT take the per-row merge inside the batch's transaction
+        inserted = updated = 0
+        for row in batch:
+            row_inserted, row_updated = self._merge_row(session, model, row, update_existing)
+            inserted += row_inserted
+            updated += row_updated
+        return inserted, updated
+
+    @staticmethod
+    def _conflict_updates(statement: Any, table: Any) -> Dict[str, Any]:
+        """Map every non-key column to its EXCLUDED value"""
+        return {column.name: statement.excluded[column.name] for column in table.columns if not column.primary_key}
 
     def post_exists(self, post_id: str) -> bool:
         """Check if a post already exists in storage"""
@@ -75,6 +220,190 @@ class DatabaseRedditStorage(AbstractRedditStorage):
             comment = session.query(RedditComment).filter_by(id=comment_id).first()
             return comment is not None
 
+    def get_existing_post_ids(self, post_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of post IDs that are already stored, one query per batch"""
+        return self._existing_ids(RedditPost, post_ids)
+
+    def get_existing_comment_ids(self, comment_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of comment IDs that are already stored, one query per batch"""
+        return self._existing_ids(RedditComment, comment_ids)
+
+    def _existing_ids(self, model: Type[Base], ids: Iterable[str]) -> Set[str]:
+        """Resolve stored IDs with IN queries sized to the statement parameter limit"""
+        existing = set()
+        unique_ids = list(dict.fromkeys(ids))
+        if not unique_ids:
+            return existing
+
+        with self.db_manager.get_session() as session:
+            for batch in chunked(unique_ids, min(self.batch_size, MAX_STATEMENT_PARAMETERS)):
+                existing.update(row.id for row in session.query(model.id).filter(model.id.in_(batch)))
+
+        return existing
+
+    def get_post_comment_counts(self, post_ids: Iterable[str]) -> Dict[str, int]:
+        """Return the stored num_comments of each known post, one query per batch"""
+        counts = {}
+        unique_ids = list(dict.fromkeys(post_ids))
+        if not unique_ids:
+            return counts
+
+        with self.db_manager.get_session() as session:
+            for batch in chunked(unique_ids, min(self.batch_size, MAX_STATEMENT_PARAMETERS)):
+                query = session.query(RedditPost.id, RedditPost.num_comments).filter(RedditPost.id.in_(batch))
+                counts.update((row.id, row.num_comments or 0) for row in query)
+
+        return counts
+
+    def get_comment_baselines(self, post_ids: Iterable[str]) -> Dict[str, int]:
+        """Return the comment count covered by each stored post's loaded comments, one query per batch"""
+        baselines = {}
+        unique_ids = list(dict.fromkeys(post_ids))
+        if not unique_ids:
+            return baselines
+
+        # A queued post's comments only cover the count recorded when it was queued
+        covered = func.coalesce(PendingCommentFetch.loaded_num_comments, RedditPost.num_comments, 0)
+        with self.db_manager.get_session() as session:
+            for batch in chunked(unique_ids, min(self.batch_size, MAX_STATEMENT_PARAMETERS)):
+                query = (select(RedditPost.id, covered)
+                         .outerjoin(PendingCommentFetch, PendingCommentFetch.post_id == RedditPost.id)
+                         .where(RedditPost.id.in_(batch)))
+                baselines.update((post_id, count) for post_id, count in session.execute(query))
+
+        return baselines
+
+    def mark_comments_pending(self, baselines: Dict[str, int]) -> None:
+        """Queue posts for a comment load; a post already queued keeps its older baseline"""
+        if not baselines:
+            return
+
+        queued_at = datetime.utcnow()
+        with self.db_manager.get_session() as session:
+            for batch in chunked(list(baselines.items()), min(self.batch_size, MAX_STATEMENT_PARAMETERS)):
+                batch_ids = [post_id for post_id, _ in batch]
+                queued = set(session.scalars(
+                    select(PendingCommentFetch.post_id).where(PendingCommentFetch.post_id.in_(batch_ids))
+                ))
+                rows = [
+                    {"post_id": post_id, "loaded_num_comments": count, "queued_at": queued_at}
+                    for post_id, count in batch
+                    if post_id not in queued
+                ]
+                if rows:
+                    session.execute(insert(PendingCommentFetch), rows)
+
+    def clear_comments_pending(self, post_ids: Iterable[str]) -> None:
+        """Drop posts from the comment queue once their comments are loaded"""
+        unique_ids = list(dict.fromkeys(post_ids))
+        with self.db_manager.get_session() as session:
+            for batch in chunked(unique_ids, min(self.batch_size, MAX_STATEMENT_PARAMETERS)):
+                session.execute(delete(PendingCommentFetch).where(PendingCommentFetch.post_id.in_(batch)))
+
+    def get_pending_comment_post_ids(self, subreddit: str, limit: Optional[int] = None) -> List[str]:
+        """Return queued posts of the subreddit, longest waiting first"""
+        query = (select(PendingCommentFetch.post_id)
+                 .join(RedditPost, RedditPost.id == PendingCommentFetch.post_id)
+                 .where(RedditPost.subreddit == subreddit)
+                 .order_by(PendingCommentFetch.queued_at, PendingCommentFetch.post_id))
+        if limit is not None:
+            query = query.limit(limit)
+        with self.db_manager.get_session() as session:
+            return list(session.scalars(query))
+
+    def get_recent_post_ids(
+            self,
+            subreddit: str,
+            since: Optional[float] = None,
+            limit: Optional[int] = None
+    ) -> List[str]:
+        """Return IDs of stored posts created after `since`, newest first"""
+        with self.db_manager.get_session() as session:
+            query = session.query(RedditPost.id).filter(RedditPost.subreddit == subreddit)
+            if since is not None:
+                cutoff = datetime.fromtimestamp(since, tz=timezone.utc).replace(tzinfo=None)
+                query = query.filter(RedditPost.created_utc > cutoff)
+            query = query.order_by(RedditPost.created_utc.desc())
+            if limit is not None:
+                query = query.limit(limit)
+            return [row.id for row in query]
+
+    def update_post_metrics(self, posts: Iterable[RedditPost]) -> int:
+        """Overwrite the engagement metrics of stored posts with one executemany UPDATE per batch"""
+        table = RedditPost.__table__
+        statement = (update(table)
+                     .where(table.c.id == bindparam("post_id"))
+                     .values({column: bindparam(f"new_{column}") for column in POST_METRIC_COLUMNS}))
+
+        # Rows for posts deleted since they were fetched simply match nothing
+        rows = [
+            {"post_id": post.id, **{f"new_{column}": getattr(post, column) for column in POST_METRIC_COLUMNS}}
+            for post in posts
+        ]
+        updated = 0
+
+        with self.db_manager.get_session() as session:
+            for batch in chunked(rows, self.batch_size):
+                updated += session.execute(statement, batch).rowcount
+
+        return updated
+
+    def record_post_metrics(self, posts: Iterable[RedditPost], captured_at: Optional[datetime] = None) -> int:
+        """Append a metrics snapshot for each post whose metrics changed since its last one, return rows written"""
+        return self._record_snapshots(PostMetricsSnapshot, "post_id", POST_METRIC_COLUMNS, posts, captured_at)
+
+    def record_comment_metrics(self, comments: Iterable[RedditComment], captured_at: Optional[datetime] = None) -> int:
+        """Append a score snapshot for each comment whose score changed since its last one, return rows written"""
+        return self._record_snapshots(
+            CommentMetricsSnapshot, "comment_id", COMMENT_METRIC_COLUMNS, comments, captured_at
+        )
+
+    def _record_snapshots(
+            self,
+            model: Type[Base],
+            key: str,
+            columns: Tuple[str, ...],
+            items: Iterable[Any],
+            captured_at: Optional[datetime]
+    ) -> int:
+        """Bulk insert snapshots, skipping items whose metrics equal their latest stored snapshot"""
+        captured_at = captured_at or datetime.utcnow()
+        # The same item listed twice in one capture keeps its last values
+        values = {item.id: tuple(_metric_value(getattr(item, column)) for column in columns) for item in items}
+        written = 0
+
+        with self.db_manager.get_session() as session:
+            for batch in chunked(values.items(), self.batch_size):
+                previous = self._latest_snapshots(session, model, key, columns, [item_id for item_id, _ in batch])
+                rows = [
+                    {key: item_id, "captured_at": captured_at, "resolution_seconds": 0, **dict(zip(columns, metrics))}
+                    for item_id, metrics in batch
+                    if previous.get(item_id) != metrics
+                ]
+                if rows:
+                    session.execute(insert(model), rows)
+                    written += len(rows)
+
+        return written
+
+    @staticmethod
+    def _latest_snapshots(
+            session: Session,
+            model: Type[Base],
+            key: str,
+            columns: Tuple[str, ...],
+            item_ids: List[str]
+    ) -> Dict[str, Tuple[Any, ...]]:
+        """Metrics of the newest snapshot of each item, in one query"""
+        table = model.__table__
+        latest = (select(table.c[key], func.max(table.c.captured_at).label("captured_at"))
+                  .where(table.c[key].in_(item_ids))
+                  .group_by(table.c[key])
+                  .subquery())
+        query = (select(table.c[key], *(table.c[column] for column in columns))
+                 .join(latest, and_(table.c[key] == latest.c[key], table.c.captured_at == latest.c.captured_at)))
+        return {row[0]: tuple(_metric_value(value) for value in row[1:]) for row in session.execute(query)}
+
     def get_latest_post_timestamp(self, subreddit: str) -> Optional[float]:
         """Get timestamp of the most recent post for incremental extraction"""
         with self.db_manager.get_session() as session:
@@ -84,9 +413,28 @@ class DatabaseRedditStorage(AbstractRedditStorage):
                            .first())
 
             if latest_post and latest_post.created_utc:
-                return latest_post.created_utc.timestamp()
+                return _utc_timestamp(latest_post.created_utc)
+            return None
+
+    def get_watermark(self, subreddit: str, stream: str) -> Optional[float]:
+        """Get the stored high-water mark (Unix timestamp) of an extraction stream"""
+        with self.db_manager.get_session() as session:
+            checkpoint = session.get(ExtractionCheckpoint, (subreddit, stream))
+            if checkpoint and checkpoint.high_watermark:
+                return _utc_timestamp(checkpoint.high_watermark)
             return None
 
+    def save_watermark(self, subreddit: str, stream: str, timestamp: float, last_id: Optional[str] = None) -> None:
+        """Persist the high-water mark of an extraction stream"""
+        with self.db_manager.get_session() as session:
+            session.merge(ExtractionCheckpoint(
+                subreddit=subreddit,
+                stream=stream,
+                high_watermark=datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None),
+                last_id=last_id,
+                updated_at=datetime.utcnow()
+            ))
+
     def get_post_count(self, subreddit: str) -> int:
         """Get total count of posts for a subreddit"""
         with self.db_manager.get_session() as session:
@@ -0,0 +1,131 @@
+﻿import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from ruoa_extractor.src.storage.abstract_storage import AbstractRedditStorage
+from ruoa_extractor.src.core.models import RedditPost, RedditComment
+
+
+class FanOutRedditStorage(AbstractRedditStorage):
+    """Writes to a primary storage and copies every write to secondary sinks; reads come from the primary only"""
+
+    def __init__(self, primary: AbstractRedditStorage, secondaries: Sequence[AbstractRedditStorage]):
+        self.primary = primary
+        self.secondaries = list(secondaries)
+        self.logger = logging.getLogger("RedditFanOutStorage")
+
+    def __getattr__(self, name: str) -> Any:
+        # Backend-specific reads such as get_post_count go to the primary
+        if name == "primary":
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    def _copy(self, method: str, items: List[Any], **kwargs: Any) -> None:
+        for secondary in self.secondaries:
+            try:
+                getattr(secondary, method)(items, **kwargs)
+            except Exception as e:
+                # The primary already holds the rows; a failed copy must not turn into a failed load
+                self.logger.error(f"{type(secondary).__name__}.{method} failed for {len(items)} items: {e}")
+
+    def upsert_posts(self, posts: Iterable[RedditPost], update_existing: bool = True) -> Dict[str, int]:
+        """Save posts to the primary, then copy them to every secondary"""
+        posts = list(posts)
+        counts = self.primary.upsert_posts(posts, update_existing=update_existing)
+        self._copy("upsert_posts", posts, update_existing=update_existing)
+        return counts
+
+    def upsert_comments(self, comments: Iterable[RedditComment], update_existing: bool = True) -> Dict[str, int]:
+        """Save comments to the primary, then copy them to every secondary"""
+        comments = list(comments)
+        counts = self.primary.upsert_comments(comments, update_existing=update_existing)
+        self._copy("upsert_comments", comments, update_existing=update_existing)
+        return counts
+
+    def update_post_metrics(self, posts: Iterable[RedditPost]) -> int:
+        """Update metrics in the primary; secondaries receive the refreshed posts as new versions"""
+        posts = list(posts)
+        updated = self.primary.update_post_metrics(posts)
+        self._copy("upsert_posts", posts, update_existing=True)
+        return updated
+
+    def record_post_metrics(self, posts: Iterable[RedditPost], captured_at: Optional[datetime] = None) -> int:
+        return self.primary.record_post_metrics(posts, captured_at)
+
+    def record_comment_metrics(self, comments: Iterable[RedditComment], captured_at: Optional[datetime] = None) -> int:
+        return self.primary.record_comment_metrics(comments, captured_at)
+
+    def save_post(self, post: RedditPost) -> bool:
+        """Save a single Reddit post"""
+        counts = self.upsert_posts([post])
+        return counts["inserted"] + counts["updated"] > 0
+
+    def save_posts(self, posts: List[RedditPost]) -> int:
+        """Save multiple Reddit posts, return count of saved posts"""
+        counts = self.upsert_posts(posts)
+        return counts["inserted"] + counts["updated"]
+
+    def save_comment(self, comment: RedditComment) -> bool:
+        """Save a single Reddit comment"""
+        counts = self.upsert_comments([comment])
+        return counts["inserted"] + counts["updated"] > 0
+
+    def save_comments(self, comments: List[RedditComment]) -> int:
+        """Save multiple Reddit comments, return count of saved comments"""
+        counts = self.upsert_comments(comments)
+        return counts["inserted"] + counts["updated"]
+
+    def flush(self) -> None:
+        """Write out whatever the primary and the secondaries still buffer"""
+        self.primary.flush()
+        for secondary in self.secondaries:
+            secondary.flush()
+
+    def post_exists(self, post_id: str) -> bool:
+        return self.primary.post_exists(post_id)
+
+    def comment_exists(self, comment_id: str) -> bool:
+        return self.primary.comment_exists(comment_id)
+
+    def get_existing_post_ids(self, post_ids: Iterable[str]) -> Set[str]:
+        return self.primary.get_existing_post_ids(post_ids)
+
+    def get_existing_comment_ids(self, comment_ids: Iterable[str]) -> Set[str]:
+        return self.primary.get_existing_comment_ids(comment_ids)
+
+    def get_latest_post_timestamp(self, subreddit: str) -> Optional[float]:
+        return self.primary.get_latest_post_timestamp(subreddit)
+
+    def get_watermark(self, subreddit: str, stream: str) -> Optional[float]:
+        return self.primary.get_watermark(subreddit, stream)
+
+    def save_watermark(self, subreddit: str, stream: str, timestamp: float, last_id: Optional[str] = None) -> None:
+        self.primary.save_watermark(subreddit, stream, timestamp, last_id)
+
+    def get_post_comment_counts(self, post_ids: Iterable[str]) -> Dict[str, int]:
+        return self.primary.get_post_comment_counts(post_ids)
+
+    def get_comment_baselines(self, post_ids: Iterable[str]) -> Dict[str, int]:
+        return self.primary.get_comment_baselines(post_ids)
+
+    def mark_comments_pending(self, baselines: Dict[str, int]) -> None:
+        self.primary.mark_comments_pending(baselines)
+
+    def clear_comments_pending(self, post_ids: Iterable[str]) -> None:
+        self.primary.clear_comments_pending(post_ids)
+
+    def get_pending_comment_post_ids(self, subreddit: str, limit: Optional[int] = None) -> List[str]:
+        return self.primary.get_pending_comment_post_ids(subreddit, limit)
+
+    def get_recent_post_ids(
+            self,
+            subreddit: str,
+            since: Optional[float] = None,
+            limit: Optional[int] = None
+    ) -> List[str]:
+        return self.primary.get_recent_post_ids(subreddit, since=since, limit=limit)
+
+
+if __name__ == "__main__":
+    print("FanOutRedditStorage created successfully!")
+    print("Wrap a database storage and add ParquetRedditStorage as a secondary sink.")
@@ -0,0 +1,155 @@
+﻿import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process can be coordinated
+    fcntl = None
+
+# Leading underscore: dataset discovery skips it, so the manifest is never read as data
+MANIFEST_NAME = "_manifest.json"
+LOCK_NAME = "_manifest.lock"
+PRUNE_COLUMN = "created_utc"
+
+_manifest_lock = threading.Lock()
+
+
+def _partition_values(relative_path: str) -> Dict[str, str]:
+    """Hive partition keys of a file, read from its directory names"""
+    values = {}
+    for part in os.path.dirname(relative_path).split("/"):
+        key, sep, value = part.partition("=")
+        if sep:
+            values[key] = value
+    return values
+
+
+def relative_path(path: str, table_dir: str) -> str:
+    """Manifest key of a file: its path below the table directory, with forward slashes"""
+    return os.path.relpath(path, table_dir).replace(os.sep, "/")
+
+
+def file_entry(relative_path: str, metadata: Any, size: int) -> Dict[str, Any]:
+    """Manifest entry of one Parquet file, with created_utc bounds taken from its footer statistics"""
+    low = high = None
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    if PRUNE_COLUMN in names:
+        index = names.index(PRUNE_COLUMN)
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(index).statistics
+            if statistics is None or not statistics.has_min_max:
+                continue
+            low = statistics.min.timestamp() if low is None else min(low, statistics.min.timestamp())
+            high = statistics.max.timestamp() if high is None else max(high, statistics.max.timestamp())
+
+    return {
+        "path": relative_path,
+        "partition": _partition_values(relative_path),
+        "rows": metadata.num_rows,
+        "bytes": size,
+        "min_created_utc": low,
+        "max_created_utc": high,
+    }
+
+
+def scan_files(table_dir: str) -> Iterator[str]:
+    """Relative paths of the Parquet files under a table directory, skipping hidden and temporary files"""
+    for directory, subdirectories, names in os.walk(table_dir):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith((".", "_")))
+        for name in sorted(names):
+            if name.endswith(".parquet") and not name.startswith((".", "_")):
+                yield relative_path(os.path.join(directory, name), table_dir)
+
+
+class LakeManifest:
+    """Live files of one lake table with row counts and created_utc bounds, so readers can prune without listing"""
+
+    def __init__(self, table_dir: str):
+        self.table_dir = table_dir
+        self.path = os.path.join(table_dir, MANIFEST_NAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read(self) -> Dict[str, Dict[str, Any]]:
+        """Entries by relative path; readers need no lock, since the file is swapped in whole"""
+        with open(self.path) as handle:
+            return {entry["path"]: entry for entry in json.load(handle)["files"]}
+
+    def _scan(self) -> Dict[str, Dict[str, Any]]:
+        """Entries of every file on disk, reading only footers; files still being written are left out"""
+        entries = {}
+        for relative_path in scan_files(self.table_dir):
+            path = os.path.join(self.table_dir, relative_path)
+            try:
+                entries[relative_path] = file_entry(relative_path, pq.read_metadata(path), os.path.getsize(path))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    @contextmanager
+    def locked(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """Hold the manifest lock and yield its entries, writing them back on exit; a missing manifest is rebuilt"""
+        os.makedirs(self.table_dir, exist_ok=True)
+        with _manifest_lock, open(os.path.join(self.table_dir, LOCK_NAME), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                entries = self.read() if self.exists() else self._scan()
+                yield entries
+                self._write(entries)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as handle:
+            json.dump({"updated_at": time.time(), "files": sorted(entries.values(), key=lambda e: e["path"])}, handle)
+        os.replace(temporary, self.path)
+
+    def add(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Register newly written files"""
+        with self.locked() as manifest:
+            for entry in entries:
+                manifest[entry["path"]] = entry
+
+    def rebuild(self) -> int:
+        """Re-read every footer on disk, dropping entries of files that no longer exist; returns the file count"""
+        with self.locked() as manifest:
+            manifest.clear()
+            manifest.update(self._scan())
+            return len(manifest)
+
+    def files(
+            self,
+            subreddit: Optional[str] = None,
+            since: Optional[float] = None,
+            until: Optional[float] = None
+    ) -> List[str]:
+        """Absolute paths of live files that may hold rows of the subreddit created in [since, until)"""
+        paths = []
+        for entry in self.read().values():
+            if subreddit is not None and entry["partition"].get("subreddit") != subreddit:
+                continue
+            # Files without bounds (created_utc all null) are always kept
+            low, high = entry["min_created_utc"], entry["max_created_utc"]
+            if since is not None and high is not None and high < since:
+                continue
+            if until is not None and low is not None and low >= until:
+                continue
+            paths.append(os.path.join(self.table_dir, entry["path"]))
+        return sorted(paths)
+
+
+if __name__ == "__main__":
+    import sys
+
+    manifest = LakeManifest(sys.argv[1])
+    print(f"✅ Manifest of {sys.argv[1]} lists {manifest.rebuild()} files")
@@ -0,0 +1,144 @@
+﻿import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import and_, bindparam, delete, func, or_, select, update
+
+from ruoa_extractor.src.core.batching import chunked
+from ruoa_extractor.src.core.database import DatabaseManager
+from ruoa_extractor.src.core.models import (
+    Base, RedditPost, RedditComment, PostMetricsSnapshot, CommentMetricsSnapshot
+)
+
+
+class RollupTier(NamedTuple):
+    """Snapshots of items older than `min_age` are thinned to one per `bucket`"""
+    min_age: timedelta
+    bucket: timedelta
+
+
+# Every fetch for two days, then hourly for two weeks, then daily
+DEFAULT_ROLLUP_TIERS = (
+    RollupTier(min_age=timedelta(days=2), bucket=timedelta(hours=1)),
+    RollupTier(min_age=timedelta(days=14), bucket=timedelta(days=1)),
+)
+
+# Snapshot table, its key column and the table whose created_utc gives the item's age
+SNAPSHOT_TABLES: Tuple[Tuple[str, Type[Base], str, Type[Base]], ...] = (
+    ("post", PostMetricsSnapshot, "post_id", RedditPost),
+    ("comment", CommentMetricsSnapshot, "comment_id", RedditComment),
+)
+
+
+def _bucket_start(captured_at: datetime, bucket_seconds: int) -> int:
+    # captured_at is stored as naive UTC
+    seconds = int(captured_at.replace(tzinfo=timezone.utc).timestamp())
+    return seconds - seconds % bucket_seconds
+
+
+class MetricSnapshotRollup:
+    """Downsamples metric snapshots: recent items keep every point, older ones one point per tier bucket"""
+
+    def __init__(
+            self,
+            database_manager: DatabaseManager,
+            tiers: Sequence[RollupTier] = DEFAULT_ROLLUP_TIERS,
+            batch_size: int = 1000
+    ):
+        self.db_manager = database_manager
+        # Finest buckets first, so each tier starts from the rows the previous one already thinned
+        self.tiers = sorted(tiers, key=lambda tier: tier.bucket)
+        self.batch_size = batch_size
+        self.logger = logging.getLogger("RedditMetricRollup")
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Apply every tier to post and comment snapshots and report rows removed and kept as bucket rows"""
+        now = now or datetime.utcnow()
+        summary = {}
+        for name, model, key, item_model in SNAPSHOT_TABLES:
+            removed = rolled_up = 0
+            for tier in self.tiers:
+                tier_removed, tier_rolled_up = self._apply_tier(model, key, item_model, tier, now)
+                removed += tier_removed
+                rolled_up += tier_rolled_up
+            summary[f"{name}_snapshots_removed"] = removed
+            summary[f"{name}_snapshots_rolled_up"] = rolled_up
+
+        self.logger.info(f"Metric snapshot rollup completed: {summary}")
+        return summary
+
+    def _apply_tier(
+            self,
+            model: Type[Base],
+            key: str,
+            item_model: Type[Base],
+            tier: RollupTier,
+            now: datetime
+    ) -> Tuple[int, int]:
+        """Keep the last snapshot of each bucket for items past the tier's age, deleting the rest"""
+        table = model.__table__
+        items = item_model.__table__
+        bucket_seconds = int(tier.bucket.total_seconds())
+        # Items no longer stored age by their snapshots instead
+        created = func.coalesce(items.c.created_utc, table.c.captured_at)
+
+        removed: List[Dict[str, Any]] = []
+        rolled_up: List[Dict[str, Any]] = []
+        with self.db_manager.get_session() as session:
+            # Earlier runs left at most one row per bucket, so only unthinned rows need reading, plus rolled-up
+            # rows of the bucket the last run ended in, which snapshots captured since may share
+            unthinned = table.c.resolution_seconds < bucket_seconds
+            last_rolled_up = session.execute(
+                select(func.max(table.c.captured_at)).where(table.c.resolution_seconds == bucket_seconds)
+            ).scalar()
+            if last_rolled_up is not None:
+                open_buckets_start = datetime.fromtimestamp(_bucket_start(last_rolled_up, bucket_seconds), timezone.utc)
+                unthinned = or_(unthinned, and_(
+                    table.c.resolution_seconds == bucket_seconds,
+                    table.c.captured_at >= open_buckets_start.replace(tzinfo=None)
+                ))
+
+            query = (select(table.c[key], table.c.captured_at, table.c.resolution_seconds)
+                     .select_from(table.outerjoin(items, items.c.id == table.c[key]))
+                     .where(and_(unthinned, created < now - tier.min_age))
+                     .order_by(table.c[key], table.c.captured_at))
+
+            group: List[Any] = []
+            group_key = None
+            for row in session.execute(query):
+                row_key = (row[0], _bucket_start(row[1], bucket_seconds))
+                if row_key != group_key and group:
+                    self._thin(group, bucket_seconds, removed, rolled_up)
+                    group = []
+                group_key = row_key
+                group.append(row)
+            if group:
+                self._thin(group, bucket_seconds, removed, rolled_up)
+
+            snapshot = and_(table.c[key] == bindparam("item_id"), table.c.captured_at == bindparam("at"))
+            delete_statement = delete(table).where(snapshot)
+            update_statement = update(table).where(snapshot).values(resolution_seconds=bucket_seconds)
+            for batch in chunked(removed, self.batch_size):
+                session.execute(delete_statement, batch)
+            for batch in chunked(rolled_up, self.batch_size):
+                session.execute(update_statement, batch)
+
+        return len(removed), len(rolled_up)
+
+    @staticmethod
+    def _thin(group: List[Any], bucket_seconds: int, removed: List[Dict[str, Any]], rolled_up: List[Dict[str, Any]]):
+        """Plan one bucket: its last point stands for the bucket, earlier points go"""
+        last = group[-1]
+        if len(group) == 1 and last[2] == bucket_seconds:
+            return
+        removed.extend({"item_id": row[0], "at": row[1]} for row in group[:-1])
+        if last[2] != bucket_seconds:
+            rolled_up.append({"item_id": last[0], "at": last[1]})
+
+
+if __name__ == "__main__":
+    from ruoa_extractor.src.config.config import get_database_url
+
+    db_manager = DatabaseManager(get_database_url(use_test_db=True))
+    db_manager.ensure_schema()
+    print(f"✅ Rolled up: {MetricSnapshotRollup(db_manager).run()}")
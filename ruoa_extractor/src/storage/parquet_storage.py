@@ -0,0 +1,317 @@
+﻿import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Type
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from ruoa_extractor.src.storage.abstract_storage import AbstractRedditStorage
+from ruoa_extractor.src.storage.database_storage import model_to_row
+from ruoa_extractor.src.storage.lake_manifest import LakeManifest, file_entry, relative_path
+from ruoa_extractor.src.core.models import Base, RedditPost, RedditComment
+
+# Every file holds one subreddit and one UTC day of created_utc, as subreddit=<name>/date=<YYYY-MM-DD>/
+PARTITIONING = ds.partitioning(pa.schema([("subreddit", pa.string()), ("date", pa.string())]), flavor="hive")
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+POST_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("title", pa.string()),
+    ("selftext", pa.string()),
+    ("author", pa.string()),
+    ("created_utc", TIMESTAMP),
+    ("score", pa.int64()),
+    ("num_comments", pa.int64()),
+    ("upvote_ratio", pa.float64()),
+    ("url", pa.string()),
+    ("subreddit", pa.string()),
+    ("flair_text", pa.string()),
+    ("flair_css_class", pa.string()),
+    ("is_video", pa.bool_()),
+    ("is_self", pa.bool_()),
+    ("permalink", pa.string()),
+    ("post_hint", pa.string()),
+    ("extraction_timestamp", TIMESTAMP),
+    ("date", pa.string()),
+])
+
+# Comment permalinks start with their subreddit, as /r/<name>/comments/<post id>/...
+PERMALINK_SUBREDDIT = re.compile(r"^/r/([^/]+)/")
+
+# Comments carry their post's subreddit only as a partition key
+COMMENT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("post_id", pa.string()),
+    ("parent_id", pa.string()),
+    ("body", pa.string()),
+    ("author", pa.string()),
+    ("created_utc", TIMESTAMP),
+    ("score", pa.int64()),
+    ("is_submitter", pa.bool_()),
+    ("permalink", pa.string()),
+    ("extraction_timestamp", TIMESTAMP),
+    ("subreddit", pa.string()),
+    ("date", pa.string()),
+])
+
+# Low-cardinality columns; dictionary pages on free text like title or body only cost a fallback
+POST_DICTIONARY_COLUMNS = ["author", "flair_text", "flair_css_class", "post_hint"]
+COMMENT_DICTIONARY_COLUMNS = ["author"]
+
+
+def _partition_date(row: Dict[str, Any]) -> str:
+    value = row.get("created_utc") or row["extraction_timestamp"]
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date().isoformat()
+
+
+def lake_dataset(
+        root: str,
+        table: str,
+        subreddit: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+) -> Optional[ds.Dataset]:
+    """Hive-partitioned dataset of one lake table, or None before anything was written to it"""
+    path = os.path.join(root, table)
+    if not os.path.isdir(path):
+        return None
+
+    manifest = LakeManifest(path)
+    if not manifest.exists():
+        return ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+
+    # Only live files whose partition and created_utc bounds can match are opened
+    files = manifest.files(subreddit=subreddit, since=since, until=until)
+    if not files:
+        return None
+    return ds.dataset(files, format="parquet", partitioning=PARTITIONING, partition_base_dir=path)
+
+
+class ParquetRedditStorage(AbstractRedditStorage):
+    """Append-only lake of Hive-partitioned Parquet files, buffering rows as Arrow record batches between writes"""
+
+    def __init__(
+            self,
+            root: str,
+            subreddit: Optional[str] = None,
+            rows_per_file: int = 100000,
+            max_buffer_seconds: float = 300.0,
+            compression: str = "zstd",
+            clock: Callable[[], float] = time.monotonic
+    ):
+        self.root = root
+        # Partition of comments whose subreddit cannot be found any other way
+        self.subreddit = subreddit
+        self.rows_per_file = rows_per_file
+        self.max_buffer_seconds = max_buffer_seconds
+        self.compression = compression
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buffers: Dict[str, List[pa.RecordBatch]] = {RedditPost.__tablename__: [], RedditComment.__tablename__: []}
+        self._buffered_rows = 0
+        self._buffer_started: Optional[float] = None
+        self._stored_ids: Dict[str, Set[str]] = {}
+        self._post_subreddits: Dict[str, str] = {}
+
+    def _rows(self, model: Type[Base], items: Iterable[Any]) -> List[Dict[str, Any]]:
+        rows = []
+        for item in items:
+            row = model_to_row(item, model)
+            if isinstance(row.get("upvote_ratio"), Decimal):
+                row["upvote_ratio"] = float(row["upvote_ratio"])
+
+            if model is RedditPost:
+                row["subreddit"] = row.get("subreddit") or self.subreddit
+                self._post_subreddits[row["id"]] = row["subreddit"]
+            row["date"] = _partition_date(row)
+            rows.append(row)
+
+        if model is RedditComment:
+            self._set_comment_subreddits(rows)
+        return rows
+
+    def _set_comment_subreddits(self, rows: List[Dict[str, Any]]) -> None:
+        """Partition comments by their post's subreddit: seen in this process, named by the permalink, or stored"""
+        unresolved = []
+        for row in rows:
+            subreddit = self._post_subreddits.get(row["post_id"])
+            if subreddit is None:
+                match = PERMALINK_SUBREDDIT.match(row.get("permalink") or "")
+                subreddit = match.group(1) if match else None
+            if subreddit is None:
+                unresolved.append(row)
+            row["subreddit"] = subreddit
+
+        if unresolved:
+            self._post_subreddits.update(self._stored_post_subreddits({row["post_id"] for row in unresolved}))
+            for row in unresolved:
+                # A stream over "a+b" has no single subreddit, so this fallback is only right for one subreddit
+                row["subreddit"] = self._post_subreddits.get(row["post_id"], self.subreddit)
+
+    def _stored_post_subreddits(self, post_ids: Set[str]) -> Dict[str, str]:
+        """Subreddit of each of these posts already in the lake, reading only the id and subreddit columns"""
+        dataset = lake_dataset(self.root, RedditPost.__tablename__)
+        if dataset is None:
+            return {}
+        found = dataset.to_table(columns=["id", "subreddit"], filter=ds.field("id").isin(list(post_ids)))
+        return dict(zip(found.column("id").to_pylist(), found.column("subreddit").to_pylist()))
+
+    def _stored(self, table: str) -> Set[str]:
+        """IDs already in the lake; only the id column is read, once per process"""
+        ids = self._stored_ids.get(table)
+        if ids is None:
+            dataset = lake_dataset(self.root, table)
+            ids = set(dataset.to_table(columns=["id"]).column("id").to_pylist()) if dataset is not None else set()
+            self._stored_ids[table] = ids
+        return ids
+
+    def _append(self, model: Type[Base], items: Iterable[Any], update_existing: bool) -> Dict[str, int]:
+        table = model.__tablename__
+        schema = POST_SCHEMA if model is RedditPost else COMMENT_SCHEMA
+        counts = {"inserted": 0, "updated": 0}
+
+        with self._lock:
+            stored = self._stored(table)
+            rows = []
+            for row in self._rows(model, items):
+                if row["id"] in stored:
+                    if not update_existing:
+                        continue
+                    # A newer version; compaction keeps the row with the latest extraction_timestamp
+                    counts["updated"] += 1
+                else:
+                    counts["inserted"] += 1
+                    stored.add(row["id"])
+                rows.append(row)
+
+            if rows:
+                self._buffers[table].append(pa.RecordBatch.from_pylist(rows, schema=schema))
+                self._buffered_rows += len(rows)
+                if self._buffer_started is None:
+                    self._buffer_started = self._clock()
+
+            if self._buffer_is_due():
+                self._write_buffers()
+
+        return counts
+
+    def _buffer_is_due(self) -> bool:
+        if self._buffer_started is None:
+            return False
+        return (self._buffered_rows >= self.rows_per_file
+                or self._clock() - self._buffer_started >= self.max_buffer_seconds)
+
+    def _write_buffers(self) -> None:
+        for table, batches in self._buffers.items():
+            if not batches:
+                continue
+            table_dir = os.path.join(self.root, table)
+            file_format = ds.ParquetFileFormat()
+            is_posts = table == RedditPost.__tablename__
+            dictionary_columns = POST_DICTIONARY_COLUMNS if is_posts else COMMENT_DICTIONARY_COLUMNS
+            written = []
+            ds.write_dataset(
+                pa.Table.from_batches(batches),
+                table_dir,
+                format=file_format,
+                partitioning=PARTITIONING,
+                # Unique names let every flush add files next to earlier ones in the same partition
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                file_options=file_format.make_write_options(
+                    use_dictionary=dictionary_columns,
+                    compression=self.compression
+                ),
+                existing_data_behavior="overwrite_or_ignore",
+                file_visitor=written.append
+            )
+            batches.clear()
+
+            LakeManifest(table_dir).add(
+                file_entry(relative_path(item.path, table_dir), item.metadata, os.path.getsize(item.path))
+                for item in written
+            )
+
+        self._buffered_rows = 0
+        self._buffer_started = None
+
+    def flush(self) -> None:
+        """Write every buffered row out to Parquet files"""
+        with self._lock:
+            self._write_buffers()
+
+    def upsert_posts(self, posts: Iterable[RedditPost], update_existing: bool = True) -> Dict[str, int]:
+        """Buffer posts for the lake; known posts are appended again as a newer version when updating"""
+        return self._append(RedditPost, posts, update_existing)
+
+    def upsert_comments(self, comments: Iterable[RedditComment], update_existing: bool = True) -> Dict[str, int]:
+        """Buffer comments for the lake; known comments are appended again as a newer version when updating"""
+        return self._append(RedditComment, comments, update_existing)
+
+    def save_post(self, post: RedditPost) -> bool:
+        """Save a single Reddit post"""
+        self.upsert_posts([post])
+        return True
+
+    def save_posts(self, posts: List[RedditPost]) -> int:
+        """Save multiple Reddit posts, return count of saved posts"""
+        counts = self.upsert_posts(posts)
+        return counts["inserted"] + counts["updated"]
+
+    def save_comment(self, comment: RedditComment) -> bool:
+        """Save a single Reddit comment"""
+        self.upsert_comments([comment])
+        return True
+
+    def save_comments(self, comments: List[RedditComment]) -> int:
+        """Save multiple Reddit comments, return count of saved comments"""
+        counts = self.upsert_comments(comments)
+        return counts["inserted"] + counts["updated"]
+
+    def post_exists(self, post_id: str) -> bool:
+        """Check if a post already exists in storage"""
+        with self._lock:
+            return post_id in self._stored(RedditPost.__tablename__)
+
+    def comment_exists(self, comment_id: str) -> bool:
+        """Check if a comment already exists in storage"""
+        with self._lock:
+            return comment_id in self._stored(RedditComment.__tablename__)
+
+    def get_existing_post_ids(self, post_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of post IDs that are already stored"""
+        with self._lock:
+            return self._stored(RedditPost.__tablename__).intersection(post_ids)
+
+    def get_existing_comment_ids(self, comment_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of comment IDs that are already stored"""
+        with self._lock:
+            return self._stored(RedditComment.__tablename__).intersection(comment_ids)
+
+    def get_latest_post_timestamp(self, subreddit: str) -> Optional[float]:
+        """Newest created_utc of the subreddit's written posts, pruning other subreddits' partitions"""
+        dataset = lake_dataset(self.root, RedditPost.__tablename__, subreddit=subreddit)
+        if dataset is None:
+            return None
+        created = dataset.to_table(columns=["created_utc"], filter=ds.field("subreddit") == subreddit)
+        latest = pc.max(created.column("created_utc")).as_py()
+        return latest.timestamp() if latest is not None else None
+
+
+if __name__ == "__main__":
+    import tempfile
+    from ruoa_extractor.src.core.records import PostRecord
+
+    lake = tempfile.mkdtemp()
+    storage = ParquetRedditStorage(lake, subreddit="universityofauckland")
+    storage.upsert_posts([PostRecord(id="lake_post", title="Lake", created_utc=datetime.now(timezone.utc))])
+    storage.flush()
+    print(f"✅ Wrote {lake_dataset(lake, RedditPost.__tablename__).count_rows()} post to {lake}")
@@ -0,0 +1,210 @@
+﻿import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import zstandard
+
+SEGMENT_SUFFIX = ".jsonl.zst"
+INDEX_SUFFIX = ".idx"
+# Segments are closed (and uploaded) once they pass this many compressed bytes
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+# One index entry per record: byte offset and length of its zstd frame in the segment
+INDEX_ENTRY = struct.Struct("<QI")
+
+
+class S3SegmentUploader:
+    """Copies closed segments and their indexes to an S3-compatible bucket (AWS, MinIO) under a key prefix"""
+
+    def __init__(self, uri: str, endpoint_url: Optional[str] = None, client: Any = None):
+        if not uri.startswith("s3://"):
+            raise ValueError(f"Not an S3 URI: {uri}")
+        self.bucket, _, prefix = uri[len("s3://"):].partition("/")
+        self.prefix = prefix.strip("/")
+
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise ImportError("Uploading raw segments to S3 needs boto3 (pip install boto3)") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+
+    def key_for(self, path: str) -> str:
+        name = os.path.basename(path)
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def upload(self, path: str) -> None:
+        self.client.upload_file(path, self.bucket, self.key_for(path))
+
+
+class RawLandingZone:
+    """Append-only, size-rotated segments of raw API responses, one zstd frame per response plus an offset index"""
+
+    def __init__(
+            self,
+            directory: str,
+            segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+            uploader: Optional[S3SegmentUploader] = None,
+            compression_level: int = 3,
+            clock: Callable[[], float] = time.time
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.uploader = uploader
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._segment = None
+        self._index = None
+        self._segment_path: Optional[str] = None
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self) -> None:
+        stamp = datetime.fromtimestamp(self._clock(), tz=timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self._sequence += 1
+        # Sorting names orders segments by when they were started; the pid keeps concurrent jobs apart
+        name = f"raw-{stamp}-{os.getpid()}-{self._sequence:06d}"
+        self._segment_path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self._segment = open(self._segment_path, "ab")
+        self._index = open(self._segment_path + INDEX_SUFFIX, "ab")
+
+    def _close_segment(self) -> Optional[str]:
+        if self._segment is None:
+            return None
+        path = self._segment_path
+        self._segment.close()
+        self._index.close()
+        self._segment = self._index = self._segment_path = None
+        return path
+
+    def _upload(self, path: Optional[str]) -> None:
+        if path is not None and self.uploader is not None:
+            self.uploader.upload(path)
+            self.uploader.upload(path + INDEX_SUFFIX)
+
+    def append(self, method: str, url: str, params: Optional[Dict[str, Any]], status: int, body: bytes) -> None:
+        """Land one JSON response body as received, wrapped in an envelope describing the request"""
+        envelope = json.dumps({
+            "received_at": self._clock(),
+            "method": method,
+            "url": url,
+            "params": params or {},
+            "status": status
+        })
+        # The body is already JSON, so it is spliced in rather than parsed and re-serialized
+        record = envelope[:-1].encode("utf-8") + b', "body": ' + body.strip() + b"}\n"
+        frame = self._compressor.compress(record)
+
+        closed = None
+        with self._lock:
+            if self._segment is None:
+                self._open_segment()
+            offset = self._segment.tell()
+            self._segment.write(frame)
+            self._segment.flush()
+            # Written after its frame, so a crash never leaves an entry pointing at missing bytes
+            self._index.write(INDEX_ENTRY.pack(offset, len(frame)))
+            self._index.flush()
+
+            if offset + len(frame) >= self.segment_bytes:
+                closed = self._close_segment()
+
+        # Outside the lock: other threads keep landing responses in a new segment meanwhile
+        self._upload(closed)
+
+    def close(self) -> None:
+        """Close the open segment, uploading it when a target is configured"""
+        with self._lock:
+            closed = self._close_segment()
+        self._upload(closed)
+
+
+def list_segments(directory: str) -> List[str]:
+    """Segment files of a landing zone, oldest first"""
+    names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def _frame_spans(path: str) -> Iterator[Tuple[int, int]]:
+    with open(path + INDEX_SUFFIX, "rb") as handle:
+        index = handle.read()
+    # A torn trailing entry from a crashed writer is ignored
+    usable = len(index) - len(index) % INDEX_ENTRY.size
+    return INDEX_ENTRY.iter_unpack(index[:usable])
+
+
+def iter_segment_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Decode every landed response of one segment, reading the frames through a memory map"""
+    decompressor = zstandard.ZstdDecompressor()
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset, length in _frame_spans(path):
+                    if offset + length > size:
+                        break
+                    yield json.loads(decompressor.decompress(view[offset:offset + length]))
+            finally:
+                view.release()
+
+
+def iter_landed_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Landed responses of several segments, in the order given"""
+    for path in paths:
+        yield from iter_segment_records(path)
+
+
+_shared_landing_zones: Dict[str, RawLandingZone] = {}
+_shared_landing_zones_lock = threading.Lock()
+
+
+def shared_landing_zone(
+        directory: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        s3_uri: Optional[str] = None,
+        s3_endpoint_url: Optional[str] = None
+) -> RawLandingZone:
+    """One writer per directory in this process, so every client and thread appends to the same segment"""
+    with _shared_landing_zones_lock:
+        landing_zone = _shared_landing_zones.get(directory)
+        if landing_zone is None:
+            uploader = S3SegmentUploader(s3_uri, endpoint_url=s3_endpoint_url) if s3_uri else None
+            landing_zone = RawLandingZone(directory, segment_bytes=segment_bytes, uploader=uploader)
+            _shared_landing_zones[directory] = landing_zone
+        return landing_zone
+
+
+def configured_landing_zone(settings: Any) -> Optional[RawLandingZone]:
+    """The shared writer for a LandingSettings, or None when no landing directory is configured"""
+    if not settings.is_enabled():
+        return None
+    return shared_landing_zone(
+        settings.directory,
+        segment_bytes=settings.segment_bytes,
+        s3_uri=settings.s3_uri,
+        s3_endpoint_url=settings.s3_endpoint_url
+    )
+
+
+def close_landing_zones() -> None:
+    """Close (and upload) the open segment of every shared writer"""
+    with _shared_landing_zones_lock:
+        for landing_zone in _shared_landing_zones.values():
+            landing_zone.close()
+        _shared_landing_zones.clear()
+
+
+if __name__ == "__main__":
+    import sys
+
+    paths = list_segments(sys.argv[1]) if len(sys.argv) > 1 else []
+    print(f"✅ {sum(1 for _ in iter_landed_records(paths))} raw responses in {len(paths)} segments")
@@ -1,9 +1,15 @@
 ﻿import pytest
-from unittest.mock import Mock, patch
-from datetime import datetime
+from unittest.mock import Mock, AsyncMock, patch
+from datetime import datetime, timedelta, timezone
 
 from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
-from ruoa_extractor.src.core.models import RedditPost, RedditComment
+from ruoa_extractor.src.pipeline.async_pipeline import AsyncRedditETLPipeline
+from ruoa_extractor.src.pipeline.streaming import RedditStreamPipeline, stream_position_key
+from ruoa_extractor.src.pipeline.archive_import import ArchiveImportPipeline
+from ruoa_extractor.src.pipeline.multi import MultiSubredditRunner, SubredditJob
+from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
+from ruoa_extractor.src.core.models import RedditPost, RedditComment, PostMetricsSnapshot, CommentMetricsSnapshot
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord
 
 
 @pytest.mark.integration
@@ -19,7 +25,8 @@ class TestPipelineIntegration:
             title="Pipeline Integration Test",
             author="pipeline_author",
             subreddit="universityofauckland",
-            score=15
+            score=15,
+            num_comments=1
         )
 
         mock_comment = RedditComment(
@@ -32,7 +39,7 @@ class TestPipelineIntegration:
 
         mock_extractor_instance = Mock()
         mock_extractor_instance.extract_posts.return_value = [mock_post]
-        mock_extractor_instance.extract_comments.return_value = [mock_comment]
+        mock_extractor_instance.iter_comments.return_value = [mock_comment]
         mock_extractor.return_value = mock_extractor_instance
 
         with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
@@ -61,7 +68,7 @@ class TestPipelineIntegration:
 
         mock_extractor_instance = Mock()
         mock_extractor_instance.extract_posts.return_value = [mock_post]
-        mock_extractor_instance.extract_comments.return_value = []
+        mock_extractor_instance.iter_comments.return_value = []
         mock_extractor.return_value = mock_extractor_instance
 
         with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
@@ -88,6 +95,7 @@ class TestPipelineIntegration:
                 title=f"Stats Post {i}",
                 subreddit="universityofauckland",
                 score=i * 10,
+                num_comments=2,
                 created_utc=datetime(2023, 1, i)
             )
             for i in range(1, 4)
@@ -108,7 +116,7 @@ class TestPipelineIntegration:
 
         mock_extractor_instance = Mock()
         mock_extractor_instance.extract_posts.return_value = posts
-        mock_extractor_instance.extract_comments.side_effect = [comments_post_1, comments_post_2, comments_post_3]
+        mock_extractor_instance.iter_comments.side_effect = [comments_post_1, comments_post_2, comments_post_3]
         mock_extractor.return_value = mock_extractor_instance
 
         with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
@@ -141,7 +149,7 @@ class TestPipelineIntegration:
 
         mock_extractor_instance = Mock()
         mock_extractor_instance.extract_posts.return_value = [valid_post]
-        mock_extractor_instance.extract_comments.side_effect = Exception("Extraction error")
+        mock_extractor_instance.iter_comments.side_effect = Exception("Extraction error")
         mock_extractor.return_value = mock_extractor_instance
 
         with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
@@ -157,6 +165,100 @@ class TestPipelineIntegration:
             assert comment_results["comments_saved"] == 0
             assert comment_results["posts_processed"] == 1
 
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_comment_growth_is_refetched_after_a_failed_comment_load(self, mock_extractor, mock_get_url,
+                                                                      test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        def listed(num_comments):
+            return [RedditPost(id="growing_post", title="Growing", subreddit="universityofauckland",
+                               num_comments=num_comments)]
+
+        def comments(count):
+            return [
+                RedditComment(id=f"growing_comment_{i}", post_id="growing_post", parent_id="growing_post", score=i)
+                for i in range(count)
+            ]
+
+        mock_extractor_instance = Mock()
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+            pipeline = RedditETLPipeline("universityofauckland", use_test_db=True)
+
+            mock_extractor_instance.extract_posts.return_value = listed(1)
+            mock_extractor_instance.iter_comments.side_effect = lambda post_id, limit=None: comments(1)
+            assert pipeline.run_full_pipeline()["comments"]["comments_saved"] == 1
+
+            # The thread grew, but its comments fail to load; the true count is stored all the same
+            mock_extractor_instance.extract_posts.return_value = listed(3)
+            mock_extractor_instance.iter_comments.side_effect = Exception("Comment fetch failed")
+            assert pipeline.run_full_pipeline()["posts"]["comment_post_ids"] == ["growing_post"]
+            assert pipeline.storage.get_post_comment_counts(["growing_post"]) == {"growing_post": 3}
+
+            mock_extractor_instance.iter_comments.side_effect = lambda post_id, limit=None: comments(3)
+            retried = pipeline.run_full_pipeline()
+            assert retried["posts"]["comment_post_ids"] == ["growing_post"]
+            assert retried["comments"]["comments_saved"] == 2
+
+            assert pipeline.run_full_pipeline()["posts"]["comment_post_ids"] == []
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_threads_deferred_by_the_fetch_budget_load_in_later_incremental_cycles(self, mock_extractor, mock_get_url,
+                                                                                   test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        posts = [
+            RedditPost(id=f"budget_p{i}", title=f"Budget {i}", subreddit="universityofauckland", num_comments=i,
+                       created_utc=created + timedelta(minutes=i))
+            for i in range(1, 4)
+        ]
+        listings = iter([posts])
+
+        mock_extractor_instance = Mock()
+        # Later cycles list nothing new: the watermark is past every post
+        mock_extractor_instance.extract_new_posts.side_effect = lambda since, limit: next(listings, [])
+        mock_extractor_instance.iter_comments.side_effect = lambda post_id, limit=None: [
+            RedditComment(id=f"{post_id}_comment", post_id=post_id, parent_id=post_id, body="Reply")
+        ]
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+            pipeline = RedditETLPipeline("universityofauckland", use_test_db=True, max_comment_fetches=1)
+
+            cycles = [pipeline.run_full_pipeline(incremental=True)["posts"]["comment_post_ids"] for _ in range(4)]
+
+        assert cycles == [["budget_p3"], ["budget_p1"], ["budget_p2"], []]
+        assert pipeline.get_pipeline_stats()["total_comments"] == 3
+        assert pipeline.storage.get_pending_comment_post_ids("universityofauckland") == []
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_posts_that_fail_to_save_get_no_comment_fetch(self, mock_extractor, mock_get_url, test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.extract_posts.return_value = [
+            RedditPost(id="saved_post", title="Saved", subreddit="universityofauckland", num_comments=2),
+            # NOT NULL title makes this row fail
+            RedditPost(id="broken_post", title=None, subreddit="universityofauckland", num_comments=5)
+        ]
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+            pipeline = RedditETLPipeline("universityofauckland", use_test_db=True)
+
+            result = pipeline.extract_and_load_posts()
+
+        assert result["posts_saved"] == 1
+        assert result["comment_post_ids"] == ["saved_post"]
+
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
     def test_pipeline_incremental_extraction(self, mock_extractor, mock_get_url, test_database):
@@ -185,7 +287,7 @@ class TestPipelineIntegration:
             pipeline = RedditETLPipeline("universityofauckland", use_test_db=True)
 
             mock_extractor_instance.extract_posts.return_value = [older_post]
-            mock_extractor_instance.extract_comments.return_value = []
+            mock_extractor_instance.iter_comments.return_value = []
 
             first_results = pipeline.run_full_pipeline(post_limit=1)
             assert first_results["posts"]["posts_saved"] == 1
@@ -208,7 +310,7 @@ class TestPipelineIntegration:
 
         mock_extractor_instance = Mock()
         mock_extractor_instance.extract_posts.return_value = []
-        mock_extractor_instance.extract_comments.return_value = []
+        mock_extractor_instance.iter_comments.return_value = []
         mock_extractor.return_value = mock_extractor_instance
 
         with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
@@ -242,7 +344,7 @@ class TestPipelineIntegration:
         )
 
         mock_extractor_instance = Mock()
-        mock_extractor_instance.extract_comments.return_value = [comment_for_existing]
+        mock_extractor_instance.iter_comments.return_value = [comment_for_existing]
         mock_extractor.return_value = mock_extractor_instance
 
         with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
@@ -257,6 +359,351 @@ class TestPipelineIntegration:
             assert comment_results["comments_saved"] == 1
             assert comment_results["posts_processed"] == 1
 
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_staged_pipeline_loads_posts_before_their_comments(self, mock_extractor, mock_get_url, test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        posts = [
+            RedditPost(id=f"staged_post_{i}", title=f"Staged {i}", subreddit="universityofauckland", num_comments=3)
+            for i in range(5)
+        ]
+        posts.append(RedditPost(id="staged_quiet_post", title="No comments", subreddit="universityofauckland"))
+
+        def stream_comments(post_id, limit=None):
+            if post_id == "staged_post_4":
+                raise RuntimeError("thread removed")
+            for i in range(3):
+                yield RedditComment(id=f"{post_id}_c{i}", post_id=post_id, body=f"Comment {i}")
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.iter_posts.side_effect = lambda limit, time_filter: iter(posts[:limit])
+        mock_extractor_instance.iter_comments_in_thread.side_effect = stream_comments
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+
+            pipeline = RedditETLPipeline(
+                "universityofauckland", use_test_db=True, load_batch_size=2, comment_workers=3
+            )
+            results = pipeline.run_staged_pipeline(post_limit=6, comment_limit=3, queue_size=2)
+
+            assert results["posts"]["posts_saved"] == 6
+            assert sorted(results["posts"]["comment_post_ids"]) == [f"staged_post_{i}" for i in range(5)]
+            assert results["comments"]["comments_saved"] == 12
+            assert results["comments"]["posts_processed"] == 5
+            assert results["total_data_points"] == 18
+            assert pipeline.get_pipeline_stats()["total_comments"] == 12
+            with test_database.get_session() as session:
+                assert session.query(PostMetricsSnapshot).count() == 6
+                assert session.query(CommentMetricsSnapshot).count() == 12
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_staged_pipeline_spends_one_refresh_budget_per_run(self, mock_extractor, mock_get_url, test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        stored = [
+            RedditPost(id=f"staged_grown_{i}", title=f"Grown {i}", subreddit="universityofauckland", num_comments=1)
+            for i in range(4)
+        ]
+        listed = [
+            RedditPost(id=f"staged_grown_{i}", title=f"Grown {i}", subreddit="universityofauckland", num_comments=5)
+            for i in range(4)
+        ]
+        # NOT NULL title makes this insert fail
+        listed.append(RedditPost(id="staged_broken", title=None, subreddit="universityofauckland", num_comments=5))
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.iter_posts.side_effect = lambda limit, time_filter: iter(listed)
+        mock_extractor_instance.iter_comments_in_thread.side_effect = lambda post_id, limit=None: iter([])
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+
+            pipeline = RedditETLPipeline(
+                "universityofauckland", use_test_db=True, load_batch_size=2, max_comment_refreshes=1
+            )
+            pipeline.storage.upsert_posts(stored)
+            results = pipeline.run_staged_pipeline(post_limit=5)
+
+        assert len(results["posts"]["comment_post_ids"]) == 1
+        assert results["posts"]["comment_post_ids"][0].startswith("staged_grown_")
+        assert results["posts"]["comment_posts_deferred"] == 3
+        assert mock_extractor_instance.iter_comments_in_thread.call_count == 1
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_staged_pipeline_raises_listing_failure(self, mock_extractor, mock_get_url, test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        def failing_listing(limit, time_filter):
+            yield RedditPost(id="staged_partial_post", title="Partial", subreddit="universityofauckland")
+            raise RuntimeError("listing failed")
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.iter_posts.side_effect = failing_listing
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+
+            pipeline = RedditETLPipeline("universityofauckland", use_test_db=True, load_batch_size=1)
+
+            with pytest.raises(RuntimeError, match="listing failed"):
+                pipeline.run_staged_pipeline(post_limit=5)
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_stream_fetches_missing_parents_and_resumes_after_restart(self, mock_extractor, mock_get_url,
+                                                                      test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        def created(minute):
+            return datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc)
+
+        posts = [PostRecord(id=f"live_post_{i}", title=f"Live {i}", subreddit="universityofauckland",
+                            created_utc=created(i)) for i in range(3)]
+        comments = [
+            CommentRecord(id="live_comment_0", post_id="live_post_0", body="First", created_utc=created(5)),
+            CommentRecord(id="live_comment_1", post_id="older_post", body="On an older post", created_utc=created(6)),
+        ]
+
+        def poll(items):
+            yield from items
+            yield None
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.stream_posts.side_effect = lambda: poll(posts)
+        mock_extractor_instance.stream_comments.side_effect = lambda: poll(comments)
+        mock_extractor_instance.fetch_posts_info.side_effect = lambda ids: [
+            PostRecord(id=post_id, title="Fetched parent", subreddit="universityofauckland", created_utc=created(0))
+            for post_id in ids
+        ]
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+
+            pipeline = RedditETLPipeline("universityofauckland", use_test_db=True)
+            results = RedditStreamPipeline(pipeline, flush_size=2, sleep=lambda seconds: None).run(max_items=5)
+
+            assert results["posts"]["posts_saved"] == 3
+            assert results["comments"]["comments_saved"] == 2
+            assert results["comments"]["parents_fetched"] == 1
+            mock_extractor_instance.fetch_posts_info.assert_called_once_with(["older_post"])
+            with test_database.get_session() as session:
+                assert session.query(PostMetricsSnapshot).count() == 4
+                assert session.query(CommentMetricsSnapshot).count() == 2
+            assert results["positions"][RedditStreamPipeline.POSTS_STREAM] == created(2).timestamp()
+
+            # A restart replays the same recent history; the stored positions keep it out of the load
+            restarted = RedditStreamPipeline(pipeline, flush_size=2, sleep=lambda seconds: None)
+            replay = restarted.run(max_items=2)
+
+            assert replay["posts"]["replayed"] == 2
+            assert replay["comments"]["replayed"] == 1
+            assert replay["posts"]["posts_saved"] == 0
+            assert replay["posts"]["posts_skipped"] == 1
+            assert pipeline.get_pipeline_stats()["total_posts"] == 4
+
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_stream_position_stays_before_items_that_failed_to_load(self, mock_extractor, mock_get_url,
+                                                                     test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        def created(minute):
+            return datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc)
+
+        posts = [PostRecord(id=f"held_post_{i}", title=f"Held {i}", subreddit="universityofauckland",
+                            created_utc=created(i)) for i in range(4)]
+        # NOT NULL title makes this row fail every time it is retried
+        posts[1] = posts[1]._replace(title=None)
+
+        def poll(items):
+            yield from items
+            yield None
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.stream_posts.side_effect = lambda: poll(posts)
+        mock_extractor_instance.stream_comments.side_effect = lambda: poll([])
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+
+            pipeline = RedditETLPipeline("universityofauckland", use_test_db=True)
+            stream = RedditStreamPipeline(pipeline, flush_size=2, sleep=lambda seconds: None)
+            results = stream.run(max_items=4)
+
+        assert results["posts"]["posts_saved"] == 3
+        # The later, fully stored batch must not move the position past the failed post
+        assert results["positions"][RedditStreamPipeline.POSTS_STREAM] == created(0).timestamp()
+        assert list(stream.unloaded[RedditStreamPipeline.POSTS_STREAM]) == ["held_post_1"]
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_multireddit_stream_resumes_whatever_the_order_of_its_names(self, mock_extractor, mock_get_url,
+                                                                          test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        posts = [PostRecord(id=f"multi_live_{i}", title=f"Live {i}", subreddit="newzealand",
+                            created_utc=datetime(2024, 1, 1, 12, i, tzinfo=timezone.utc)) for i in range(2)]
+
+        def poll(items):
+            yield from items
+            yield None
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.stream_posts.side_effect = lambda: poll(posts)
+        mock_extractor_instance.stream_comments.side_effect = lambda: poll([])
+        mock_extractor.return_value = mock_extractor_instance
+
+        with patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager') as mock_db_manager:
+            mock_db_manager.return_value = test_database
+
+            first = RedditETLPipeline("universityofauckland+newzealand", use_test_db=True)
+            RedditStreamPipeline(first, flush_size=2, sleep=lambda seconds: None).run(max_items=2)
+            reordered = RedditETLPipeline("NewZealand+UniversityOfAuckland", use_test_db=True)
+            replay = RedditStreamPipeline(reordered, flush_size=2, sleep=lambda seconds: None).run(max_items=1)
+
+        assert stream_position_key("NewZealand+UniversityOfAuckland") == "newzealand+universityofauckland"
+        assert first.storage.get_watermark("newzealand+universityofauckland", RedditStreamPipeline.POSTS_STREAM)
+        assert replay["posts"]["replayed"] == 1
+
+@pytest.mark.integration
+class TestMultiSubredditIntegration:
+
+    @patch('ruoa_extractor.src.pipeline.multi.PrawRedditExtractor')
+    @patch('ruoa_extractor.src.pipeline.multi.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.multi.get_database_url')
+    def test_comment_steps_dropped_by_a_failed_run_are_picked_up_again(self, mock_get_url, mock_db_manager,
+                                                                       mock_extractor, test_database):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = test_database
+
+        extractor = Mock()
+        extractor.extract_posts.return_value = [
+            RedditPost(id="multi_post", title="Multi", subreddit="universityofauckland", num_comments=2)
+        ]
+        extractor.iter_comments.side_effect = lambda post_id, limit=None: [
+            RedditComment(id=f"multi_comment_{i}", post_id=post_id, parent_id=post_id) for i in range(2)
+        ]
+        mock_extractor.return_value = extractor
+
+        job = SubredditJob("universityofauckland")
+        runner = MultiSubredditRunner([job])
+
+        # The run stops after the listing step, before the post's comment step
+        steps = runner._steps(job, runner._empty_result(job))
+        next(steps)
+        steps.close()
+        extractor.iter_comments.assert_not_called()
+
+        results = runner.run()["subreddits"]["universityofauckland"]
+        assert results["posts"]["comment_post_ids"] == ["multi_post"]
+        assert results["comments"]["comments_saved"] == 2
+
+        assert runner.run()["subreddits"]["universityofauckland"]["posts"]["comment_post_ids"] == []
+
+
+class FakeAsyncExtractor:
+
+    def __init__(self, subreddit_name, client=None, expansion_budget=None):
+        self.subreddit_name = subreddit_name
+        self.comment_expansions = {}
+
+    async def extract_posts_async(self, limit=10, time_filter="day"):
+        for i in range(2):
+            yield RedditPost(id=f"{self.subreddit_name}_async_{i}", title=f"Async {i}", subreddit=self.subreddit_name,
+                             num_comments=1)
+
+    async def extract_comments_async(self, post_id, limit=None):
+        if post_id.endswith("_1"):
+            raise RuntimeError("comment fetch failed")
+        yield RedditComment(id=f"{post_id}_comment", post_id=post_id, body="Async comment")
+
+
+@pytest.mark.integration
+class TestAsyncPipelineIntegration:
+
+    @patch('ruoa_extractor.src.pipeline.async_pipeline.AsyncRedditClient')
+    @patch('ruoa_extractor.src.pipeline.async_pipeline.AsyncRedditExtractor', FakeAsyncExtractor)
+    @patch('ruoa_extractor.src.pipeline.async_pipeline.get_database_url')
+    def test_async_pipeline_loads_several_subreddits(self, mock_get_url, mock_client, tmp_path):
+        # Loads run on a worker thread, so the database must outlive a single connection
+        mock_get_url.return_value = f"sqlite:///{tmp_path / 'async.db'}"
+        mock_client.return_value.close = AsyncMock()
+
+        pipeline = AsyncRedditETLPipeline(["first", "second"], use_test_db=True)
+        results = pipeline.run_full_pipeline(post_limit=2)
+
+        for name in ("first", "second"):
+            subreddit_results = results["subreddits"][name]
+            assert subreddit_results["posts"]["posts_saved"] == 2
+            assert subreddit_results["comments"]["comments_saved"] == 1
+            assert subreddit_results["comments"]["posts_processed"] == 2
+            assert pipeline.storage.get_comment_count(name) == 1
+        with pipeline.db_manager.get_session() as session:
+            assert session.query(PostMetricsSnapshot).count() == 4
+            assert session.query(CommentMetricsSnapshot).count() == 2
+
+        # The post whose comment fetch failed stayed queued, so only its tree is fetched again
+        rerun = pipeline.run_full_pipeline(post_limit=2)
+        assert rerun["subreddits"]["first"]["posts"]["posts_skipped"] == 2
+        assert rerun["subreddits"]["first"]["posts"]["comment_post_ids"] == ["first_async_1"]
+        assert rerun["subreddits"]["first"]["comments"]["posts_processed"] == 1
+
+class FakeArchiveExtractor:
+
+    subreddit_name = "universityofauckland"
+
+    def iter_archived_posts(self):
+        created = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        for i in range(3):
+            yield PostRecord(id=f"archived_{i}", title=f"Archived {i}", subreddit=self.subreddit_name,
+                             created_utc=created)
+
+    def iter_archived_comments(self):
+        yield CommentRecord(id="archived_comment", post_id="archived_0", body="Kept")
+        yield CommentRecord(id="orphan_comment", post_id="before_range", body="Dropped")
+
+
+@pytest.mark.integration
+class TestArchiveImportIntegration:
+
+    def test_archive_import_loads_posts_then_comments(self, test_database):
+        storage = CopyRedditStorage(test_database)
+        pipeline = ArchiveImportPipeline(FakeArchiveExtractor(), storage, load_batch_size=2)
+
+        results = pipeline.run()
+
+        assert results["posts"]["posts_saved"] == 3
+        assert results["comments"]["comments_saved"] == 1
+        assert results["comments"]["orphaned"] == 1
+        assert storage.get_comment_count("universityofauckland") == 1
+
+        rerun = pipeline.run()
+        assert rerun["posts"]["posts_skipped"] == 3
+        assert rerun["total_data_points"] == 0
+
+    def test_replacing_import_overwrites_stored_rows(self, test_database):
+        storage = CopyRedditStorage(test_database)
+        storage.upsert_posts([
+            RedditPost(id="archived_0", title="Wrong title", subreddit="universityofauckland")
+        ])
+
+        results = ArchiveImportPipeline(FakeArchiveExtractor(), storage, update_existing=True).run()
+
+        assert results["posts"]["posts_saved"] == 2
+        assert results["posts"]["posts_updated"] == 1
+        assert results["comments"]["comments_saved"] == 1
+        with test_database.get_session() as session:
+            assert session.query(RedditPost).filter_by(id="archived_0").one().title == "Archived 0"
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -1,9 +1,13 @@
 ﻿import pytest
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from unittest.mock import patch
 
 from ruoa_extractor.src.storage.database_storage import DatabaseRedditStorage
-from ruoa_extractor.src.core.models import RedditPost, RedditComment
+from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage
+from ruoa_extractor.src.storage.metric_snapshots import MetricSnapshotRollup, RollupTier
+from ruoa_extractor.src.core.models import RedditPost, RedditComment, PostMetricsSnapshot, CommentMetricsSnapshot
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord
 
 
 @pytest.mark.integration
@@ -176,7 +180,7 @@ class TestDatabaseStorageIntegration:
             storage.save_post(post)
 
         latest_timestamp = storage.get_latest_post_timestamp("universityofauckland")
-        expected_timestamp = datetime(2023, 1, 2, 15, 30, 0).timestamp()
+        expected_timestamp = datetime(2023, 1, 2, 15, 30, 0, tzinfo=timezone.utc).timestamp()
 
         assert latest_timestamp == expected_timestamp
 
@@ -257,5 +261,309 @@ class TestDatabaseStorageIntegration:
         assert storage.comment_exists("valid_fk_comment") is True
 
 
+    def test_upsert_posts_reports_inserted_and_updated(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+
+        first_batch = [
+            RedditPost(id=f"upsert_batch_{i}", title=f"Upsert Post {i}", score=i, subreddit="universityofauckland")
+            for i in range(1, 4)
+        ]
+        assert storage.upsert_posts(first_batch) == {"inserted": 3, "updated": 0}
+
+        second_batch = [
+            RedditPost(id=f"upsert_batch_{i}", title=f"Upsert Post {i}", score=i * 10, subreddit="universityofauckland")
+            for i in range(2, 6)
+        ]
+        assert storage.upsert_posts(second_batch) == {"inserted": 2, "updated": 2}
+
+        with test_database.get_session() as session:
+            retrieved = session.query(RedditPost).filter_by(id="upsert_batch_3").first()
+            assert retrieved.score == 30
+            assert retrieved.extraction_timestamp is not None
+
+    def test_failed_batch_is_retried_row_by_row(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+
+        posts = [RedditPost(id=f"row_fallback_{i}", title=f"Row Fallback {i}", score=i) for i in range(3)]
+        # NOT NULL title fails the set-based insert for the whole batch
+        posts.append(RedditPost(id="row_fallback_bad", title=None))
+
+        assert storage.upsert_posts(posts) == {"inserted": 3, "updated": 0}
+        assert storage.get_existing_post_ids([post.id for post in posts]) == {f"row_fallback_{i}" for i in range(3)}
+
+    def test_other_dialects_merge_row_by_row(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+        storage.upsert_posts([RedditPost(id="merge_dialect_1", title="Original", score=1)])
+
+        with patch.object(test_database.engine.dialect, "name", "mssql"):
+            counts = storage.upsert_posts([
+                RedditPost(id="merge_dialect_1", title="Changed", score=5),
+                RedditPost(id="merge_dialect_2", title="New", score=2)
+            ])
+
+        assert counts == {"inserted": 1, "updated": 1}
+        with test_database.get_session() as session:
+            assert session.get(RedditPost, "merge_dialect_1").score == 5
+
+    def test_upsert_posts_without_update_leaves_existing_rows(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+
+        storage.upsert_posts([RedditPost(id="do_nothing_post", title="Original", score=1)])
+        counts = storage.upsert_posts(
+            [
+                RedditPost(id="do_nothing_post", title="Changed", score=99),
+                RedditPost(id="do_nothing_new", title="New", score=2)
+            ],
+            update_existing=False
+        )
+
+        assert counts == {"inserted": 1, "updated": 0}
+        with test_database.get_session() as session:
+            retrieved = session.query(RedditPost).filter_by(id="do_nothing_post").first()
+            assert retrieved.title == "Original"
+            assert retrieved.score == 1
+
+    def test_upsert_comments_spans_multiple_batches(self, test_database):
+        storage = DatabaseRedditStorage(test_database, batch_size=2)
+        storage.save_post(RedditPost(id="upsert_comment_parent", title="Parent", subreddit="universityofauckland"))
+
+        comments = [
+            RedditComment(id=f"upsert_comment_{i}", post_id="upsert_comment_parent", body=f"Comment {i}")
+            for i in range(5)
+        ]
+        # The duplicate id in the same call is collapsed to its last occurrence
+        comments.append(RedditComment(id="upsert_comment_0", post_id="upsert_comment_parent", body="Edited"))
+
+        assert storage.upsert_comments(comments) == {"inserted": 5, "updated": 0}
+        assert storage.get_comment_count("universityofauckland") == 5
+
+        with test_database.get_session() as session:
+            retrieved = session.query(RedditComment).filter_by(id="upsert_comment_0").first()
+            assert retrieved.body == "Edited"
+
+    def test_get_existing_ids_resolves_batches(self, test_database):
+        storage = DatabaseRedditStorage(test_database, batch_size=2)
+
+        storage.save_posts([
+            RedditPost(id=f"existing_post_{i}", title=f"Existing {i}", subreddit="universityofauckland")
+            for i in range(3)
+        ])
+        storage.save_comments([
+            RedditComment(id="existing_comment_0", post_id="existing_post_0", body="Existing comment")
+        ])
+
+        candidates = ["existing_post_0", "missing_post", "existing_post_2", "existing_post_0", "existing_post_1"]
+        assert storage.get_existing_post_ids(candidates) == {"existing_post_0", "existing_post_1", "existing_post_2"}
+        assert storage.get_existing_post_ids([]) == set()
+        assert storage.get_existing_comment_ids(["existing_comment_0", "missing_comment"]) == {"existing_comment_0"}
+
+    def test_get_post_comment_counts(self, test_database):
+        storage = DatabaseRedditStorage(test_database, batch_size=2)
+
+        storage.save_posts([
+            RedditPost(id="counted_post_0", title="Counted 0", subreddit="universityofauckland", num_comments=4),
+            RedditPost(id="counted_post_1", title="Counted 1", subreddit="universityofauckland"),
+            RedditPost(id="counted_post_2", title="Counted 2", subreddit="universityofauckland", num_comments=9),
+        ])
+
+        counts = storage.get_post_comment_counts(["counted_post_0", "counted_post_1", "counted_post_2", "missing"])
+
+        assert counts == {"counted_post_0": 4, "counted_post_1": 0, "counted_post_2": 9}
+        assert storage.get_post_comment_counts([]) == {}
+
+    def test_pending_comment_fetches_override_the_stored_count(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+        storage.upsert_posts([
+            RedditPost(id=f"pending_post_{i}", title=f"Pending {i}", num_comments=10) for i in range(3)
+        ])
+
+        storage.mark_comments_pending({"pending_post_0": 4, "pending_post_1": 0})
+        # A post already queued keeps the baseline its stored comments actually cover
+        storage.mark_comments_pending({"pending_post_0": 10})
+        assert storage.get_comment_baselines(["pending_post_0", "pending_post_1", "pending_post_2", "unknown"]) == {
+            "pending_post_0": 4, "pending_post_1": 0, "pending_post_2": 10
+        }
+
+        storage.clear_comments_pending(["pending_post_0", "pending_post_1"])
+        assert storage.get_comment_baselines(["pending_post_0", "pending_post_1"]) == {
+            "pending_post_0": 10, "pending_post_1": 10
+        }
+
+    def test_update_post_metrics_and_recent_ids(self, test_database):
+        storage = DatabaseRedditStorage(test_database, batch_size=2)
+
+        storage.save_posts([
+            RedditPost(id=f"metric_post_{day}", title=f"Metric {day}", subreddit="universityofauckland",
+                       score=1, num_comments=1, upvote_ratio=Decimal("0.50"), created_utc=datetime(2024, 1, day))
+            for day in range(1, 4)
+        ])
+
+        since = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc).timestamp()
+        assert storage.get_recent_post_ids("universityofauckland", since=since) == ["metric_post_3", "metric_post_2"]
+        assert storage.get_recent_post_ids("universityofauckland", limit=1) == ["metric_post_3"]
+
+        refreshed = [
+            RedditPost(id="metric_post_1", title="Changed title", score=50, num_comments=7, upvote_ratio=0.9),
+            RedditPost(id="metric_post_3", score=5, num_comments=2, upvote_ratio=0.6),
+            RedditPost(id="deleted_post", score=1, num_comments=0, upvote_ratio=1.0),
+        ]
+        assert storage.update_post_metrics(refreshed) == 2
+
+        with test_database.get_session() as session:
+            updated = session.query(RedditPost).filter_by(id="metric_post_1").first()
+            assert updated.score == 50
+            assert updated.num_comments == 7
+            assert float(updated.upvote_ratio) == 0.9
+            assert updated.title == "Metric 1"
+
+    def test_records_are_stored_without_orm_objects(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+
+        posts = [
+            PostRecord(id=f"record_post_{i}", title=f"Record {i}", subreddit="universityofauckland",
+                       num_comments=1, created_utc=datetime(2024, 2, 1, tzinfo=timezone.utc))
+            for i in range(3)
+        ]
+        comment = CommentRecord(id="record_comment", post_id="record_post_0", body="From a record")
+
+        assert storage.upsert_posts(posts) == {"inserted": 3, "updated": 0}
+        assert storage.save_comment(comment) is True
+        assert storage.save_post(posts[1]._replace(score=42)) is True
+
+        with test_database.get_session() as session:
+            stored = session.query(RedditPost).filter_by(id="record_post_1").first()
+            assert stored.score == 42
+            assert stored.extraction_timestamp is not None
+            assert session.query(RedditComment).filter_by(post_id="record_post_0").count() == 1
+
+    def test_watermark_round_trip(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+        first = datetime(2024, 3, 1, 9, 0, 0, tzinfo=timezone.utc).timestamp()
+
+        assert storage.get_watermark("universityofauckland", "posts_new") is None
+
+        storage.save_watermark("universityofauckland", "posts_new", first, "post_a")
+        storage.save_watermark("universityofauckland", "posts_new", first + 60, "post_b")
+        storage.save_watermark("different_subreddit", "posts_new", first - 60)
+
+        assert storage.get_watermark("universityofauckland", "posts_new") == first + 60
+        assert storage.get_watermark("different_subreddit", "posts_new") == first - 60
+        assert storage.get_watermark("universityofauckland", "comments") is None
+
+
+@pytest.mark.integration
+class TestMetricSnapshotIntegration:
+
+    def test_unchanged_metrics_are_not_snapshotted_again(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+        first = datetime(2023, 6, 1, 12, 0, 0)
+
+        posts = [
+            RedditPost(id=f"snapshot_post_{i}", score=i, num_comments=1, upvote_ratio=Decimal("0.9"))
+            for i in range(3)
+        ]
+        assert storage.record_post_metrics(posts, captured_at=first) == 3
+
+        # Float ratios read back as Decimals from the previous snapshot still compare equal
+        posts[0].upvote_ratio = 0.9
+        posts[1].score = 10
+        assert storage.record_post_metrics(posts, captured_at=first + timedelta(minutes=5)) == 1
+
+        with test_database.get_session() as session:
+            snapshots = session.query(PostMetricsSnapshot).filter_by(post_id="snapshot_post_1").all()
+            assert [snapshot.score for snapshot in sorted(snapshots, key=lambda s: s.captured_at)] == [1, 10]
+            assert session.query(PostMetricsSnapshot).count() == 4
+
+    def test_comment_scores_snapshot_across_batches(self, test_database):
+        storage = DatabaseRedditStorage(test_database, batch_size=2)
+        comments = [RedditComment(id=f"snapshot_comment_{i}", score=i) for i in range(5)]
+
+        assert storage.record_comment_metrics(comments, captured_at=datetime(2023, 6, 1)) == 5
+        assert storage.record_comment_metrics(comments, captured_at=datetime(2023, 6, 2)) == 0
+        with test_database.get_session() as session:
+            assert session.query(CommentMetricsSnapshot).count() == 5
+
+    def test_rollup_thins_old_snapshots_by_tier(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+        now = datetime(2023, 7, 1, 0, 0, 0)
+        old = RedditPost(
+            id="rollup_old", title="Old", created_utc=now - timedelta(days=5), subreddit="universityofauckland"
+        )
+        recent = RedditPost(
+            id="rollup_recent", title="Recent", created_utc=now - timedelta(hours=6), subreddit="universityofauckland"
+        )
+        storage.save_posts([old, recent])
+
+        start = datetime(2023, 6, 30, 10, 0, 0)
+        for minute in range(0, 120, 10):
+            old.score = recent.score = minute
+            storage.record_post_metrics([old, recent], captured_at=start + timedelta(minutes=minute))
+
+        rollup = MetricSnapshotRollup(test_database, tiers=[RollupTier(timedelta(days=2), timedelta(hours=1))])
+        summary = rollup.run(now=now)
+        assert summary["post_snapshots_removed"] == 10
+        assert summary["post_snapshots_rolled_up"] == 2
+
+        with test_database.get_session() as session:
+            kept = (session.query(PostMetricsSnapshot)
+                    .filter_by(post_id="rollup_old")
+                    .order_by(PostMetricsSnapshot.captured_at)
+                    .all())
+            assert [(snapshot.score, snapshot.resolution_seconds) for snapshot in kept] == [(50, 3600), (110, 3600)]
+            assert session.query(PostMetricsSnapshot).filter_by(post_id="rollup_recent").count() == 12
+
+        assert rollup.run(now=now)["post_snapshots_removed"] == 0
+
+    def test_rollup_reads_only_unthinned_rows_and_the_last_rolled_up_bucket(self, test_database):
+        storage = DatabaseRedditStorage(test_database)
+        now = datetime(2023, 7, 1, 0, 0, 0)
+        old = RedditPost(
+            id="rollup_open", title="Old", created_utc=now - timedelta(days=5), subreddit="universityofauckland"
+        )
+        storage.save_posts([old])
+
+        start = datetime(2023, 6, 30, 10, 0, 0)
+        for minute in (0, 50, 70, 110):
+            old.score = minute
+            storage.record_post_metrics([old], captured_at=start + timedelta(minutes=minute))
+        rollup = MetricSnapshotRollup(test_database, tiers=[RollupTier(timedelta(days=2), timedelta(hours=1))])
+        rollup.run(now=now)
+
+        # Captured after the rollup, one in the bucket it last rolled up and one in the next
+        for minute in (115, 125):
+            old.score = minute
+            storage.record_post_metrics([old], captured_at=start + timedelta(minutes=minute))
+
+        with patch.object(MetricSnapshotRollup, "_thin", side_effect=MetricSnapshotRollup._thin) as thin:
+            summary = rollup.run(now=now)
+
+        assert sum(len(call.args[0]) for call in thin.call_args_list) == 3
+        assert summary["post_snapshots_removed"] == 1
+        with test_database.get_session() as session:
+            kept = (session.query(PostMetricsSnapshot)
+                    .filter_by(post_id="rollup_open")
+                    .order_by(PostMetricsSnapshot.captured_at)
+                    .all())
+            assert [(snapshot.score, snapshot.resolution_seconds) for snapshot in kept] == [
+                (50, 3600), (115, 3600), (125, 3600)
+            ]
+
+
+@pytest.mark.integration
+class TestCopyStorageIntegration:
+
+    def test_copy_storage_falls_back_to_upsert_on_sqlite(self, test_database):
+        storage = CopyRedditStorage(test_database)
+
+        posts = [
+            RedditPost(id=f"copy_fallback_{i}", title=f"Copy Fallback {i}", subreddit="universityofauckland")
+            for i in range(3)
+        ]
+        assert storage.save_posts(posts) == 3
+        assert storage.upsert_posts(posts[:1] + [
+            RedditPost(id="copy_fallback_3", title="Copy Fallback 3", subreddit="universityofauckland")
+        ]) == {"inserted": 1, "updated": 1}
+        assert storage.get_post_count("universityofauckland") == 4
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
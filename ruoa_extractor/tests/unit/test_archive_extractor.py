@@ -0,0 +1,139 @@
+﻿import json
+from datetime import datetime
+
+import pytest
+import zstandard
+
+from ruoa_extractor.src.extractors.archive_extractor import (
+    ArchiveRedditExtractor,
+    COMMENTS,
+    iter_ndjson_chunks,
+    parse_chunk
+)
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord
+
+# 2022-01-01 00:00 UTC and onwards, one hour apart
+BASE_TIME = 1640995200
+
+
+def archived_post(post_id, subreddit="universityofauckland", hours=0, score=1):
+    return {
+        "id": post_id,
+        "title": f"Post {post_id}",
+        "selftext": "",
+        "author": "[deleted]",
+        "created_utc": str(BASE_TIME + hours * 3600),
+        "score": score,
+        "num_comments": 1,
+        "subreddit": subreddit,
+        "permalink": f"/r/{subreddit}/comments/{post_id}/",
+        "is_self": True
+    }
+
+
+def archived_comment(comment_id, post_id, subreddit="universityofauckland", hours=0):
+    return {
+        "id": comment_id,
+        "link_id": f"t3_{post_id}",
+        "parent_id": f"t3_{post_id}",
+        "body": f"Comment {comment_id}",
+        "author": "commenter",
+        "created_utc": BASE_TIME + hours * 3600,
+        "score": 2,
+        "subreddit": subreddit
+    }
+
+
+def write_dump(path, records, compress=True):
+    data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+    if compress:
+        data = zstandard.ZstdCompressor().compress(data)
+    path.write_bytes(data)
+    return str(path)
+
+
+class TestNdjsonChunks:
+
+    def test_chunks_end_on_line_boundaries(self, tmp_path):
+        path = write_dump(tmp_path / "RS.zst", [archived_post(f"p{i}") for i in range(50)])
+
+        chunks = list(iter_ndjson_chunks(path, chunk_size=100))
+
+        assert all(chunk.endswith(b"\n") for chunk in chunks)
+        assert sum(len(chunk.splitlines()) for chunk in chunks) == 50
+
+    def test_plain_ndjson_is_read_uncompressed(self, tmp_path):
+        path = write_dump(tmp_path / "RS.ndjson", [archived_post("p1")], compress=False)
+
+        assert b"p1" in b"".join(iter_ndjson_chunks(path))
+
+
+class TestArchiveRedditExtractor:
+
+    def test_posts_are_filtered_and_mapped(self, tmp_path):
+        path = write_dump(tmp_path / "RS.zst", [
+            archived_post("p1"),
+            archived_post("other", subreddit="newzealand"),
+            archived_post("p2", subreddit="UniversityOfAuckland", hours=1),
+        ])
+        extractor = ArchiveRedditExtractor("universityofauckland", submission_files=[path], workers=1)
+
+        posts = list(extractor.iter_archived_posts())
+
+        assert [post.id for post in posts] == ["p1", "p2"]
+        assert isinstance(posts[0], PostRecord)
+        assert posts[0].author is None
+        assert posts[0].created_utc.timestamp() == BASE_TIME
+
+    def test_time_range_and_malformed_lines(self, tmp_path):
+        path = tmp_path / "RC.zst"
+        lines = [json.dumps(archived_comment(f"c{hour}", "p1", hours=hour)) for hour in range(4)]
+        lines.insert(1, '{"subreddit": "universityofauckland", "truncated')
+        path.write_bytes(zstandard.ZstdCompressor().compress("\n".join(lines).encode("utf-8")))
+        extractor = ArchiveRedditExtractor(
+            "universityofauckland",
+            comment_files=[str(path)],
+            since=datetime(2022, 1, 1, 1),
+            until=datetime(2022, 1, 1, 3),
+            workers=1
+        )
+
+        comments = list(extractor.iter_archived_comments())
+
+        assert [comment.id for comment in comments] == ["c1", "c2"]
+        assert isinstance(comments[0], CommentRecord)
+        assert comments[0].post_id == "p1"
+
+    def test_process_pool_keeps_file_order(self, tmp_path):
+        path = write_dump(tmp_path / "RS.zst", [archived_post(f"p{i}", hours=i) for i in range(40)])
+        extractor = ArchiveRedditExtractor("universityofauckland", submission_files=[path], workers=2, chunk_size=256)
+
+        assert [post.id for post in extractor.iter_archived_posts()] == [f"p{i}" for i in range(40)]
+
+    def test_worker_parser_is_picklable_module_function(self):
+        chunk = (json.dumps(archived_comment("c1", "p1")) + "\n").encode("utf-8")
+
+        assert [comment.id for comment in parse_chunk(chunk, COMMENTS, "universityofauckland", None, None)] == ["c1"]
+
+    def test_extract_posts_with_comments(self, tmp_path):
+        posts_path = write_dump(tmp_path / "RS.zst", [
+            archived_post("old", hours=0, score=100),
+            archived_post("low", hours=30, score=1),
+            archived_post("high", hours=40, score=50),
+        ])
+        comments_path = write_dump(tmp_path / "RC.zst", [
+            archived_comment("c1", "high"), archived_comment("c2", "high"), archived_comment("c3", "old")
+        ])
+        extractor = ArchiveRedditExtractor(
+            "universityofauckland", submission_files=[posts_path], comment_files=[comments_path], workers=1
+        )
+
+        result = extractor.extract_posts_with_comments(limit=1, time_filter="day", comment_limit=1)
+
+        assert [post.id for post in result["posts"]] == ["high"]
+        assert [comment.id for comment in result["comments"]] == ["c1"]
+        assert [comment.id for comment in extractor.extract_comments("old")] == ["c3"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
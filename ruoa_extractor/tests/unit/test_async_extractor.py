@@ -0,0 +1,279 @@
+﻿import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+from ruoa_extractor.src.extractors.async_extractor import AsyncRedditExtractor, AsyncRedditClient
+from ruoa_extractor.src.extractors.comment_expansion import ExpansionBudget
+from ruoa_extractor.src.extractors.rate_limit import RateLimiter
+
+
+def make_link(post_id, num_comments=0):
+    return {
+        "kind": "t3",
+        "data": {
+            "id": post_id,
+            "title": f"  Title {post_id}  ",
+            "selftext": "Body",
+            "author": "[deleted]",
+            "created_utc": 1640995200.0,
+            "score": 10,
+            "num_comments": num_comments,
+            "upvote_ratio": 0.9,
+            "url": f"https://reddit.com/{post_id}",
+            "subreddit": "universityofauckland",
+            "link_flair_text": "Question",
+            "link_flair_css_class": "question",
+            "is_video": False,
+            "is_self": True,
+            "permalink": f"/r/universityofauckland/comments/{post_id}/",
+        }
+    }
+
+
+def make_comment(comment_id, replies=None, parent_id="t3_post1"):
+    return {
+        "kind": "t1",
+        "data": {
+            "id": comment_id,
+            "link_id": "t3_post1",
+            "parent_id": parent_id,
+            "body": f"Comment {comment_id}",
+            "author": "commenter",
+            "created_utc": 1640998800.0,
+            "score": 2,
+            "is_submitter": False,
+            "permalink": f"/r/universityofauckland/comments/post1/{comment_id}/",
+            "replies": {"kind": "Listing", "data": {"children": replies}} if replies else "",
+        }
+    }
+
+
+class FakeClient:
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+        self.closed = False
+
+    async def get_json(self, path, params=None):
+        self.calls.append((path, params))
+        response = self.responses[path]
+        return response.pop(0) if isinstance(response, list) and path.endswith("/top") else response
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeResponse:
+
+    def __init__(self, status, payload=None, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def read(self):
+        return json.dumps(self.payload).encode("utf-8")
+
+
+class FakeSession:
+
+    closed = False
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.paths = []
+
+    def get(self, url, params=None, headers=None):
+        self.paths.append(url)
+        return self.responses.pop(0)
+
+
+def paced_client(responses, limiter, landing_zone=None):
+    settings = Mock()
+    settings.is_configured.return_value = True
+    client = AsyncRedditClient(
+        reddit_settings=settings, max_concurrency=4, rate_limiter=limiter, landing_zone=landing_zone
+    )
+    client._session = FakeSession(responses)
+    client._semaphore = asyncio.Semaphore(4)
+    client._get_token = AsyncMock(return_value="token")
+    return client
+
+
+def fake_clock_limiter(**kwargs):
+    now = [1000.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(round(seconds, 3))
+        now[0] += seconds
+
+    return RateLimiter(clock=lambda: now[0], sleep=sleep, **kwargs), sleeps
+
+
+def listing(children, after=None):
+    return {"kind": "Listing", "data": {"children": children, "after": after}}
+
+
+def more(children, parent_id="t3_post1"):
+    return {"kind": "more", "data": {"children": children, "parent_id": parent_id}}
+
+
+def morechildren(things):
+    return {"json": {"errors": [], "data": {"things": things}}}
+
+
+async def collect(async_iterator):
+    return [item async for item in async_iterator]
+
+
+class TestAsyncRedditClient:
+
+    def test_429_is_retried_after_its_retry_after_delay(self):
+        limiter, sleeps = fake_clock_limiter()
+        client = paced_client([
+            FakeResponse(429, headers={"retry-after": "7"}),
+            FakeResponse(200, {"ok": True}, headers={"x-ratelimit-remaining": "50", "x-ratelimit-reset": "30"}),
+        ], limiter)
+
+        assert asyncio.run(client.get_json("/r/universityofauckland/new")) == {"ok": True}
+        assert sleeps == [7.0]
+        assert len(client._session.paths) == 2
+
+    def test_429_fails_after_the_last_attempt(self):
+        limiter, _ = fake_clock_limiter()
+        client = paced_client([FakeResponse(429) for _ in range(AsyncRedditClient.MAX_ATTEMPTS)], limiter)
+
+        with pytest.raises(RuntimeError, match="HTTP 429"):
+            asyncio.run(client.get_json("/r/universityofauckland/new"))
+        assert len(client._session.paths) == AsyncRedditClient.MAX_ATTEMPTS
+
+    def test_concurrent_requests_reserve_the_remaining_budget(self):
+        limiter, sleeps = fake_clock_limiter()
+        # One request left in a window that resets in a minute
+        limiter.update(1, 60)
+        client = paced_client([FakeResponse(200, {"n": 1}), FakeResponse(200, {"n": 2})], limiter)
+
+        async def both():
+            return await asyncio.gather(client.get_json("/a"), client.get_json("/b"))
+
+        asyncio.run(both())
+
+        assert sleeps == [60.0]
+
+    def test_responses_land_in_the_raw_landing_zone(self):
+        limiter, _ = fake_clock_limiter()
+        landing_zone = Mock()
+        client = paced_client([FakeResponse(200, {"n": 1})], limiter, landing_zone=landing_zone)
+
+        assert asyncio.run(client.get_json("/r/universityofauckland/new", {"limit": 5})) == {"n": 1}
+
+        method, url, params, status, body = landing_zone.append.call_args.args
+        assert (method, url, status) == ("GET", "https://oauth.reddit.com/r/universityofauckland/new", 200)
+        assert params == {"limit": 5, "raw_json": 1}
+        assert json.loads(body) == {"n": 1}
+
+
+class TestAsyncRedditExtractor:
+
+    def test_client_requires_credentials(self):
+        settings = Mock()
+        settings.is_configured.return_value = False
+
+        with pytest.raises(ValueError, match="Reddit API credentials not properly configured"):
+            AsyncRedditClient(reddit_settings=settings)
+
+    def test_extract_posts_async_follows_pagination(self):
+        client = FakeClient({
+            "/r/universityofauckland/top": [
+                listing([make_link("a"), make_link("b")], after="t3_b"),
+                listing([make_link("c"), make_link("d")]),
+            ]
+        })
+        extractor = AsyncRedditExtractor("universityofauckland", client=client)
+
+        posts = asyncio.run(collect(extractor.extract_posts_async(limit=3, time_filter="week")))
+
+        assert [post.id for post in posts] == ["a", "b", "c"]
+        assert posts[0].title == "Title a"
+        assert posts[0].author is None
+        assert posts[0].flair_text == "Question"
+        assert client.calls[0][1] == {"t": "week", "limit": 3, "after": None}
+        assert client.calls[1][1]["after"] == "t3_b"
+
+    def test_extract_comments_async_is_breadth_first_and_expands_more(self):
+        tree = [
+            make_comment("c1", replies=[make_comment("c3")]),
+            make_comment("c2"),
+            more(["c9"]),
+        ]
+        client = FakeClient({
+            "/comments/post1": [listing([make_link("post1", num_comments=4)]), listing(tree)],
+            "/api/morechildren": morechildren([make_comment("c9")]),
+        })
+        extractor = AsyncRedditExtractor("universityofauckland", client=client)
+
+        comments = asyncio.run(collect(extractor.extract_comments_async("post1")))
+        complete = extractor.comment_expansions["post1"]
+        limited = asyncio.run(collect(extractor.extract_comments_async("post1", limit=2)))
+
+        assert [comment.id for comment in comments] == ["c1", "c2", "c3", "c9"]
+        assert comments[0].post_id == "post1"
+        assert comments[0].author == "commenter"
+        assert client.calls[1] == ("/api/morechildren", {"api_type": "json", "children": "c9", "link_id": "t3_post1"})
+        assert complete.complete and complete.requests == 1
+        assert [comment.id for comment in limited] == ["c1", "c2"]
+        assert extractor.comment_expansions["post1"].truncated
+
+    def test_continued_threads_load_within_the_expansion_budget(self):
+        tree = [make_comment("c1", replies=[more([], parent_id="t1_c1")]), more(["c7", "c8"])]
+        client = FakeClient({
+            "/comments/post1": [listing([make_link("post1", num_comments=5)]), listing(tree)],
+            "/api/morechildren": morechildren([make_comment("c7"), make_comment("c8")]),
+            "/comments/post1/_/c1": [
+                listing([make_link("post1")]),
+                listing([make_comment("c1", replies=[make_comment("c4", parent_id="t1_c1")])]),
+            ],
+        })
+        extractor = AsyncRedditExtractor("universityofauckland", client=client)
+        budgeted = AsyncRedditExtractor(
+            "universityofauckland", client=client, expansion_budget=ExpansionBudget(max_requests=1)
+        )
+
+        comments = asyncio.run(collect(extractor.extract_comments_async("post1")))
+        cut = asyncio.run(collect(budgeted.extract_comments_async("post1")))
+
+        assert [comment.id for comment in comments] == ["c1", "c7", "c8", "c4"]
+        assert extractor.comment_expansions["post1"].complete
+        assert [comment.id for comment in cut] == ["c1", "c7", "c8"]
+        assert budgeted.comment_expansions["post1"].outstanding == 1
+        assert budgeted.comment_expansions["post1"].expected == 5
+
+    def test_sync_extract_posts_with_comments_closes_client(self):
+        client = FakeClient({
+            "/r/universityofauckland/top": [listing([make_link("post1", num_comments=1)])],
+            "/comments/post1": [listing([make_link("post1")]), listing([make_comment("c1")])],
+        })
+        extractor = AsyncRedditExtractor("universityofauckland", client=client)
+
+        result = extractor.extract_posts_with_comments(limit=1, comment_limit=5)
+
+        assert result["total_posts"] == 1
+        assert result["total_comments"] == 1
+        assert result["comments"][0].id == "c1"
+        assert client.closed is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,59 @@
+﻿import pytest
+
+from ruoa_extractor.src.core.batching import chunked, MicroBatcher
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+class TestChunked:
+
+    def test_chunks_any_iterable(self):
+        assert list(chunked(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_invalid_size_rejected(self):
+        with pytest.raises(ValueError):
+            list(chunked([1], 0))
+
+
+class TestMicroBatcher:
+
+    def test_flushes_when_full(self):
+        batcher = MicroBatcher(max_size=2, max_wait=60)
+
+        assert batcher.add("a") is False
+        assert batcher.add("b") is True
+        assert batcher.drain() == ["a", "b"]
+        assert len(batcher) == 0
+
+    def test_flushes_after_oldest_item_waited(self):
+        clock = FakeClock()
+        batcher = MicroBatcher(max_size=100, max_wait=5, clock=clock.time)
+
+        batcher.add("a")
+        clock.now = 4.0
+        assert batcher.add("b") is False
+        clock.now = 5.0
+        assert batcher.due() is True
+
+    def test_wait_restarts_with_each_batch(self):
+        clock = FakeClock()
+        batcher = MicroBatcher(max_size=100, max_wait=5, clock=clock.time)
+
+        batcher.add("a")
+        clock.now = 10.0
+        batcher.drain()
+        batcher.add("b")
+
+        assert batcher.due() is False
+        assert MicroBatcher().due() is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
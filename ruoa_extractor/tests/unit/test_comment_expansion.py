@@ -0,0 +1,166 @@
+﻿from unittest.mock import Mock, patch
+
+import praw
+import pytest
+from praw.models import Comment, MoreComments
+
+from ruoa_extractor.src.extractors.comment_expansion import (
+    CommentExpander,
+    ExpansionBudget,
+    ExpansionResult,
+    combine_expansion_summaries,
+    summarize_expansions
+)
+from ruoa_extractor.src.extractors.praw_extractor import PrawRedditExtractor
+
+
+@pytest.fixture
+def reddit():
+    return praw.Reddit(client_id="client-id", client_secret="client-secret", user_agent="test-agent")
+
+
+def make_comment(reddit, comment_id, parent_id="t3_post1"):
+    return Comment(reddit, _data={
+        "id": comment_id,
+        "body": f"Comment {comment_id}",
+        "author": "commenter",
+        "created_utc": 1640998800.0,
+        "score": 1,
+        "is_submitter": False,
+        "permalink": f"/r/test/comments/post1/_/{comment_id}",
+        "parent_id": parent_id,
+        "link_id": "t3_post1",
+        "replies": ""
+    })
+
+
+def make_more(reddit, children, parent_id="t3_post1"):
+    return MoreComments(reddit, {"children": list(children), "count": len(children), "parent_id": parent_id})
+
+
+def make_submission(comments, num_comments):
+    submission = Mock()
+    submission.id = "post1"
+    submission.fullname = "t3_post1"
+    submission.comment_sort = "confidence"
+    submission.num_comments = num_comments
+    submission.comments = comments
+    return submission
+
+
+class TestCommentExpander:
+
+    def test_ids_from_several_branches_fill_full_batches(self, reddit):
+        expander = CommentExpander(Mock(), make_submission([], 180), ExpansionBudget(max_requests=None))
+        expander.add(make_more(reddit, [f"a{i}" for i in range(150)]))
+        expander.add(make_more(reddit, [f"b{i}" for i in range(30)], parent_id="t1_x"))
+
+        expander.next_batch()
+        expander.next_batch()
+
+        calls = expander._reddit.post.call_args_list
+        assert [len(call.kwargs["data"]["children"].split(",")) for call in calls] == [100, 80]
+        assert calls[0].kwargs["data"]["link_id"] == "t3_post1"
+        assert expander.next_batch() is None
+        assert expander.requests == 2
+
+    def test_request_budget_leaves_rest_outstanding(self, reddit):
+        expander = CommentExpander(Mock(), make_submission([], 500), ExpansionBudget(max_requests=1))
+        expander.add(make_more(reddit, [f"a{i}" for i in range(150)]))
+
+        assert expander.next_batch() is not None
+        assert expander.next_batch() is None
+
+        result = expander.result("post1", collected=120)
+        assert result.outstanding == 50
+        assert result.expected == 500
+        assert not result.complete
+        assert result.completeness == pytest.approx(0.24)
+
+    def test_time_budget_stops_expansion(self, reddit):
+        now = [0.0]
+        expander = CommentExpander(
+            Mock(), make_submission([], 10), ExpansionBudget(max_requests=None, max_seconds=5), clock=lambda: now[0]
+        )
+        expander.add(make_more(reddit, ["a1"]))
+
+        now[0] = 6.0
+        assert expander.next_batch() is None
+        expander._reddit.post.assert_not_called()
+
+    def test_continue_this_thread_loads_parent_permalink(self, reddit):
+        client = Mock()
+        parent = Mock()
+        parent.replies = ["reply"]
+        client.get.return_value = (Mock(), Mock(children=[parent]))
+        expander = CommentExpander(client, make_submission([], 10))
+        expander.add(make_more(reddit, [], parent_id="t1_deep"))
+
+        assert expander.next_batch() == ["reply"]
+        assert client.get.call_args.args[0].endswith("post1/_/deep")
+
+    def test_finished_tree_counts_as_complete_despite_removed_comments(self):
+        expander = CommentExpander(Mock(), make_submission([], 12))
+
+        result = expander.result("post1", collected=10)
+
+        assert result.complete
+        assert result.completeness == 1.0
+
+
+class TestExpansionSummaries:
+
+    def test_summary_weights_completeness_by_comments(self):
+        summary = summarize_expansions([
+            ExpansionResult("a", 90, 0, 90, 1),
+            ExpansionResult("b", 10, 5, 110, 4)
+        ])
+
+        assert summary["threads"] == 2
+        assert summary["threads_incomplete"] == 1
+        assert summary["requests"] == 5
+        assert summary["completeness"] == pytest.approx(0.5)
+
+    def test_combined_summaries_recompute_completeness(self):
+        combined = combine_expansion_summaries(
+            summarize_expansions([ExpansionResult("a", 50, 0, 50, 0)]),
+            summarize_expansions([ExpansionResult("b", 25, 3, 100, 2)])
+        )
+
+        assert combined["threads"] == 2
+        assert combined["completeness"] == pytest.approx(0.5)
+
+
+class TestExtractorExpansion:
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    def test_collapsed_branches_are_resolved_and_reported(self, mock_get_settings, reddit):
+        mock_get_settings.return_value = Mock(token_cache_file="")
+        submission = make_submission([make_comment(reddit, "c1"), make_more(reddit, ["c2", "c3"])], 3)
+
+        with patch.object(reddit, "submission", return_value=submission), \
+                patch.object(reddit, "post", return_value=[make_comment(reddit, "c2"), make_comment(reddit, "c3")]):
+            extractor = PrawRedditExtractor("test", reddit=reddit)
+            comments = extractor.extract_comments("post1")
+
+        assert [comment.id for comment in comments] == ["c1", "c2", "c3"]
+        expansion = extractor.comment_expansions["post1"]
+        assert expansion.complete
+        assert expansion.requests == 1
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    def test_zero_budget_drops_collapsed_branches(self, mock_get_settings, reddit):
+        mock_get_settings.return_value = Mock(token_cache_file="")
+        submission = make_submission([make_comment(reddit, "c1"), make_more(reddit, ["c2", "c3"])], 3)
+
+        with patch.object(reddit, "submission", return_value=submission), patch.object(reddit, "post") as mock_post:
+            extractor = PrawRedditExtractor("test", reddit=reddit, expansion_budget=ExpansionBudget(max_requests=0))
+            comments = extractor.extract_comments("post1")
+
+        assert [comment.id for comment in comments] == ["c1"]
+        mock_post.assert_not_called()
+        assert extractor.comment_expansions["post1"].completeness == pytest.approx(1 / 3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
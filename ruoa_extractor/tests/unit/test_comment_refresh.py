@@ -0,0 +1,58 @@
+﻿import pytest
+from unittest.mock import Mock
+
+from ruoa_extractor.src.pipeline.comment_refresh import plan_comment_refresh
+
+
+def make_post(post_id, num_comments):
+    post = Mock()
+    post.id = post_id
+    post.num_comments = num_comments
+    return post
+
+
+class TestCommentRefreshPlanner:
+
+    def test_only_new_and_grown_posts_are_scheduled(self):
+        posts = [
+            make_post("new_with_comments", 4),
+            make_post("new_without_comments", 0),
+            make_post("grown", 12),
+            make_post("unchanged", 7),
+            make_post("shrunk", 1),
+        ]
+
+        plan = plan_comment_refresh(posts, {"grown": 2, "unchanged": 7, "shrunk": 3})
+
+        assert plan.post_ids == ["grown", "new_with_comments"]
+        assert [target.delta for target in plan.targets] == [10, 4]
+        assert [post.id for post in plan.grown_posts] == ["grown"]
+        assert plan.unchanged == 3
+        assert plan.deferred == 0
+
+    def test_cap_keeps_largest_growth_and_all_new_posts(self):
+        posts = [make_post("a", 3), make_post("b", 30), make_post("c", 8), make_post("new", 1)]
+
+        plan = plan_comment_refresh(posts, {"a": 0, "b": 0, "c": 0}, max_refreshes=1)
+
+        assert plan.post_ids == ["b", "new"]
+        assert plan.deferred == 2
+
+    def test_fetch_budget_defers_new_posts_too(self):
+        posts = [make_post("a", 3), make_post("b", 30), make_post("new", 5), make_post("small_new", 1)]
+
+        plan = plan_comment_refresh(posts, {"a": 0, "b": 0}, max_fetches=2)
+
+        assert plan.post_ids == ["b", "new"]
+        assert plan.deferred == 2
+        assert plan.deferred_new_ids == ("small_new",)
+
+    def test_missing_counts_are_treated_as_zero(self):
+        plan = plan_comment_refresh([make_post("post", None), make_post("stored", 2)], {"stored": 0})
+
+        assert plan.post_ids == ["stored"]
+        assert plan.unchanged == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
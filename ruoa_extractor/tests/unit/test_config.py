@@ -5,6 +5,7 @@ from unittest.mock import patch
 from ruoa_extractor.src.config.config import (
     DatabaseSettings,
     RedditSettings,
+    PoolSettings,
     get_database_url,
     get_reddit_settings
 )
@@ -125,6 +126,40 @@ class TestRedditSettings:
             assert reddit_settings.is_configured() is False
 
 
+class TestPoolSettings:
+    """Test cases for PoolSettings"""
+
+    def test_pool_settings_defaults(self):
+        """Test PoolSettings with default values"""
+        with patch.dict(os.environ, {}, clear=True):
+            pool_settings = PoolSettings()
+
+            assert pool_settings.pool_size == 5
+            assert pool_settings.max_overflow == 10
+            assert pool_settings.pool_pre_ping is True
+            assert pool_settings.pool_recycle == 1800
+            assert pool_settings.statement_timeout_ms == 0
+
+    def test_pool_settings_from_env(self):
+        """Test PoolSettings reads from environment variables"""
+        env_vars = {
+            "DB_POOL_SIZE": "20",
+            "DB_MAX_OVERFLOW": "0",
+            "DB_POOL_PRE_PING": "false",
+            "DB_POOL_RECYCLE": "300",
+            "DB_STATEMENT_TIMEOUT_MS": "15000"
+        }
+
+        with patch.dict(os.environ, env_vars):
+            pool_settings = PoolSettings()
+
+            assert pool_settings.pool_size == 20
+            assert pool_settings.max_overflow == 0
+            assert pool_settings.pool_pre_ping is False
+            assert pool_settings.pool_recycle == 300
+            assert pool_settings.statement_timeout_ms == 15000
+
+
 class TestConfigurationFunctions:
     """Test configuration utility functions"""
 
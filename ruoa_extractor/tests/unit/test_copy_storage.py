@@ -0,0 +1,91 @@
+﻿import pytest
+from unittest.mock import Mock, MagicMock
+from datetime import datetime
+
+from ruoa_extractor.src.storage.copy_storage import CopyRedditStorage, rows_to_csv
+from ruoa_extractor.src.core.models import RedditPost
+
+
+class TestRowsToCsv:
+
+    def test_null_and_empty_string_are_distinct(self):
+        buffer = rows_to_csv([{"id": "a", "body": None, "title": ""}], ["id", "body", "title"])
+
+        assert buffer.getvalue() == '"a",,""\n'
+
+    def test_quotes_newlines_booleans_and_datetimes(self):
+        row = {
+            "id": "b",
+            "body": 'She said "hi"\nthen left',
+            "is_self": True,
+            "created_utc": datetime(2023, 1, 1, 12, 30, 0)
+        }
+
+        buffer = rows_to_csv([row], ["id", "body", "is_self", "created_utc"])
+
+        assert buffer.getvalue() == '"b","She said ""hi""\nthen left",t,"2023-01-01T12:30:00"\n'
+
+
+class TestCopyRedditStorage:
+
+    def _postgres_storage(self, merge_counts):
+        mock_session = MagicMock()
+        mock_session.execute.return_value.one.return_value = merge_counts
+        mock_cursor = Mock()
+        mock_session.connection.return_value.connection.dbapi_connection.cursor.return_value = mock_cursor
+
+        mock_db_manager = MagicMock()
+        mock_db_manager.engine.dialect.name = "postgresql"
+        mock_db_manager.get_session.return_value.__enter__.return_value = mock_session
+
+        return CopyRedditStorage(mock_db_manager, batch_size=2), mock_session, mock_cursor
+
+    def test_copy_merges_each_batch_in_its_own_transaction(self):
+        storage, mock_session, mock_cursor = self._postgres_storage((1, 1))
+
+        posts = [RedditPost(id=f"copy_post_{i}", title=f"Copy {i}") for i in range(3)]
+        counts = storage.upsert_posts(posts)
+
+        assert counts == {"inserted": 2, "updated": 2}
+        assert mock_cursor.copy_expert.call_count == 2
+        copy_sql = mock_cursor.copy_expert.call_args_list[0].args[0]
+        assert copy_sql.startswith("COPY stg_raw_reddit_posts (id, title")
+
+        statements = [str(call.args[0]) for call in mock_session.execute.call_args_list]
+        # A fresh staging table per transaction, copied from the table as it is now
+        assert "CREATE TEMPORARY TABLE stg_raw_reddit_posts (LIKE raw_reddit_posts" in statements[0]
+        assert statements[0].endswith("ON COMMIT DROP")
+        merges = [sql for sql in statements if "INSERT INTO raw_reddit_posts" in sql]
+        assert len(merges) == 2
+        assert "DO UPDATE SET" in merges[0]
+
+    def test_failed_copy_batch_is_retried_row_by_row(self):
+        storage, mock_session, mock_cursor = self._postgres_storage((1, 0))
+        mock_cursor.copy_expert.side_effect = [RuntimeError("invalid input syntax"), None]
+        storage._merge_rows = Mock(return_value=(1, 0))
+
+        posts = [RedditPost(id=f"copy_post_{i}", title=f"Copy {i}") for i in range(3)]
+        counts = storage.upsert_posts(posts)
+
+        assert counts == {"inserted": 2, "updated": 0}
+        retried = storage._merge_rows.call_args.args[1]
+        assert [row["id"] for row in retried] == ["copy_post_0", "copy_post_1"]
+
+    def test_copy_without_update_uses_do_nothing(self):
+        storage, mock_session, _ = self._postgres_storage((1, 0))
+
+        storage.upsert_posts([RedditPost(id="copy_post", title="Copy")], update_existing=False)
+
+        statements = [str(call.args[0]) for call in mock_session.execute.call_args_list]
+        merge = next(sql for sql in statements if "INSERT INTO raw_reddit_posts" in sql)
+        assert "ON CONFLICT (id) DO NOTHING" in merge
+
+    def test_empty_input_skips_merge(self):
+        storage, mock_session, mock_cursor = self._postgres_storage((0, 0))
+
+        assert storage.upsert_posts([]) == {"inserted": 0, "updated": 0}
+        mock_cursor.copy_expert.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
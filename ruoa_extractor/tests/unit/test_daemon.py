@@ -0,0 +1,76 @@
+﻿import pytest
+import threading
+from unittest.mock import Mock
+
+from ruoa_extractor.src.pipeline.daemon import RedditDaemon
+
+
+def make_pipeline(*cycle_results):
+    pipeline = Mock()
+    pipeline.subreddit_name = "universityofauckland"
+    pipeline.run_full_pipeline.side_effect = list(cycle_results)
+    return pipeline
+
+
+def make_scheduler():
+    scheduler = Mock()
+    scheduler.record_success.return_value = 0
+    scheduler.record_failure.return_value = 0
+    return scheduler
+
+
+class TestRedditDaemon:
+
+    def test_cycles_reuse_one_pipeline_without_schema_checks(self):
+        pipeline = make_pipeline({"total_data_points": 5}, {"total_data_points": 0})
+        scheduler = make_scheduler()
+
+        summary = RedditDaemon(pipeline, scheduler, post_limit=10, incremental=True).run(max_cycles=2)
+
+        assert summary == {"cycles": 2, "failures": 0, "total_data_points": 5}
+        assert pipeline.run_full_pipeline.call_count == 2
+        pipeline.run_full_pipeline.assert_called_with(
+            post_limit=10, time_filter="day", comment_limit=None, incremental=True
+        )
+        pipeline.db_manager.create_tables.assert_not_called()
+        assert [c.args for c in scheduler.record_success.call_args_list] == [
+            ("universityofauckland", 5), ("universityofauckland", 0)
+        ]
+
+    def test_recheck_schema_runs_before_every_cycle(self):
+        pipeline = make_pipeline({"total_data_points": 1}, {"total_data_points": 1})
+
+        RedditDaemon(pipeline, make_scheduler(), recheck_schema=True).run(max_cycles=2)
+
+        assert pipeline.db_manager.create_tables.call_count == 2
+
+    def test_failed_cycle_is_retried_on_failure_schedule(self):
+        pipeline = make_pipeline(RuntimeError("reddit down"), {"total_data_points": 3})
+        scheduler = make_scheduler()
+
+        summary = RedditDaemon(pipeline, scheduler).run(max_cycles=2)
+
+        assert summary["failures"] == 1
+        assert summary["total_data_points"] == 3
+        scheduler.record_failure.assert_called_once_with("universityofauckland")
+
+    def test_stop_interrupts_the_wait(self):
+        pipeline = make_pipeline({"total_data_points": 0})
+        scheduler = make_scheduler()
+        scheduler.record_success.return_value = 3600
+        daemon = RedditDaemon(pipeline, scheduler)
+
+        timer = threading.Timer(0.05, daemon.stop)
+        timer.start()
+        summary = daemon.run()
+        timer.join()
+
+        assert summary["cycles"] == 1
+
+    def test_staged_daemon_rejects_incremental(self):
+        with pytest.raises(ValueError):
+            RedditDaemon(make_pipeline(), make_scheduler(), staged=True, incremental=True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,8 +1,12 @@
 ﻿import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, MagicMock, patch, ANY
 from datetime import datetime
 
 from ruoa_extractor.src.extractors.praw_extractor import PrawRedditExtractor
+from ruoa_extractor.src.extractors.requestor import RateLimitedRequestor
+from ruoa_extractor.src.extractors.abstract_extractor import CommentFetchResult
+from ruoa_extractor.src.core.models import RedditPost
+from ruoa_extractor.src.core.records import PostRecord
 
 
 class TestPrawRedditExtractor:
@@ -15,6 +19,8 @@ class TestPrawRedditExtractor:
         mock_settings.client_id = "test_id"
         mock_settings.client_secret = "test_secret"
         mock_settings.user_agent = "test_agent"
+        mock_settings.requests_per_minute = 100
+        mock_settings.rate_limit_file = ""
         mock_get_settings.return_value = mock_settings
 
         mock_reddit_instance = Mock()
@@ -28,9 +34,15 @@ class TestPrawRedditExtractor:
         mock_reddit.assert_called_once_with(
             client_id="test_id",
             client_secret="test_secret",
-            user_agent="test_agent"
+            user_agent="test_agent",
+            requestor_class=RateLimitedRequestor,
+            requestor_kwargs={"get_rate_limiter": ANY, "get_landing_zone": ANY}
         )
 
+        get_rate_limiter = mock_reddit.call_args.kwargs["requestor_kwargs"]["get_rate_limiter"]
+        assert get_rate_limiter() is extractor.rate_limiter
+        assert extractor.rate_limiter.state_path is None
+
     @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
     def test_extractor_initialization_not_configured(self, mock_get_settings):
         mock_settings = Mock()
@@ -107,11 +119,12 @@ class TestPrawRedditExtractor:
         mock_comment.score = 3
         mock_comment.is_submitter = False
         mock_comment.permalink = "/r/test/comment123"
+        mock_comment.replies = []
 
         mock_submission = Mock()
-        mock_submission.comments = Mock()
-        mock_submission.comments.replace_more = Mock()
-        mock_submission.comments.list.return_value = [mock_comment]
+        mock_submission.num_comments = 1
+        mock_submission.comments = MagicMock()
+        mock_submission.comments.__iter__.return_value = iter([mock_comment])
 
         mock_reddit_instance = Mock()
         mock_reddit_instance.submission.return_value = mock_submission
@@ -130,7 +143,52 @@ class TestPrawRedditExtractor:
         assert comment.score == 3
 
         mock_reddit_instance.submission.assert_called_once_with(id="post123")
-        mock_submission.comments.replace_more.assert_called_once_with(limit=0)
+        assert extractor.comment_expansions["post123"].complete
+        mock_reddit_instance.post.assert_not_called()
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.isinstance')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
+    def test_iter_comments_is_breadth_first_and_stops_at_limit(self, mock_reddit, mock_get_settings,
+                                                                mock_isinstance):
+        mock_isinstance.return_value = True
+
+        mock_settings = Mock()
+        mock_settings.is_configured.return_value = True
+        mock_get_settings.return_value = mock_settings
+
+        def make_comment(comment_id, replies=()):
+            comment = Mock()
+            comment.id = comment_id
+            comment.author = None
+            comment.created_utc = 1640998800.0
+            comment.replies = list(replies)
+            return comment
+
+        never_walked = MagicMock()
+        never_walked.__iter__.side_effect = AssertionError("limit should stop the walk before this branch")
+        deep = make_comment("c4")
+        deep.replies = never_walked
+
+        mock_submission = Mock()
+        mock_submission.num_comments = 4
+        mock_submission.comments = MagicMock()
+        mock_submission.comments.__iter__.return_value = iter([
+            make_comment("c1", [make_comment("c3", [deep])]),
+            make_comment("c2"),
+        ])
+
+        mock_reddit_instance = Mock()
+        mock_reddit_instance.submission.return_value = mock_submission
+        mock_reddit.return_value = mock_reddit_instance
+        mock_reddit_instance.subreddit.return_value = Mock()
+
+        extractor = PrawRedditExtractor("test_subreddit")
+        comments = extractor.iter_comments("post123", limit=3)
+
+        mock_reddit_instance.submission.assert_not_called()
+        assert [comment.id for comment in comments] == ["c1", "c2", "c3"]
+        assert extractor.comment_expansions["post123"].truncated
 
     @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
     @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
@@ -166,6 +224,132 @@ class TestPrawRedditExtractor:
             mock_extract_posts.assert_called_once_with(1, "day")
             mock_extract_comments.assert_called_once_with("post123", 5)
 
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
+    def test_iter_comments_concurrently(self, mock_reddit, mock_get_settings):
+        mock_settings = Mock()
+        mock_settings.is_configured.return_value = True
+        mock_get_settings.return_value = mock_settings
+
+        mock_reddit_instance = Mock()
+        mock_reddit.return_value = mock_reddit_instance
+        mock_reddit_instance.subreddit.return_value = Mock()
+
+        extractor = PrawRedditExtractor("test_subreddit")
+
+        def fake_fetch(reddit, post_id, limit):
+            if post_id == "broken":
+                raise RuntimeError("fetch failed")
+            return [f"{post_id}_comment"]
+
+        with patch.object(extractor, '_fetch_comments', side_effect=fake_fetch):
+            results = list(extractor.iter_comments_concurrently(["a", "b", "broken", "c"], limit=5, max_workers=2))
+
+        by_post = {result.post_id: result for result in results}
+        assert set(by_post) == {"a", "b", "broken", "c"}
+        assert by_post["a"].comments == ["a_comment"]
+        assert by_post["a"].error is None
+        assert isinstance(by_post["broken"].error, RuntimeError)
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
+    def test_extract_posts_with_comments_concurrent(self, mock_reddit, mock_get_settings):
+        mock_settings = Mock()
+        mock_settings.is_configured.return_value = True
+        mock_get_settings.return_value = mock_settings
+
+        mock_reddit_instance = Mock()
+        mock_reddit.return_value = mock_reddit_instance
+        mock_reddit_instance.subreddit.return_value = Mock()
+
+        extractor = PrawRedditExtractor("test_subreddit")
+
+        mock_post = Mock()
+        mock_post.id = "post123"
+
+        with patch.object(extractor, 'extract_posts', return_value=[mock_post]), \
+                patch.object(extractor, 'iter_comments_concurrently') as mock_iter:
+            mock_iter.return_value = iter([CommentFetchResult("post123", ["comment"])])
+
+            result = extractor.extract_posts_with_comments(limit=1, comment_limit=5, max_workers=3)
+
+            assert result["total_comments"] == 1
+            mock_iter.assert_called_once_with(["post123"], 5, 3)
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
+    def test_extract_new_posts_stops_at_watermark(self, mock_reddit, mock_get_settings):
+        mock_settings = Mock()
+        mock_settings.is_configured.return_value = True
+        mock_get_settings.return_value = mock_settings
+
+        submissions = []
+        for post_id, created in [("newest", 300.0), ("newer", 200.0), ("seen", 100.0), ("older", 50.0)]:
+            submission = Mock()
+            submission.id = post_id
+            submission.created_utc = created
+            submissions.append(submission)
+
+        mock_subreddit = Mock()
+        mock_subreddit.new.return_value = iter(submissions)
+        mock_reddit_instance = Mock()
+        mock_reddit.return_value = mock_reddit_instance
+        mock_reddit_instance.subreddit.return_value = mock_subreddit
+
+        extractor = PrawRedditExtractor("test_subreddit")
+
+        with patch.object(extractor, '_submission_to_model', side_effect=lambda s: s.id):
+            posts = extractor.extract_new_posts(since=100.0, limit=50)
+
+        assert posts == ["newest", "newer"]
+        mock_subreddit.new.assert_called_once_with(limit=50)
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
+    def test_fetch_posts_info_batches_fullnames(self, mock_reddit, mock_get_settings):
+        mock_settings = Mock()
+        mock_settings.is_configured.return_value = True
+        mock_get_settings.return_value = mock_settings
+
+        mock_reddit_instance = Mock()
+        mock_reddit.return_value = mock_reddit_instance
+        mock_reddit_instance.subreddit.return_value = Mock()
+        mock_reddit_instance.info.side_effect = lambda fullnames: iter(fullnames)
+
+        extractor = PrawRedditExtractor("test_subreddit")
+        post_ids = [f"id{i}" for i in range(250)]
+
+        with patch.object(extractor, '_submission_to_model', side_effect=lambda s: s):
+            posts = extractor.fetch_posts_info(post_ids)
+
+        assert len(posts) == 250
+        assert posts[0] == "t3_id0"
+        batch_sizes = [len(c.kwargs["fullnames"]) for c in mock_reddit_instance.info.call_args_list]
+        assert batch_sizes == [100, 100, 50]
+
+    @patch('ruoa_extractor.src.extractors.praw_extractor.get_reddit_settings')
+    @patch('ruoa_extractor.src.extractors.praw_extractor.praw.Reddit')
+    def test_stream_comments_passes_pauses_and_reads_post_id(self, mock_reddit, mock_get_settings):
+        mock_settings = Mock()
+        mock_settings.is_configured.return_value = True
+        mock_get_settings.return_value = mock_settings
+
+        comment = Mock()
+        comment.link_id = "t3_abc123"
+        mock_subreddit = Mock()
+        mock_subreddit.stream.comments.return_value = iter([comment, None])
+        mock_reddit_instance = Mock()
+        mock_reddit.return_value = mock_reddit_instance
+        mock_reddit_instance.subreddit.return_value = mock_subreddit
+
+        extractor = PrawRedditExtractor("test_subreddit")
+
+        with patch.object(extractor, '_comment_to_model', side_effect=lambda c, post_id: post_id):
+            items = list(extractor.stream_comments())
+
+        assert items == ["abc123", None]
+        mock_subreddit.stream.comments.assert_called_once_with(pause_after=-1)
+
     def test_convert_timestamp(self):
         extractor = PrawRedditExtractor.__new__(PrawRedditExtractor)
         extractor.subreddit_name = "test"
@@ -222,6 +406,13 @@ class TestPrawRedditExtractor:
 
         assert post.author is None
         assert post.id == "post123"
+        assert isinstance(post, PostRecord)
+
+        model_extractor = PrawRedditExtractor("test", as_models=True)
+        model = model_extractor._submission_to_model(mock_submission)
+
+        assert isinstance(model, RedditPost)
+        assert model.subreddit == "test"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+﻿import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pytest
+
+from ruoa_extractor.src.core.records import PostRecord
+from ruoa_extractor.src.storage.lake_compaction import LakeCompactor, latest_versions
+from ruoa_extractor.src.storage.lake_manifest import MANIFEST_NAME, LakeManifest
+from ruoa_extractor.src.storage.parquet_storage import ParquetRedditStorage, lake_dataset
+
+DAY = datetime(2023, 3, 1, 9, tzinfo=timezone.utc)
+
+
+def version(post_id, score, extracted_hours, created=DAY, subreddit="universityofauckland"):
+    return PostRecord(id=post_id, title=post_id, created_utc=created, score=score, subreddit=subreddit,
+                      extraction_timestamp=datetime(2023, 3, 2) + timedelta(hours=extracted_hours))
+
+
+def write_in_flushes(root, *flushes):
+    storage = ParquetRedditStorage(root)
+    for posts in flushes:
+        storage.upsert_posts(posts)
+        storage.flush()
+    return os.path.join(root, "raw_reddit_posts")
+
+
+class TestLatestVersions:
+
+    def test_keeps_newest_extraction_of_each_id(self):
+        table = pa.table({
+            "id": ["a", "b", "a", "a"],
+            "score": [1, 5, 3, 2],
+            "extraction_timestamp": pa.array([1, 1, 3, 2], pa.timestamp("s")),
+        })
+
+        assert sorted(latest_versions(table).select(["id", "score"]).to_pylist(), key=lambda row: row["id"]) == [
+            {"id": "a", "score": 3}, {"id": "b", "score": 5}
+        ]
+
+
+class TestLakeCompactor:
+
+    def test_small_files_are_merged_and_deduplicated(self, tmp_path):
+        table_dir = write_in_flushes(
+            str(tmp_path),
+            [version("p1", 1, 0), version("p2", 1, 0)],
+            [version("p1", 7, 5)],
+            [version("p3", 2, 6)],
+        )
+
+        summary = LakeCompactor(str(tmp_path)).compact()
+
+        assert summary["files_removed"] == 3
+        assert summary["files_written"] == 1
+        assert summary["duplicates_removed"] == 1
+        partition = os.path.join(table_dir, "subreddit=universityofauckland", "date=2023-03-01")
+        assert len([name for name in os.listdir(partition) if name.endswith(".parquet")]) == 1
+        rows = lake_dataset(str(tmp_path), "raw_reddit_posts").to_table().to_pylist()
+        assert sorted((row["id"], row["score"]) for row in rows) == [("p1", 7), ("p2", 1), ("p3", 2)]
+
+    def test_overlapping_compaction_skips_replaced_partition(self, tmp_path):
+        table_dir = write_in_flushes(str(tmp_path), [version("p1", 1, 0)], [version("p1", 7, 5)])
+
+        class RacedCompactor(LakeCompactor):
+            def _rewrite(self, *args):
+                rewritten = super()._rewrite(*args)
+                # Another compaction finishes while this one is writing its outputs
+                LakeCompactor(self.root).compact()
+                return rewritten
+
+        summary = RacedCompactor(str(tmp_path)).compact()
+
+        assert summary["partitions_compacted"] == 0
+        entry, = LakeManifest(table_dir).read().values()
+        partition = os.path.join(table_dir, "subreddit=universityofauckland", "date=2023-03-01")
+        live = [name for name in os.listdir(partition) if name.endswith(".parquet")]
+        assert live == [os.path.basename(entry["path"])]
+        rows = lake_dataset(str(tmp_path), "raw_reddit_posts").to_table().to_pylist()
+        assert [(row["id"], row["score"]) for row in rows] == [("p1", 7)]
+
+    def test_manifest_lists_only_live_files_with_bounds(self, tmp_path):
+        later = DAY + timedelta(hours=5)
+        table_dir = write_in_flushes(str(tmp_path), [version("p1", 1, 0)], [version("p2", 1, 0, created=later)])
+
+        LakeCompactor(str(tmp_path)).compact()
+
+        entries = LakeManifest(table_dir).read()
+        entry, = entries.values()
+        assert os.path.exists(os.path.join(table_dir, entry["path"]))
+        assert entry["partition"] == {"subreddit": "universityofauckland", "date": "2023-03-01"}
+        assert (entry["rows"], entry["min_created_utc"], entry["max_created_utc"]) == (
+            2, DAY.timestamp(), later.timestamp()
+        )
+
+    def test_large_files_are_left_alone(self, tmp_path):
+        write_in_flushes(str(tmp_path), [version("p1", 1, 0)], [version("p2", 1, 0)])
+
+        summary = LakeCompactor(str(tmp_path), target_file_bytes=1024, small_file_bytes=0).compact()
+
+        assert summary["partitions_compacted"] == 0
+
+    def test_manifest_is_bootstrapped_for_lakes_written_without_one(self, tmp_path):
+        table_dir = write_in_flushes(str(tmp_path), [version("p1", 1, 0)])
+        os.remove(os.path.join(table_dir, MANIFEST_NAME))
+
+        LakeCompactor(str(tmp_path)).compact()
+
+        assert len(LakeManifest(table_dir).read()) == 1
+
+    def test_only_files_listed_in_the_manifest_are_compacted(self, tmp_path):
+        table_dir = write_in_flushes(str(tmp_path), [version("p1", 1, 0)], [version("p2", 1, 0)])
+        unlisted = ParquetRedditStorage(str(tmp_path / "elsewhere"))
+        unlisted.upsert_posts([version("p3", 1, 0)])
+        unlisted.flush()
+        partition = os.path.join("subreddit=universityofauckland", "date=2023-03-01")
+        stray, = (tmp_path / "elsewhere" / "raw_reddit_posts" / partition).glob("*.parquet")
+        os.replace(stray, os.path.join(table_dir, partition, stray.name))
+
+        summary = LakeCompactor(str(tmp_path)).compact()
+
+        assert summary["files_removed"] == 2
+        assert os.path.exists(os.path.join(table_dir, partition, stray.name))
+        assert sorted(lake_dataset(str(tmp_path), "raw_reddit_posts").to_table().column("id").to_pylist()) == [
+            "p1", "p2"
+        ]
+
+    def test_orphans_are_removed_only_when_asked_and_old_enough(self, tmp_path):
+        table_dir = write_in_flushes(str(tmp_path), [version("p1", 1, 0)])
+        orphan = os.path.join(table_dir, "subreddit=universityofauckland", "date=2023-03-01", "part-orphan.parquet")
+        with open(orphan, "wb") as handle:
+            handle.write(b"partial")
+
+        compactor = LakeCompactor(str(tmp_path))
+        compactor.compact()
+        assert compactor.remove_orphans() == 0
+        assert os.path.exists(orphan)
+
+        assert compactor.remove_orphans(min_age_seconds=-1) == 1
+        assert not os.path.exists(orphan)
+        assert lake_dataset(str(tmp_path), "raw_reddit_posts").count_rows() == 1
+
+
+class TestLakeManifest:
+
+    def test_readers_prune_by_subreddit_and_created_range(self, tmp_path):
+        next_week = DAY + timedelta(days=7)
+        table_dir = write_in_flushes(str(tmp_path), [
+            version("p1", 1, 0),
+            version("p2", 1, 0, created=next_week),
+            version("p3", 1, 0, subreddit="newzealand"),
+        ])
+        manifest = LakeManifest(table_dir)
+
+        assert len(manifest.files()) == 3
+        assert [os.path.basename(os.path.dirname(path)) for path in manifest.files(
+            subreddit="universityofauckland", since=(DAY + timedelta(days=1)).timestamp()
+        )] == ["date=2023-03-08"]
+        dataset = lake_dataset(str(tmp_path), "raw_reddit_posts", subreddit="newzealand")
+        assert dataset.to_table().column("id").to_pylist() == ["p3"]
+
+    def test_files_without_manifest_entry_are_not_read(self, tmp_path):
+        table_dir = write_in_flushes(str(tmp_path), [version("p1", 1, 0)])
+        stray = os.path.join(table_dir, "subreddit=universityofauckland", "date=2023-03-01", ".part-x.parquet.tmp")
+        with open(stray, "wb") as handle:
+            handle.write(b"partial")
+
+        assert lake_dataset(str(tmp_path), "raw_reddit_posts").count_rows() == 1
+        assert LakeManifest(table_dir).rebuild() == 1
+        with open(os.path.join(table_dir, MANIFEST_NAME)) as handle:
+            assert len(json.load(handle)["files"]) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,67 @@
+﻿import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from ruoa_extractor.src.main import check_configuration, main, OFFLINE_COMMANDS
+
+# The directory holding the ruoa_extractor package
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+class TestStartup:
+
+    def test_importing_main_does_not_import_praw(self):
+        code = "import sys, ruoa_extractor.src.main; print('praw' in sys.modules)"
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+
+        assert output.stdout.strip() == "False"
+
+    @patch('ruoa_extractor.src.main.get_reddit_settings')
+    def test_offline_commands_skip_reddit_credentials(self, mock_settings):
+        mock_settings.return_value.is_configured.return_value = False
+
+        assert 'stats' in OFFLINE_COMMANDS
+        assert check_configuration(needs_reddit=False) is True
+        mock_settings.assert_not_called()
+
+    @patch('ruoa_extractor.src.main.get_reddit_settings')
+    def test_extraction_requires_reddit_credentials(self, mock_settings):
+        mock_settings.return_value.is_configured.return_value = False
+
+        assert check_configuration() is False
+
+
+
+class TestArguments:
+
+    @pytest.mark.parametrize("argv, expected", [
+        ([], 8),
+        (["--max-concurrency", "2"], 2),
+        (["--comment-workers", "4", "--max-concurrency", "1"], 1),
+    ])
+    @patch('ruoa_extractor.src.main.check_configuration', return_value=True)
+    @patch('ruoa_extractor.src.main.setup_logging')
+    @patch('ruoa_extractor.src.main.run_async_extraction')
+    def test_async_concurrency_comes_from_its_own_flag(self, mock_run, mock_logging, mock_check, argv, expected):
+        command = ["main.py", "extract", "--extractor", "async", "--subreddit", "a,b"] + argv
+        with patch.object(sys, "argv", command), \
+                patch('ruoa_extractor.src.storage.raw_landing.close_landing_zones'):
+            main()
+
+        assert mock_run.call_args.kwargs["max_concurrency"] == expected
+        assert mock_run.call_args.kwargs["expansion_budget"].max_requests == 4
+
+    @pytest.mark.parametrize("flag", ["--staged", "--incremental"])
+    def test_async_rejects_flags_it_cannot_honour(self, flag):
+        command = ["main.py", "extract", "--extractor", "async", "--subreddit", "a,b", flag]
+        with patch.object(sys, "argv", command), pytest.raises(SystemExit):
+            main()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
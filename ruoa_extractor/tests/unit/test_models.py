@@ -3,6 +3,7 @@ from datetime import datetime
 from decimal import Decimal
 
 from ruoa_extractor.src.core.models import RedditPost, RedditComment, Base
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord, as_model, with_values
 
 
 class TestRedditPost:
@@ -184,5 +185,37 @@ class TestModelRelationships:
         # which we'll test in integration tests
 
 
+
+class TestRecords:
+    """Test cases for the plain record types used on the extract-load path"""
+
+    def test_record_fields_match_table_columns(self):
+        """Records can be written as rows without a column mapping"""
+        assert list(PostRecord._fields) == [column.name for column in RedditPost.__table__.columns]
+        assert list(CommentRecord._fields) == [column.name for column in RedditComment.__table__.columns]
+
+    def test_record_to_model(self):
+        """Test conversion to mapped objects only when asked for"""
+        record = PostRecord(id="record_post", title="Record", subreddit="universityofauckland", score=4)
+
+        post = record.to_model()
+
+        assert isinstance(post, RedditPost)
+        assert post.id == "record_post"
+        assert post.score == 4
+        assert as_model(post) is post
+        assert isinstance(as_model(CommentRecord(id="c1", post_id="record_post")), RedditComment)
+
+    def test_with_values(self):
+        """Records are copied, mapped objects are updated in place"""
+        record = PostRecord(id="record_post", title="Record", num_comments=9)
+        post = RedditPost(id="model_post", title="Model", num_comments=9)
+
+        assert with_values(record, num_comments=3).num_comments == 3
+        assert record.num_comments == 9
+        assert with_values(post, num_comments=3) is post
+        assert post.num_comments == 3
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
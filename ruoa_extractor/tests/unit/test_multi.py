@@ -0,0 +1,156 @@
+﻿import json
+import pytest
+from unittest.mock import Mock, patch
+
+from ruoa_extractor.src.extractors.comment_expansion import ExpansionBudget
+from ruoa_extractor.src.pipeline.multi import (
+    MultiSubredditRunner, SmoothWeightedScheduler, SubredditJob, jobs_from_spec, load_job_file, make_job
+)
+
+
+class TestSmoothWeightedScheduler:
+
+    def test_picks_follow_weights_and_are_spread_out(self):
+        scheduler = SmoothWeightedScheduler()
+        scheduler.add("a", 3)
+        scheduler.add("b", 1)
+
+        picks = [scheduler.next() for _ in range(8)]
+
+        assert picks.count("a") == 6
+        assert picks.count("b") == 2
+        assert picks[:4].count("b") == 1
+
+    def test_removed_keys_are_not_picked(self):
+        scheduler = SmoothWeightedScheduler()
+        scheduler.add("a", 5)
+        scheduler.add("b", 1)
+        scheduler.remove("a")
+
+        assert [scheduler.next() for _ in range(3)] == ["b", "b", "b"]
+        assert len(scheduler) == 1
+
+    def test_empty_scheduler_raises(self):
+        with pytest.raises(LookupError):
+            SmoothWeightedScheduler().next()
+
+
+class TestJobConfiguration:
+
+    def test_jobs_from_spec_reads_weights(self):
+        jobs = jobs_from_spec("universityofauckland:3, newzealand", post_limit=10, budget=5)
+
+        assert jobs == [
+            SubredditJob("universityofauckland", weight=3, post_limit=10, budget=5),
+            SubredditJob("newzealand", weight=1, post_limit=10, budget=5),
+        ]
+
+    def test_load_job_file_applies_defaults(self, tmp_path):
+        path = tmp_path / "jobs.json"
+        path.write_text(json.dumps({
+            "defaults": {"post_limit": 50, "time_filter": "week"},
+            "subreddits": ["newzealand", {"name": "universityofauckland", "weight": 2, "budget": 10}]
+        }))
+
+        jobs = load_job_file(str(path))
+
+        assert jobs[0] == SubredditJob("newzealand", post_limit=50, time_filter="week")
+        assert jobs[1].weight == 2
+        assert jobs[1].budget == 10
+        assert jobs[1].post_limit == 50
+
+    def test_invalid_jobs_rejected(self):
+        with pytest.raises(ValueError, match="Unknown job settings"):
+            make_job({"name": "test", "posts": 5})
+        with pytest.raises(ValueError, match="at least 1"):
+            make_job({"name": "test", "weight": 0})
+
+
+class TestMultiSubredditRunner:
+
+    @patch('ruoa_extractor.src.pipeline.multi.RedditETLPipeline')
+    @patch('ruoa_extractor.src.pipeline.multi.PrawRedditExtractor')
+    @patch('ruoa_extractor.src.pipeline.multi.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.multi.get_database_url')
+    def test_run_interleaves_subreddits_with_shared_resources(self, mock_get_url, mock_db_manager,
+                                                              mock_extractor, mock_pipeline):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        calls = []
+
+        def make_pipeline(name, **kwargs):
+            pipeline = Mock()
+
+            def load_posts(limit, time_filter):
+                calls.append((name, "posts"))
+                return {"posts_saved": 2, "posts_skipped": 0, "total_extracted": 2,
+                        "comment_post_ids": [f"{name}_1", f"{name}_2"]}
+
+            def load_comments(post_ids, comment_limit):
+                calls.append((name, post_ids[0]))
+                return {"comments_saved": 3, "comments_skipped": 0, "total_extracted": 3, "posts_processed": 1}
+
+            pipeline.extract_and_load_posts.side_effect = load_posts
+            pipeline.extract_and_load_comments.side_effect = load_comments
+            return pipeline
+
+        mock_pipeline.side_effect = make_pipeline
+
+        runner = MultiSubredditRunner([SubredditJob("big", weight=2, budget=4), SubredditJob("small")])
+        results = runner.run()
+
+        shared = mock_extractor.return_value
+        mock_extractor.assert_any_call(
+            "small", rate_limiter=shared.rate_limiter, reddit=shared.reddit, expansion_budget=None
+        )
+        mock_db_manager.return_value.ensure_schema.assert_called_once()
+        assert mock_pipeline.call_args_list[0].kwargs["db_manager"] is mock_db_manager.return_value
+        assert mock_pipeline.call_args_list[0].kwargs["max_comment_fetches"] == 4
+
+        assert calls == [
+            ("big", "posts"), ("small", "posts"), ("big", "big_1"),
+            ("big", "big_2"), ("small", "small_1"), ("small", "small_2"),
+        ]
+        assert results["subreddits"]["big"]["comments"]["comments_saved"] == 6
+        assert results["subreddits"]["small"]["steps"] == 3
+        assert results["total_data_points"] == 16
+
+    @patch('ruoa_extractor.src.pipeline.multi.RedditETLPipeline')
+    @patch('ruoa_extractor.src.pipeline.multi.PrawRedditExtractor')
+    @patch('ruoa_extractor.src.pipeline.multi.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.multi.get_database_url')
+    def test_failing_subreddit_does_not_stop_others(self, mock_get_url, mock_db_manager, mock_extractor,
+                                                    mock_pipeline):
+        broken = Mock()
+        broken.extract_and_load_posts.side_effect = RuntimeError("listing failed")
+        healthy = Mock()
+        healthy.extract_and_load_posts.return_value = {
+            "posts_saved": 1, "posts_skipped": 0, "total_extracted": 1, "comment_post_ids": []
+        }
+        mock_pipeline.side_effect = [broken, healthy]
+
+        results = MultiSubredditRunner([SubredditJob("broken"), SubredditJob("healthy")]).run()
+
+        assert results["subreddits"]["broken"]["error"] == "listing failed"
+        assert results["subreddits"]["healthy"]["posts"]["posts_saved"] == 1
+        assert "error" not in results["subreddits"]["healthy"]
+
+    @patch('ruoa_extractor.src.pipeline.multi.RedditETLPipeline')
+    @patch('ruoa_extractor.src.pipeline.multi.PrawRedditExtractor')
+    @patch('ruoa_extractor.src.pipeline.multi.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.multi.get_database_url')
+    def test_expansion_budget_reaches_every_extractor(self, mock_get_url, mock_db_manager, mock_extractor,
+                                                      mock_pipeline):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        budget = ExpansionBudget(max_requests=0, max_seconds=5)
+
+        MultiSubredditRunner([SubredditJob("a"), SubredditJob("b")], expansion_budget=budget)
+
+        assert [call.kwargs["expansion_budget"] for call in mock_extractor.call_args_list] == [budget, budget]
+
+    def test_duplicate_subreddits_rejected(self):
+        with pytest.raises(ValueError, match="only appear once"):
+            MultiSubredditRunner([SubredditJob("a"), SubredditJob("a")])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,148 @@
+﻿from datetime import datetime, timezone
+from unittest.mock import Mock
+
+import pyarrow.parquet as pq
+import pytest
+
+from ruoa_extractor.src.core.records import PostRecord, CommentRecord
+from ruoa_extractor.src.storage.fanout_storage import FanOutRedditStorage
+from ruoa_extractor.src.storage.parquet_storage import ParquetRedditStorage, lake_dataset
+
+CREATED = datetime(2023, 3, 1, 23, 30, tzinfo=timezone.utc)
+
+
+def lake_post(post_id, subreddit="universityofauckland", score=1, created=CREATED):
+    return PostRecord(id=post_id, title=f"Post {post_id}", author="student", created_utc=created, score=score,
+                      subreddit=subreddit, flair_text="Question", upvote_ratio=0.9)
+
+
+def lake_comment(comment_id, post_id):
+    return CommentRecord(id=comment_id, post_id=post_id, body="Reply", author="tutor", created_utc=CREATED)
+
+
+class TestParquetRedditStorage:
+
+    def test_writes_hive_partitions_by_subreddit_and_date(self, tmp_path):
+        storage = ParquetRedditStorage(str(tmp_path), subreddit="universityofauckland")
+        storage.upsert_posts([lake_post("p1"), lake_post("p2", subreddit="newzealand")])
+        storage.upsert_comments([lake_comment("c1", "p2"), lake_comment("c2", "unknown")])
+        storage.flush()
+
+        partitions = sorted(path.parent.relative_to(tmp_path).as_posix() for path in tmp_path.rglob("*.parquet"))
+
+        assert partitions == [
+            "raw_reddit_comments/subreddit=newzealand/date=2023-03-01",
+            "raw_reddit_comments/subreddit=universityofauckland/date=2023-03-01",
+            "raw_reddit_posts/subreddit=newzealand/date=2023-03-01",
+            "raw_reddit_posts/subreddit=universityofauckland/date=2023-03-01",
+        ]
+        rows = lake_dataset(str(tmp_path), "raw_reddit_posts").to_table().to_pylist()
+        assert {(row["id"], row["subreddit"], row["upvote_ratio"]) for row in rows} == {
+            ("p1", "universityofauckland", 0.9), ("p2", "newzealand", 0.9)
+        }
+
+    def test_comments_of_unseen_posts_use_the_permalink_or_the_stored_post(self, tmp_path):
+        first = ParquetRedditStorage(str(tmp_path))
+        first.upsert_posts([lake_post("p1", subreddit="newzealand")])
+        first.flush()
+
+        stream = ParquetRedditStorage(str(tmp_path), subreddit="newzealand+universityofauckland")
+        linked = lake_comment("c2", "p2")._replace(permalink="/r/universityofauckland/comments/p2/title/c2/")
+        stream.upsert_comments([lake_comment("c1", "p1"), linked])
+        stream.flush()
+
+        rows = lake_dataset(str(tmp_path), "raw_reddit_comments").to_table().to_pylist()
+        assert {(row["id"], row["subreddit"]) for row in rows} == {
+            ("c1", "newzealand"), ("c2", "universityofauckland")
+        }
+
+    def test_dictionary_encodes_only_low_cardinality_columns(self, tmp_path):
+        storage = ParquetRedditStorage(str(tmp_path))
+        storage.upsert_posts([lake_post("p1")])
+        storage.flush()
+
+        metadata = pq.ParquetFile(next(tmp_path.rglob("*.parquet"))).metadata
+        names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+        encodings = {name: metadata.row_group(0).column(i).encodings for i, name in enumerate(names)}
+
+        assert "subreddit" not in names
+        assert "RLE_DICTIONARY" in encodings["author"]
+        assert "RLE_DICTIONARY" in encodings["flair_text"]
+        assert "RLE_DICTIONARY" not in encodings["title"]
+
+    def test_rows_stay_buffered_until_a_threshold(self, tmp_path):
+        now = [0.0]
+        storage = ParquetRedditStorage(str(tmp_path), rows_per_file=3, max_buffer_seconds=60, clock=lambda: now[0])
+
+        storage.upsert_posts([lake_post("p1"), lake_post("p2")])
+        assert not list(tmp_path.rglob("*.parquet"))
+
+        storage.upsert_posts([lake_post("p3")])
+        assert lake_dataset(str(tmp_path), "raw_reddit_posts").count_rows() == 3
+
+        storage.upsert_posts([lake_post("p4")])
+        now[0] = 61.0
+        storage.upsert_comments([lake_comment("c1", "p4")])
+        assert lake_dataset(str(tmp_path), "raw_reddit_posts").count_rows() == 4
+        assert lake_dataset(str(tmp_path), "raw_reddit_comments").count_rows() == 1
+
+    def test_known_ids_are_read_back_from_the_lake(self, tmp_path):
+        first = ParquetRedditStorage(str(tmp_path))
+        first.upsert_posts([lake_post("p1")])
+        first.flush()
+
+        second = ParquetRedditStorage(str(tmp_path))
+
+        assert second.get_existing_post_ids(["p1", "p2"]) == {"p1"}
+        assert second.upsert_posts([lake_post("p1"), lake_post("p2")], update_existing=False) == {
+            "inserted": 1, "updated": 0
+        }
+        assert second.upsert_posts([lake_post("p1", score=5)]) == {"inserted": 0, "updated": 1}
+
+    def test_latest_post_timestamp_prunes_other_subreddits(self, tmp_path):
+        storage = ParquetRedditStorage(str(tmp_path))
+        assert storage.get_latest_post_timestamp("universityofauckland") is None
+
+        storage.upsert_posts([
+            lake_post("p1"),
+            lake_post("p2", subreddit="newzealand", created=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        ])
+        storage.flush()
+
+        assert storage.get_latest_post_timestamp("universityofauckland") == CREATED.timestamp()
+
+
+class TestFanOutRedditStorage:
+
+    def test_writes_reach_every_sink_and_reads_use_the_primary(self):
+        primary = Mock()
+        primary.upsert_posts.return_value = {"inserted": 2, "updated": 0}
+        primary.get_existing_post_ids.return_value = {"p1"}
+        primary.get_post_count.return_value = 7
+        secondary = Mock()
+        storage = FanOutRedditStorage(primary, [secondary])
+
+        counts = storage.upsert_posts(post for post in [lake_post("p1"), lake_post("p2")])
+
+        assert counts == {"inserted": 2, "updated": 0}
+        secondary.upsert_posts.assert_called_once_with([lake_post("p1"), lake_post("p2")], update_existing=True)
+        assert storage.get_existing_post_ids(["p1"]) == {"p1"}
+        assert storage.get_post_count("universityofauckland") == 7
+        secondary.get_existing_post_ids.assert_not_called()
+
+    def test_failed_copy_does_not_fail_the_load(self):
+        primary = Mock()
+        primary.upsert_comments.return_value = {"inserted": 1, "updated": 0}
+        secondary = Mock()
+        secondary.upsert_comments.side_effect = OSError("disk full")
+        storage = FanOutRedditStorage(primary, [secondary])
+
+        assert storage.upsert_comments([lake_comment("c1", "p1")], update_existing=False)["inserted"] == 1
+
+        storage.flush()
+        primary.flush.assert_called_once()
+        secondary.flush.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,6 +3,7 @@ from unittest.mock import Mock, patch, call, MagicMock
 from datetime import datetime
 
 from ruoa_extractor.src.pipeline.reddit_elt import RedditETLPipeline
+from ruoa_extractor.src.extractors.abstract_extractor import CommentFetchResult
 
 
 class TestRedditETLPipeline:
@@ -20,10 +21,30 @@ class TestRedditETLPipeline:
 
         assert pipeline.subreddit_name == "test_subreddit"
         assert pipeline.use_test_db is True
-        mock_extractor.assert_called_once_with("test_subreddit")
-        assert mock_db_manager.call_count == 2
-        mock_db_manager.assert_called_with("sqlite:///:memory:")
-        mock_db_instance.create_tables.assert_called_once()
+        mock_extractor.assert_called_once_with("test_subreddit", expansion_budget=None)
+        mock_db_manager.assert_called_once_with("sqlite:///:memory:")
+        assert pipeline.database_manager is pipeline.db_manager
+        mock_db_instance.ensure_schema.assert_called_once()
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_lake_dir_fans_writes_out_to_parquet(
+            self, mock_extractor, mock_storage, mock_db_manager, mock_get_url, tmp_path
+    ):
+        from ruoa_extractor.src.storage.fanout_storage import FanOutRedditStorage
+        from ruoa_extractor.src.storage.parquet_storage import ParquetRedditStorage
+
+        mock_get_url.return_value = "sqlite:///:memory:"
+
+        pipeline = RedditETLPipeline("test_subreddit", lake_dir=str(tmp_path))
+
+        assert isinstance(pipeline.storage, FanOutRedditStorage)
+        assert pipeline.storage.primary is mock_storage.return_value
+        lake, = pipeline.storage.secondaries
+        assert isinstance(lake, ParquetRedditStorage)
+        assert (lake.root, lake.subreddit) == (str(tmp_path), "test_subreddit")
 
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
@@ -36,16 +57,20 @@ class TestRedditETLPipeline:
 
         mock_post1 = Mock()
         mock_post1.id = "post1"
+        mock_post1.num_comments = 3
         mock_post2 = Mock()
         mock_post2.id = "post2"
+        mock_post2.num_comments = 4
 
         mock_extractor_instance = Mock()
         mock_extractor_instance.extract_posts.return_value = [mock_post1, mock_post2]
         mock_extractor.return_value = mock_extractor_instance
 
         mock_storage_instance = Mock()
-        mock_storage_instance.post_exists.side_effect = [False, True]
-        mock_storage_instance.save_post.return_value = True
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_comment_baselines.return_value = {"post2": 4}
+        mock_storage_instance.get_existing_post_ids.return_value = {"post2"}
+        mock_storage_instance.upsert_posts.return_value = {"inserted": 1, "updated": 0}
         mock_storage.return_value = mock_storage_instance
 
         pipeline = RedditETLPipeline("test_subreddit")
@@ -54,8 +79,12 @@ class TestRedditETLPipeline:
         assert result["posts_saved"] == 1
         assert result["posts_skipped"] == 1
         assert result["total_extracted"] == 2
+        assert result["comment_post_ids"] == ["post1"]
+        assert result["comment_posts_unchanged"] == 1
         mock_extractor_instance.extract_posts.assert_called_once_with(limit=2, time_filter="day")
-        mock_storage_instance.save_post.assert_called_once_with(mock_post1)
+        mock_storage_instance.get_existing_post_ids.assert_called_once_with(["post1", "post2"])
+        mock_storage_instance.upsert_posts.assert_called_once_with([mock_post1], update_existing=False)
+        mock_storage_instance.post_exists.assert_not_called()
 
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
@@ -94,12 +123,13 @@ class TestRedditETLPipeline:
         mock_comment2.id = "comment2"
 
         mock_extractor_instance = Mock()
-        mock_extractor_instance.extract_comments.return_value = [mock_comment1, mock_comment2]
+        mock_extractor_instance.iter_comments.return_value = [mock_comment1, mock_comment2]
         mock_extractor.return_value = mock_extractor_instance
 
         mock_storage_instance = Mock()
-        mock_storage_instance.comment_exists.side_effect = [False, False]
-        mock_storage_instance.save_comment.return_value = True
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_existing_comment_ids.return_value = set()
+        mock_storage_instance.upsert_comments.return_value = {"inserted": 2, "updated": 0}
         mock_storage.return_value = mock_storage_instance
 
         pipeline = RedditETLPipeline("test_subreddit")
@@ -109,7 +139,11 @@ class TestRedditETLPipeline:
         assert result["comments_skipped"] == 0
         assert result["total_extracted"] == 2
         assert result["posts_processed"] == 1
-        mock_extractor_instance.extract_comments.assert_called_once_with("post1", limit=10)
+        mock_extractor_instance.iter_comments.assert_called_once_with("post1", limit=10)
+        mock_storage_instance.get_existing_comment_ids.assert_called_once_with(["comment1", "comment2"])
+        mock_storage_instance.upsert_comments.assert_called_once_with(
+            [mock_comment1, mock_comment2], update_existing=False
+        )
 
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
@@ -129,7 +163,7 @@ class TestRedditETLPipeline:
             mock_post]
 
         mock_extractor_instance = Mock()
-        mock_extractor_instance.extract_comments.return_value = []
+        mock_extractor_instance.iter_comments.return_value = []
         mock_extractor.return_value = mock_extractor_instance
 
         mock_storage.return_value = Mock()
@@ -138,7 +172,7 @@ class TestRedditETLPipeline:
         result = pipeline.extract_and_load_comments()
 
         assert result["posts_processed"] == 1
-        mock_extractor_instance.extract_comments.assert_called_once_with("discovered_post", limit=None)
+        mock_extractor_instance.iter_comments.assert_called_once_with("discovered_post", limit=None)
 
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
@@ -147,22 +181,16 @@ class TestRedditETLPipeline:
     def test_run_full_pipeline_success(self, mock_extractor, mock_storage, mock_db_manager, mock_get_url):
         mock_get_url.return_value = "sqlite:///:memory:"
         mock_db_instance = MagicMock()  # Changed from Mock()
-        mock_session = Mock()
-        mock_db_instance.get_session.return_value.__enter__.return_value = mock_session
         mock_db_manager.return_value = mock_db_instance
 
-        mock_post = Mock()
-        mock_post.id = "new_post"
-        mock_session.query.return_value.filter_by.return_value.order_by.return_value.limit.return_value.all.return_value = [
-            mock_post]
-
         mock_storage.return_value = Mock()
 
         pipeline = RedditETLPipeline("test_subreddit")
 
         with patch.object(pipeline, 'extract_and_load_posts') as mock_extract_posts, \
                 patch.object(pipeline, 'extract_and_load_comments') as mock_extract_comments:
-            mock_extract_posts.return_value = {"posts_saved": 2, "posts_skipped": 1, "total_extracted": 3}
+            mock_extract_posts.return_value = {"posts_saved": 2, "posts_skipped": 1, "total_extracted": 3,
+                                               "comment_post_ids": ["grown_post", "new_post"]}
             mock_extract_comments.return_value = {"comments_saved": 5, "comments_skipped": 2, "total_extracted": 7,
                                                   "posts_processed": 2}
 
@@ -174,7 +202,7 @@ class TestRedditETLPipeline:
             assert "pipeline_duration_seconds" in result
 
             mock_extract_posts.assert_called_once_with(limit=10, time_filter="day")
-            mock_extract_comments.assert_called_once_with(post_ids=["new_post"], comment_limit=20)
+            mock_extract_comments.assert_called_once_with(post_ids=["grown_post", "new_post"], comment_limit=20)
 
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
@@ -189,11 +217,15 @@ class TestRedditETLPipeline:
 
         pipeline = RedditETLPipeline("test_subreddit")
 
-        with patch.object(pipeline, 'extract_and_load_posts') as mock_extract_posts:
-            mock_extract_posts.return_value = {"posts_saved": 0, "posts_skipped": 3, "total_extracted": 3}
+        with patch.object(pipeline, 'extract_and_load_posts') as mock_extract_posts, \
+                patch.object(pipeline, 'extract_and_load_comments') as mock_extract_comments:
+            mock_extract_posts.return_value = {"posts_saved": 0, "posts_skipped": 3, "total_extracted": 3,
+                                               "comment_post_ids": []}
 
             result = pipeline.run_full_pipeline()
 
+            mock_extract_comments.assert_not_called()
+
             assert result["posts"]["posts_saved"] == 0
             assert result["comments"]["comments_saved"] == 0
             assert result["total_data_points"] == 0
@@ -208,6 +240,7 @@ class TestRedditETLPipeline:
         mock_db_manager.return_value = mock_db_instance
 
         mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
         mock_storage_instance.get_post_count.return_value = 100
         mock_storage_instance.get_comment_count.return_value = 500
         mock_storage_instance.get_latest_post_timestamp.return_value = 1640995200.0
@@ -226,6 +259,327 @@ class TestRedditETLPipeline:
         mock_storage_instance.get_comment_count.assert_called_once_with("test_subreddit")
         mock_storage_instance.get_latest_post_timestamp.assert_called_once_with("test_subreddit")
 
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_extract_and_load_posts_batches_existence_checks(self, mock_extractor, mock_storage, mock_db_manager,
+                                                             mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        posts = []
+        for i in range(5):
+            post = Mock()
+            post.id = f"post{i}"
+            post.num_comments = 0
+            posts.append(post)
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.extract_posts.return_value = posts
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_comment_baselines.return_value = {"post0": 0, "post4": 0}
+        mock_storage_instance.get_existing_post_ids.side_effect = [{"post0"}, set(), {"post4"}]
+        mock_storage_instance.upsert_posts.side_effect = lambda batch, update_existing: {
+            "inserted": len(batch), "updated": 0
+        }
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", load_batch_size=2)
+        result = pipeline.extract_and_load_posts(limit=5)
+
+        assert result["posts_saved"] == 3
+        assert result["posts_skipped"] == 2
+        assert mock_storage_instance.get_existing_post_ids.call_count == 3
+        assert mock_storage_instance.upsert_posts.call_count == 2
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_extract_and_load_comments_concurrent_workers(self, mock_extractor, mock_storage, mock_db_manager,
+                                                          mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        mock_comment = Mock()
+        mock_comment.id = "comment1"
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.iter_comments_concurrently.return_value = iter([
+            CommentFetchResult("post2", [mock_comment]),
+            CommentFetchResult("post1", [], RuntimeError("timeout")),
+        ])
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_existing_comment_ids.return_value = set()
+        mock_storage_instance.upsert_comments.return_value = {"inserted": 1, "updated": 0}
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", comment_workers=4)
+        result = pipeline.extract_and_load_comments(post_ids=["post1", "post2"], comment_limit=10)
+
+        assert result["comments_saved"] == 1
+        assert result["total_extracted"] == 1
+        assert result["posts_processed"] == 2
+        mock_extractor_instance.iter_comments_concurrently.assert_called_once_with(
+            ["post1", "post2"], limit=10, max_workers=4
+        )
+        mock_extractor_instance.iter_comments.assert_not_called()
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_extract_and_load_new_posts_advances_watermark(self, mock_extractor, mock_storage, mock_db_manager,
+                                                           mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        posts = []
+        for post_id, hour in [("post1", 12), ("post2", 10)]:
+            post = Mock()
+            post.id = post_id
+            post.num_comments = 0
+            post.created_utc = datetime(2024, 1, 1, hour, 0, 0)
+            posts.append(post)
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.extract_new_posts.return_value = posts
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_watermark.return_value = 1000.0
+        mock_storage_instance.get_comment_baselines.return_value = {"post2": 0}
+        mock_storage_instance.get_existing_post_ids.return_value = {"post2"}
+        mock_storage_instance.upsert_posts.return_value = {"inserted": 1, "updated": 0}
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", overlap_seconds=60)
+        result = pipeline.extract_and_load_new_posts(max_posts=100)
+
+        newest = posts[0].created_utc.timestamp()
+        assert result["posts_saved"] == 1
+        assert result["posts_skipped"] == 1
+        assert result["watermark"] == newest
+        mock_extractor_instance.extract_new_posts.assert_called_once_with(since=940.0, limit=100)
+        mock_storage_instance.get_latest_post_timestamp.assert_not_called()
+        mock_storage_instance.save_watermark.assert_called_once_with(
+            "test_subreddit", RedditETLPipeline.POSTS_STREAM, newest, "post1"
+        )
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_extract_and_load_new_posts_keeps_watermark_on_failed_batch(self, mock_extractor, mock_storage,
+                                                                        mock_db_manager, mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        post = Mock()
+        post.id = "post1"
+        post.num_comments = 0
+        post.created_utc = datetime(2024, 1, 1, 12, 0, 0)
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.extract_new_posts.return_value = [post]
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_watermark.return_value = None
+        mock_storage_instance.get_latest_post_timestamp.return_value = None
+        mock_storage_instance.get_comment_baselines.return_value = {}
+        mock_storage_instance.get_existing_post_ids.return_value = set()
+        mock_storage_instance.upsert_posts.side_effect = Exception("Database error")
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit")
+        result = pipeline.extract_and_load_new_posts()
+
+        assert result["posts_saved"] == 0
+        assert result["watermark"] is None
+        mock_extractor_instance.extract_new_posts.assert_called_once_with(since=None, limit=1000)
+        mock_storage_instance.save_watermark.assert_not_called()
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_extract_and_load_posts_plans_grown_comment_threads(self, mock_extractor, mock_storage, mock_db_manager,
+                                                                mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        posts = []
+        for post_id, num_comments in [("small", 6), ("unchanged", 9), ("large", 40), ("capped", 3)]:
+            post = Mock()
+            post.id = post_id
+            post.num_comments = num_comments
+            posts.append(post)
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.extract_posts.return_value = posts
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_comment_baselines.return_value = {"small": 5, "unchanged": 9, "large": 10,
+                                                                      "capped": 2}
+        mock_storage_instance.get_existing_post_ids.return_value = {"small", "unchanged", "large", "capped"}
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", max_comment_refreshes=2)
+        result = pipeline.extract_and_load_posts(limit=4)
+
+        assert result["posts_skipped"] == 4
+        assert result["comment_post_ids"] == ["large", "small"]
+        assert result["comment_posts_unchanged"] == 1
+        assert result["comment_posts_deferred"] == 1
+        mock_storage_instance.upsert_posts.assert_called_once_with([posts[2], posts[0]], update_existing=True)
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_fetch_budget_queues_deferred_new_posts_with_their_true_count(self, mock_extractor, mock_storage,
+                                                                         mock_db_manager, mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        posts = []
+        for post_id, num_comments in [("busy", 50), ("quiet", 2)]:
+            post = Mock()
+            post.id = post_id
+            post.num_comments = num_comments
+            posts.append(post)
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.extract_posts.return_value = posts
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_comment_baselines.return_value = {}
+        mock_storage_instance.get_existing_post_ids.return_value = set()
+        mock_storage_instance.upsert_posts.return_value = {"inserted": 2, "updated": 0}
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", max_comment_fetches=1)
+        result = pipeline.extract_and_load_posts(limit=2)
+
+        assert result["comment_post_ids"] == ["busy"]
+        assert result["comment_posts_deferred"] == 1
+        assert posts[1].num_comments == 2
+        mock_storage_instance.mark_comments_pending.assert_called_once_with({"busy": 0, "quiet": 0})
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_injected_extractor_and_database_are_shared(self, mock_extractor, mock_db_manager, mock_storage):
+        extractor = Mock()
+        db_manager = Mock()
+
+        pipeline = RedditETLPipeline("test_subreddit", extractor=extractor, db_manager=db_manager)
+
+        assert pipeline.extractor is extractor
+        assert pipeline.db_manager is db_manager
+        mock_extractor.assert_not_called()
+        mock_db_manager.assert_not_called()
+        mock_storage.assert_called_once_with(db_manager)
+        db_manager.ensure_schema.assert_not_called()
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_refresh_post_metrics(self, mock_extractor, mock_storage, mock_db_manager, mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        refreshed = []
+        for post_id, num_comments in [("grown", 10), ("deferred", 6), ("same", 2)]:
+            post = Mock()
+            post.id = post_id
+            post.num_comments = num_comments
+            refreshed.append(post)
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.fetch_posts_info.return_value = refreshed
+        mock_extractor.return_value = mock_extractor_instance
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_recent_post_ids.return_value = ["grown", "deferred", "same"]
+        mock_storage_instance.get_comment_baselines.return_value = {"grown": 1, "deferred": 5, "same": 2}
+        mock_storage_instance.update_post_metrics.return_value = 3
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", max_comment_refreshes=1)
+
+        with patch.object(pipeline, 'extract_and_load_comments') as mock_extract_comments:
+            mock_extract_comments.return_value = {"comments_saved": 9}
+            result = pipeline.refresh_post_metrics(max_posts=50, max_age_days=None, comment_limit=5)
+
+        assert result["posts_updated"] == 3
+        assert result["comment_posts_deferred"] == 1
+        assert refreshed[1].num_comments == 6
+        mock_storage_instance.mark_comments_pending.assert_called_once_with({"grown": 1, "deferred": 5})
+        mock_storage_instance.get_recent_post_ids.assert_called_once_with("test_subreddit", since=None, limit=50)
+        mock_extractor_instance.fetch_posts_info.assert_called_once_with(["grown", "deferred", "same"])
+        mock_storage_instance.record_post_metrics.assert_called_once_with(refreshed)
+        mock_storage_instance.update_post_metrics.assert_called_once_with(refreshed)
+        mock_extract_comments.assert_called_once_with(post_ids=["grown"], comment_limit=5)
+
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseRedditStorage')
+    @patch('ruoa_extractor.src.pipeline.reddit_elt.PrawRedditExtractor')
+    def test_extract_and_load_comments_streams_in_batches(self, mock_extractor, mock_storage, mock_db_manager,
+                                                          mock_get_url):
+        mock_get_url.return_value = "sqlite:///:memory:"
+        mock_db_manager.return_value = Mock()
+
+        produced = []
+
+        def stream_comments(post_id, limit=None):
+            for i in range(5):
+                comment = Mock()
+                comment.id = f"{post_id}_{i}"
+                produced.append(comment.id)
+                yield comment
+
+        mock_extractor_instance = Mock()
+        mock_extractor_instance.iter_comments.side_effect = stream_comments
+        mock_extractor.return_value = mock_extractor_instance
+
+        produced_at_write = []
+
+        def upsert(batch, update_existing):
+            produced_at_write.append(len(produced))
+            return {"inserted": len(batch), "updated": 0}
+
+        mock_storage_instance = Mock()
+        mock_storage_instance.get_pending_comment_post_ids.return_value = []
+        mock_storage_instance.get_existing_comment_ids.return_value = set()
+        mock_storage_instance.upsert_comments.side_effect = upsert
+        mock_storage.return_value = mock_storage_instance
+
+        pipeline = RedditETLPipeline("test_subreddit", load_batch_size=2)
+        result = pipeline.extract_and_load_comments(post_ids=["post1"])
+
+        assert result["comments_saved"] == 5
+        assert result["total_extracted"] == 5
+        # Each batch is written before the next one is pulled from the generator
+        assert produced_at_write == [2, 4, 5]
+
     @patch('ruoa_extractor.src.pipeline.reddit_elt.logging')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.get_database_url')
     @patch('ruoa_extractor.src.pipeline.reddit_elt.DatabaseManager')
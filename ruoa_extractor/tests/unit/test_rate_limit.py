@@ -0,0 +1,184 @@
+﻿import pytest
+import threading
+from unittest.mock import Mock
+
+from ruoa_extractor.src.extractors.rate_limit import RateLimiter, shared_rate_limiter
+from ruoa_extractor.src.extractors.requestor import RateLimitedRequestor
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter:
+
+    def test_requests_within_budget_do_not_wait(self):
+        clock = FakeClock()
+        limiter = RateLimiter(max_requests=3, period_seconds=60, clock=clock.time, sleep=clock.sleep)
+
+        for _ in range(3):
+            limiter.acquire()
+
+        assert clock.sleeps == []
+
+    def test_request_over_budget_waits_for_refill(self):
+        clock = FakeClock()
+        limiter = RateLimiter(max_requests=2, period_seconds=60, clock=clock.time, sleep=clock.sleep)
+
+        limiter.acquire()
+        clock.now = 10.0
+        limiter.acquire()
+        limiter.acquire()
+
+        # One token every 30s: 1/3 of a token came back during the first 10s
+        assert clock.sleeps == [pytest.approx(20.0)]
+        assert clock.now == pytest.approx(30.0)
+
+    def test_server_budget_caps_burst(self):
+        clock = FakeClock()
+        limiter = RateLimiter(max_requests=100, period_seconds=60, clock=clock.time, sleep=clock.sleep)
+
+        limiter.update_from_headers({"x-ratelimit-remaining": "2.0", "x-ratelimit-reset": "45"})
+        limiter.acquire()
+        limiter.acquire()
+        limiter.acquire()
+
+        assert clock.sleeps == [45.0]
+        # Our own bucket refilled while waiting for the server window
+        assert limiter.available() == pytest.approx(74.0)
+
+    def test_late_response_does_not_restore_spent_budget(self):
+        clock = FakeClock()
+        limiter = RateLimiter(max_requests=100, period_seconds=60, clock=clock.time, sleep=clock.sleep)
+
+        limiter.update(remaining=3, reset_seconds=30)
+        limiter.acquire()
+        limiter.update(remaining=10, reset_seconds=30)
+
+        assert limiter.available() == 2
+
+    def test_headers_missing_are_ignored(self):
+        clock = FakeClock()
+        limiter = RateLimiter(max_requests=5, period_seconds=60, clock=clock.time, sleep=clock.sleep)
+
+        limiter.update_from_headers({"content-type": "application/json"})
+
+        assert limiter.available() == 5
+
+    def test_state_file_shared_between_limiters(self, tmp_path):
+        clock = FakeClock()
+        state_path = str(tmp_path / "ratelimit.json")
+        first = RateLimiter(max_requests=3, period_seconds=60, clock=clock.time, sleep=clock.sleep,
+                            state_path=state_path)
+        second = RateLimiter(max_requests=3, period_seconds=60, clock=clock.time, sleep=clock.sleep,
+                             state_path=state_path)
+
+        first.acquire()
+        first.acquire()
+        second.acquire()
+        second.acquire()
+
+        assert clock.sleeps == [pytest.approx(20.0)]
+
+    def test_shared_rate_limiter_reuses_instance(self):
+        assert shared_rate_limiter("shared-test-app", state_path=None) is shared_rate_limiter("shared-test-app")
+
+    def test_invalid_budget_rejected(self):
+        with pytest.raises(ValueError):
+            RateLimiter(max_requests=0)
+
+    def test_shared_across_threads(self):
+        clock = FakeClock()
+        limiter = RateLimiter(max_requests=50, period_seconds=60, clock=clock.time, sleep=clock.sleep)
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(20)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert limiter.available() == 30
+
+
+def make_response(status_code=200, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class TestRateLimitedRequestor:
+
+    def make_requestor(self, limiter, response, landing_zone=None):
+        session = Mock()
+        session.headers = {}
+        session.request.return_value = response
+        return RateLimitedRequestor(
+            user_agent="test-agent/1.0",
+            session=session,
+            get_rate_limiter=lambda: limiter,
+            get_landing_zone=lambda: landing_zone
+        )
+
+    def test_api_request_acquires_and_reads_headers(self):
+        limiter = Mock()
+        response = make_response(headers={"x-ratelimit-remaining": "5", "x-ratelimit-reset": "30"})
+        requestor = self.make_requestor(limiter, response)
+
+        assert requestor.request("GET", "https://oauth.reddit.com/r/test/top") is response
+        limiter.acquire.assert_called_once()
+        limiter.update_from_headers.assert_called_once_with(response.headers)
+
+    def test_token_request_bypasses_limiter(self):
+        limiter = Mock()
+        requestor = self.make_requestor(limiter, make_response())
+
+        requestor.request("post", "https://www.reddit.com/api/v1/access_token")
+
+        limiter.acquire.assert_not_called()
+
+    def test_too_many_requests_throttles(self):
+        limiter = Mock()
+        requestor = self.make_requestor(limiter, make_response(429, {"retry-after": "7"}))
+
+        requestor.request("GET", "https://oauth.reddit.com/comments/abc")
+
+        limiter.throttle.assert_called_once_with(7.0)
+
+    def test_json_responses_are_landed(self):
+        landing_zone = Mock()
+        response = make_response(headers={"content-type": "application/json; charset=UTF-8"})
+        response.content = b'{"kind": "Listing"}'
+        requestor = self.make_requestor(Mock(), response, landing_zone)
+
+        requestor.request(method="GET", url="https://oauth.reddit.com/r/test/new", params={"limit": 100})
+
+        landing_zone.append.assert_called_once_with(
+            "GET", "https://oauth.reddit.com/r/test/new", {"limit": 100}, 200, b'{"kind": "Listing"}'
+        )
+
+    def test_failed_and_token_responses_are_not_landed(self):
+        landing_zone = Mock()
+        headers = {"content-type": "application/json"}
+        self.make_requestor(Mock(), make_response(429, headers), landing_zone).request(
+            "GET", "https://oauth.reddit.com/r/test/new"
+        )
+        self.make_requestor(Mock(), make_response(200, headers), landing_zone).request(
+            "post", "https://www.reddit.com/api/v1/access_token"
+        )
+
+        landing_zone.append.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
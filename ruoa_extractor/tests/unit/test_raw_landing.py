@@ -0,0 +1,133 @@
+﻿import json
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from ruoa_extractor.src.extractors.replay_extractor import ReplayRedditExtractor, iter_things
+from ruoa_extractor.src.storage.raw_landing import (
+    INDEX_ENTRY,
+    INDEX_SUFFIX,
+    RawLandingZone,
+    S3SegmentUploader,
+    iter_landed_records,
+    list_segments
+)
+
+
+def listing(*children):
+    return {"kind": "Listing", "data": {"children": list(children)}}
+
+
+def post_thing(post_id, score=1, subreddit="universityofauckland"):
+    return {"kind": "t3", "data": {
+        "id": post_id, "title": f"Post {post_id}", "created_utc": 1640995200.0, "score": score, "subreddit": subreddit
+    }}
+
+
+def comment_thing(comment_id, post_id, replies=""):
+    return {"kind": "t1", "data": {
+        "id": comment_id, "link_id": f"t3_{post_id}", "parent_id": f"t3_{post_id}", "body": "Hi",
+        "created_utc": 1640995300.0, "subreddit": "universityofauckland", "replies": replies
+    }}
+
+
+def land(landing_zone, body, url="https://oauth.reddit.com/r/universityofauckland/top"):
+    landing_zone.append("GET", url, {"limit": 25}, 200, json.dumps(body).encode("utf-8"))
+
+
+class TestRawLandingZone:
+
+    def test_records_round_trip_through_segment_and_index(self, tmp_path):
+        landing_zone = RawLandingZone(str(tmp_path), clock=lambda: 1700000000.0)
+        land(landing_zone, listing(post_thing("p1")))
+        land(landing_zone, {"json": {"errors": []}})
+        landing_zone.close()
+
+        records = list(iter_landed_records(list_segments(str(tmp_path))))
+
+        assert [record["body"] for record in records] == [listing(post_thing("p1")), {"json": {"errors": []}}]
+        assert records[0]["params"] == {"limit": 25}
+        assert records[0]["received_at"] == 1700000000.0
+        assert records[0]["url"].endswith("/top")
+
+    def test_segments_rotate_by_size(self, tmp_path):
+        landing_zone = RawLandingZone(str(tmp_path), segment_bytes=1)
+        for i in range(3):
+            land(landing_zone, listing(post_thing(f"p{i}")))
+
+        segments = list_segments(str(tmp_path))
+
+        assert len(segments) == 3
+        assert [record["body"]["data"]["children"][0]["data"]["id"]
+                for record in iter_landed_records(segments)] == ["p0", "p1", "p2"]
+
+    def test_torn_index_entry_is_ignored(self, tmp_path):
+        landing_zone = RawLandingZone(str(tmp_path))
+        land(landing_zone, listing(post_thing("p1")))
+        landing_zone.close()
+        segment = list_segments(str(tmp_path))[0]
+        with open(segment + INDEX_SUFFIX, "ab") as index:
+            index.write(INDEX_ENTRY.pack(os.path.getsize(segment), 10)[:5])
+
+        assert len(list(iter_landed_records([segment]))) == 1
+
+    def test_closed_segments_are_uploaded(self, tmp_path):
+        client = Mock()
+        uploader = S3SegmentUploader("s3://lake/raw/reddit", client=client)
+        landing_zone = RawLandingZone(str(tmp_path), segment_bytes=1, uploader=uploader)
+
+        land(landing_zone, listing(post_thing("p1")))
+
+        segment = list_segments(str(tmp_path))[0]
+        name = os.path.basename(segment)
+        assert [call.args for call in client.upload_file.call_args_list] == [
+            (segment, "lake", f"raw/reddit/{name}"),
+            (segment + INDEX_SUFFIX, "lake", f"raw/reddit/{name}{INDEX_SUFFIX}"),
+        ]
+
+    def test_uploader_rejects_other_schemes(self):
+        with pytest.raises(ValueError, match="Not an S3 URI"):
+            S3SegmentUploader("https://lake/raw", client=Mock())
+
+
+class TestReplayRedditExtractor:
+
+    def test_things_found_in_nested_replies(self):
+        reply = listing(comment_thing("c2", "p1"))
+        tree = [listing(post_thing("p1")), listing(comment_thing("c1", "p1", replies=reply))]
+
+        assert [data["id"] for data in iter_things(tree, "t1")] == ["c1", "c2"]
+
+    def test_replay_keeps_latest_version_of_each_item(self, tmp_path):
+        landing_zone = RawLandingZone(str(tmp_path), segment_bytes=1)
+        land(landing_zone, listing(post_thing("p1", score=1), post_thing("other", subreddit="newzealand")))
+        land(landing_zone, [listing(post_thing("p2")), listing(comment_thing("c1", "p2"))])
+        land(landing_zone, listing(post_thing("p1", score=9)))
+        landing_zone.close()
+
+        extractor = ReplayRedditExtractor("UniversityOfAuckland", landing_dir=str(tmp_path))
+        posts = list(extractor.iter_archived_posts())
+
+        assert [(post.id, post.score) for post in posts] == [("p2", 1), ("p1", 9)]
+        assert [(comment.id, comment.post_id) for comment in extractor.iter_archived_comments()] == [("c1", "p2")]
+        assert [post.id for post in extractor.extract_posts(limit=1)] == ["p1"]
+
+    def test_replay_picks_the_version_received_last_not_read_last(self, tmp_path):
+        # Two writers: the first started its segment earlier but received its response later
+        first_clock = iter([1700000300.0, 1700000100.0])
+        second_clock = iter([1700000200.0, 1700000200.0])
+        first = RawLandingZone(str(tmp_path), clock=lambda: next(first_clock))
+        second = RawLandingZone(str(tmp_path), clock=lambda: next(second_clock))
+        land(first, listing(post_thing("p1", score=9)))
+        land(second, listing(post_thing("p1", score=1)))
+        first.close()
+        second.close()
+
+        extractor = ReplayRedditExtractor("universityofauckland", landing_dir=str(tmp_path))
+
+        assert [(post.id, post.score) for post in extractor.iter_archived_posts()] == [("p1", 9)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
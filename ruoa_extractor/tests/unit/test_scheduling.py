@@ -0,0 +1,81 @@
+﻿import pytest
+
+from ruoa_extractor.src.pipeline.scheduling import AdaptiveScheduler, CycleOutcome
+
+
+def make_scheduler(**overrides):
+    settings = dict(base_interval=3600, min_interval=300, max_interval=86400, target_items=100,
+                    random_fraction=lambda: 0.5)
+    settings.update(overrides)
+    return AdaptiveScheduler(**settings)
+
+
+class TestAdaptiveScheduler:
+
+    def test_busy_subreddit_is_polled_sooner(self):
+        scheduler = make_scheduler()
+
+        # 400 items per hour: 100 items arrive in 15 minutes
+        assert scheduler.record_success("busy", 400) == pytest.approx(900)
+
+    def test_delay_is_clamped_to_min_interval(self):
+        scheduler = make_scheduler()
+
+        assert scheduler.record_success("flood", 100000) == 300
+
+    def test_idle_subreddit_backs_off_exponentially(self):
+        scheduler = make_scheduler()
+
+        delays = [scheduler.record_success("quiet", 0) for _ in range(3)]
+
+        assert delays == [7200, 14400, 28800]
+        assert scheduler.record_success("quiet", 0) == 57600
+        assert scheduler.record_success("quiet", 0) == 86400
+
+    def test_rate_uses_recent_history(self):
+        scheduler = make_scheduler()
+
+        scheduler.record_success("sub", 400)
+        delay = scheduler.record_success("sub", 10)
+
+        assert scheduler.history("sub") == [CycleOutcome(400, 3600), CycleOutcome(10, 900)]
+        # 410 items over 4500 seconds
+        assert delay == pytest.approx(100 * 4500 / 410)
+
+    def test_failures_retry_quickly_with_jitter(self):
+        scheduler = make_scheduler(random_fraction=lambda: 1.0)
+
+        assert scheduler.record_failure("sub") == 60
+        assert scheduler.record_failure("sub") == 120
+        assert make_scheduler(random_fraction=lambda: 0.0).record_failure("sub") == 30
+
+    def test_failure_retries_never_exceed_base_interval(self):
+        scheduler = make_scheduler(random_fraction=lambda: 1.0)
+
+        delays = [scheduler.record_failure("sub") for _ in range(10)]
+
+        assert max(delays) == 3600
+
+    def test_success_resets_failures_and_counts_retry_time(self):
+        scheduler = make_scheduler(random_fraction=lambda: 1.0)
+
+        scheduler.record_failure("sub")
+        scheduler.record_success("sub", 100)
+
+        assert scheduler.history("sub") == [CycleOutcome(100, 3660)]
+        assert scheduler.record_failure("sub") == 60
+
+    def test_subreddits_are_tracked_separately(self):
+        scheduler = make_scheduler()
+
+        scheduler.record_success("quiet", 0)
+
+        assert scheduler.record_success("busy", 400) == pytest.approx(900)
+
+    def test_invalid_intervals_rejected(self):
+        with pytest.raises(ValueError):
+            make_scheduler(min_interval=7200)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,63 @@
+﻿import pytest
+import queue
+import threading
+
+from ruoa_extractor.src.pipeline.staged import StageRunner, PipelineStopped
+
+
+class TestStageRunner:
+
+    def test_put_blocks_on_full_queue_until_consumed(self):
+        runner = StageRunner(poll_interval=0.01)
+        bounded = queue.Queue(maxsize=1)
+        produced = []
+
+        def producer():
+            for item in range(3):
+                runner.put(bounded, item)
+                produced.append(item)
+
+        runner.start("producer", producer)
+
+        consumed = [runner.get(bounded) for _ in range(3)]
+        runner.join()
+
+        assert consumed == [0, 1, 2]
+        assert produced == [0, 1, 2]
+        assert runner.errors == []
+
+    def test_stop_releases_blocked_producer(self):
+        runner = StageRunner(poll_interval=0.01)
+        bounded = queue.Queue(maxsize=1)
+        bounded.put("full")
+        blocked = threading.Event()
+
+        def producer():
+            blocked.set()
+            runner.put(bounded, "never fits")
+
+        runner.start("producer", producer)
+        blocked.wait(timeout=1)
+        runner.stop()
+        runner.join()
+
+        assert runner.errors == []
+        with pytest.raises(PipelineStopped):
+            runner.get(queue.Queue())
+
+    def test_stage_error_stops_pipeline_and_is_reraised(self):
+        runner = StageRunner(poll_interval=0.01)
+
+        def failing_stage():
+            raise RuntimeError("listing failed")
+
+        runner.start("failing", failing_stage)
+        runner.join()
+
+        assert runner.stop_event.is_set()
+        with pytest.raises(RuntimeError, match="listing failed"):
+            runner.raise_first_error()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,116 @@
+﻿import time
+from unittest.mock import Mock, patch
+
+import praw
+import pytest
+from prawcore.auth import ReadOnlyAuthorizer, TrustedAuthenticator
+
+from ruoa_extractor.src.extractors.token_cache import (
+    CachedReadOnlyAuthorizer,
+    TokenCache,
+    install_token_cache
+)
+
+
+class FakeTokenEndpoint:
+    """Stands in for ReadOnlyAuthorizer.refresh, issuing numbered one-hour tokens"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, authorizer):
+        self.calls += 1
+        authorizer.access_token = f"token-{self.calls}"
+        authorizer.scopes = {"*"}
+        authorizer._expiration_timestamp_ns = time.monotonic_ns() + 3600 * 10 ** 9
+
+
+def make_authorizer(cache, clock):
+    authenticator = TrustedAuthenticator(requestor=Mock(), client_id="client-id", client_secret="client-secret")
+    return CachedReadOnlyAuthorizer(authenticator=authenticator, cache=cache, clock=clock)
+
+
+class TestCachedReadOnlyAuthorizer:
+
+    def test_second_process_reuses_cached_token(self, tmp_path):
+        cache = TokenCache(str(tmp_path / "token.json"))
+        endpoint = FakeTokenEndpoint()
+
+        with patch.object(ReadOnlyAuthorizer, "refresh", autospec=True, side_effect=endpoint):
+            first = make_authorizer(cache, clock=lambda: 1000.0)
+            first.refresh()
+            second = make_authorizer(cache, clock=lambda: 1100.0)
+            second.refresh()
+
+        assert endpoint.calls == 1
+        assert second.access_token == "token-1"
+        assert second.scopes == {"*"}
+        assert second.is_valid()
+
+    def test_token_near_expiry_is_replaced(self, tmp_path):
+        cache = TokenCache(str(tmp_path / "token.json"))
+        endpoint = FakeTokenEndpoint()
+
+        with patch.object(ReadOnlyAuthorizer, "refresh", autospec=True, side_effect=endpoint):
+            make_authorizer(cache, clock=lambda: 1000.0).refresh()
+            later = make_authorizer(cache, clock=lambda: 1000.0 + 3600 - 30)
+            later.refresh()
+
+        assert endpoint.calls == 2
+        assert later.access_token == "token-2"
+
+    def test_rejected_token_is_not_adopted_again(self, tmp_path):
+        cache = TokenCache(str(tmp_path / "token.json"))
+        endpoint = FakeTokenEndpoint()
+
+        with patch.object(ReadOnlyAuthorizer, "refresh", autospec=True, side_effect=endpoint):
+            authorizer = make_authorizer(cache, clock=lambda: 1000.0)
+            authorizer.refresh()
+            # What prawcore does after a 401 response
+            authorizer._clear_access_token()
+            authorizer.refresh()
+
+        assert endpoint.calls == 2
+        assert authorizer.access_token == "token-2"
+
+    def test_token_without_known_expiry_is_not_cached(self, tmp_path):
+        cache = TokenCache(str(tmp_path / "token.json"))
+
+        def endpoint(authorizer):
+            authorizer.access_token = "token"
+            authorizer.scopes = {"*"}
+
+        with patch.object(ReadOnlyAuthorizer, "refresh", autospec=True, side_effect=endpoint):
+            make_authorizer(cache, clock=lambda: 1000.0).refresh()
+
+        with cache.locked() as entries:
+            assert entries == {}
+
+    def test_cache_file_is_private(self, tmp_path):
+        path = tmp_path / "token.json"
+        with TokenCache(str(path)).locked() as entries:
+            entries["client-id"] = {"access_token": "secret", "scopes": ["*"], "expires_at": 0}
+
+        assert path.stat().st_mode & 0o077 == 0
+
+
+class TestInstallTokenCache:
+
+    def test_read_only_client_gets_cached_authorizer(self, tmp_path):
+        reddit = praw.Reddit(client_id="client-id", client_secret="client-secret", user_agent="test-agent")
+
+        install_token_cache(reddit, TokenCache(str(tmp_path / "token.json")))
+
+        assert isinstance(reddit._read_only_core.authorizer, CachedReadOnlyAuthorizer)
+
+    def test_unsupported_prawcore_keeps_its_own_authorizer(self, tmp_path):
+        reddit = praw.Reddit(client_id="client-id", client_secret="client-secret", user_agent="test-agent")
+
+        with patch('ruoa_extractor.src.extractors.token_cache.tracks_token_expiry', return_value=False):
+            install_token_cache(reddit, TokenCache(str(tmp_path / "token.json")))
+
+        assert type(reddit._read_only_core.authorizer) is ReadOnlyAuthorizer
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])